@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Сравнение кодеков журнального движка: запись, чтение и размер файла.
+
+Для каждого доступного кодека таблица из ROWS записей сохраняется снимком
+и загружается заново во временном каталоге. Для сравнения приводится
+прежний формат - JSON с отступами.
+
+Запуск: python benchmarks/bench_codecs.py [число записей]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from primitive_db.serialization import CODECS
+from primitive_db.storage import DATA_DIR, LogStorage
+from primitive_db.utils import CODEC_KEY, STORAGE_KEY, get_storage
+
+ROWS = 100_000
+TABLE = 'bench'
+COLUMNS = ['ID:int', 'name:str', 'age:int', 'active:bool']
+
+
+def _rows(count: int) -> list:
+    return [{'ID': number, 'name': f'user{number}', 'age': number % 100,
+             'active': number % 2 == 0}
+            for number in range(1, count + 1)]
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def measure_indented(rows: list) -> tuple:
+    """Замер прежнего формата: json.dump с indent=2."""
+    path = os.path.join(DATA_DIR, f'{TABLE}.json')
+
+    def save():
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(rows, file, ensure_ascii=False, indent=2)
+
+    def load():
+        with open(path, 'r', encoding='utf-8') as file:
+            json.load(file)
+
+    return _timed(save), _timed(load), os.path.getsize(path)
+
+
+def measure(codec_name: str, rows: list) -> tuple:
+    """Возвращает (секунды записи, секунды чтения, байт на диске)."""
+    metadata = {STORAGE_KEY: LogStorage.name, CODEC_KEY: codec_name,
+                TABLE: COLUMNS}
+    storage = get_storage(metadata)
+    save = _timed(lambda: storage.save(TABLE, rows))
+    load = _timed(lambda: storage.load(TABLE))
+    return save, load, os.path.getsize(storage.path(TABLE))
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rows = _rows(count)
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        os.makedirs(DATA_DIR)
+        results.append(('json indent=2', *measure_indented(rows)))
+        for name in CODECS:
+            results.append((name, *measure(name, rows)))
+
+    print(f'Записей: {count}')
+    print(f'{"кодек":<14} {"запись, с":>10} {"чтение, с":>10} {"размер, КБ":>11}')
+    for name, save, load, size in results:
+        print(f'{name:<14} {save:>10.3f} {load:>10.3f} {size / 1024:>11.0f}')
+
+
+if __name__ == '__main__':
+    main()
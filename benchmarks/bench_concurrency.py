@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Замер масштабирования читателей при одном пишущем процессе.
+
+В отдельном временном каталоге создается таблица на ROWS записей. Один
+процесс вставляет записи, а 1, 2, 4 и 8 процессов-читателей параллельно
+выполняют полный просмотр с условием WHERE. Печатаются чтения в секунду
+суммарно по читателям и вставки в секунду писателя.
+
+Запуск: python benchmarks/bench_concurrency.py [секунд на замер]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from primitive_db.core import iter_select
+from primitive_db.engine import execute
+from primitive_db.manager import TableManager
+from primitive_db.predicates import compile_where, parse_where
+
+ROWS = 100_000
+READERS = (1, 2, 4, 8)
+TABLE = 'bench'
+
+
+def _prepare(path: str) -> None:
+    os.chdir(path)
+    manager = TableManager()
+    execute(manager, f'create_table {TABLE} name:str age:int')
+    with open('rows.csv', 'w', encoding='utf-8') as file:
+        for number in range(ROWS):
+            file.write(f'user{number},{number % 100}\n')
+    execute(manager, f'import {TABLE} rows.csv')
+    manager.close()
+
+
+def _reader(path: str, stop, counter) -> None:
+    os.chdir(path)
+    manager = TableManager()
+    predicate = compile_where(parse_where('age >= 50 and age < 60'),
+                              manager.metadata()[TABLE])
+    reads = 0
+    while not stop.is_set():
+        sum(1 for _ in iter_select(manager.table(TABLE), predicate))
+        reads += 1
+    with counter.get_lock():
+        counter.value += reads
+    manager.close()
+
+
+def _writer(path: str, stop, counter) -> None:
+    os.chdir(path)
+    manager = TableManager()
+    inserts = 0
+    while not stop.is_set():
+        execute(manager, f'insert into {TABLE} values ("writer{inserts}", 1)')
+        inserts += 1
+    counter.value = inserts
+    manager.close()
+
+
+def measure(path: str, readers: int, seconds: float) -> tuple:
+    """Возвращает (чтений в секунду, вставок в секунду) для числа читателей."""
+    stop = multiprocessing.Event()
+    reads = multiprocessing.Value('q', 0)
+    inserts = multiprocessing.Value('q', 0)
+    processes = [multiprocessing.Process(target=_reader, args=(path, stop, reads))
+                 for _ in range(readers)]
+    processes.append(multiprocessing.Process(target=_writer,
+                                             args=(path, stop, inserts)))
+    for process in processes:
+        process.start()
+    time.sleep(seconds)
+    stop.set()
+    for process in processes:
+        process.join()
+    return reads.value / seconds, inserts.value / seconds
+
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    # Вывод команд писателя не нужен в отчете
+    sys.stdout = open(os.devnull, 'w')
+    with tempfile.TemporaryDirectory() as path:
+        _prepare(path)
+        results = [(readers, *measure(path, readers, seconds))
+                   for readers in READERS]
+    sys.stdout = sys.__stdout__
+
+    print(f'{"читателей":>10} {"чтений/с":>10} {"вставок/с":>10}')
+    for readers, reads, inserts in results:
+        print(f'{readers:>10} {reads:>10.1f} {inserts:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Сравнение движка mmap с журнальным: открытие, чтение по ID, просмотр столбца.
+
+Таблица из ROWS записей сохраняется каждым движком во временном каталоге,
+затем замеряются открытие таблицы, чтение записи по ID и выборка
+по условию на столбец int.
+
+Запуск: python benchmarks/bench_mmap.py [число записей]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from primitive_db.core import index_scan
+from primitive_db.predicates import compile_where, parse_where
+from primitive_db.storage import DATA_DIR, LogStorage, MappedStorage
+from primitive_db.utils import CODEC_KEY, STORAGE_KEY, get_storage
+
+ROWS = 1_000_000
+TABLE = 'bench'
+COLUMNS = ['ID:int', 'name:str', 'age:int', 'active:bool']
+WHERE = 'age > 90'
+
+
+def _rows(count: int) -> list:
+    return [{'ID': number, 'name': f'user{number}', 'age': number % 100,
+             'active': number % 2 == 0}
+            for number in range(1, count + 1)]
+
+
+def _timed(func) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def measure(metadata: dict, rows: list) -> tuple:
+    """Возвращает (открытие, чтение по ID, выборка) в секундах."""
+    storage = get_storage(metadata)
+    storage.save(TABLE, rows)
+    predicate = compile_where(parse_where(WHERE), COLUMNS)
+
+    opened, table = _timed(lambda: storage.load(TABLE))
+    point, _ = _timed(lambda: index_scan(metadata, TABLE, table,
+                                         compile_where(parse_where(f'ID = {len(rows) // 2}'), COLUMNS)))  # noqa: E501
+    scan, found = _timed(lambda: [record for record in index_scan(metadata, TABLE, table, predicate)  # noqa: E501
+                                  if predicate(record)])
+    assert len(found) == sum(1 for record in rows if predicate(record))
+    return opened, point, scan
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rows = _rows(count)
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        os.makedirs(DATA_DIR)
+        for name, metadata in (
+                ('log/binary', {STORAGE_KEY: LogStorage.name,
+                                CODEC_KEY: 'binary', TABLE: COLUMNS}),
+                ('mmap', {STORAGE_KEY: MappedStorage.name, TABLE: COLUMNS})):
+            results.append((name, *measure(metadata, rows)))
+
+    print(f'Записей: {count}, условие: {WHERE}')
+    print(f'{"движок":<12} {"открытие, с":>12} {"по ID, с":>10} {"выборка, с":>11}')
+    for name, opened, point, scan in results:
+        print(f'{name:<12} {opened:>12.4f} {point:>10.6f} {scan:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+from .core import access_path, index_scan
+from .decorators import parse_limit_offset
+from .indexes import (
+    column_type,
+    indexed_columns,
+    load_index,
+    lookup,
+    row_count,
+)
+from .predicates import column_types, parse_where, tokenize, where_text
+
+# Агрегатные функции и типы столбцов, к которым они применимы
+FUNCTIONS = {
+    'count': ('int', 'str', 'bool'),
+    'sum': ('int', 'bool'),
+    'avg': ('int', 'bool'),
+    'min': ('int', 'str', 'bool'),
+    'max': ('int', 'str', 'bool'),
+}
+
+
+def _is_punct(token: tuple, value: str) -> bool:
+    return token[0] == 'punct' and token[1] == value
+
+
+def parse_select_list(text: str) -> list:
+    """Разбирает список выражений select: агрегатные функции и столбцы.
+
+    Args:
+        text: Текст между select и from, например "city, count(*), avg(age)"
+
+    Returns:
+        list: [(функция, столбец)]; у столбца группировки функция None,
+            у count(*) столбец '*'
+
+    Raises:
+        ValueError: Если список пуст или выражение записано неверно
+    """
+    tokens = tokenize(text)
+    items = []
+    position = 0
+    while position < len(tokens):
+        kind, value = tokens[position][:2]
+        if kind != 'word':
+            raise ValueError(f'Ожидалось имя столбца или функции: {value}')
+        if position + 1 < len(tokens) and _is_punct(tokens[position + 1], '('):
+            function = value.lower()
+            if function not in FUNCTIONS:
+                raise ValueError(f'Неизвестная агрегатная функция: {value}')
+            if (position + 3 >= len(tokens) or tokens[position + 2][0] != 'word'
+                    or not _is_punct(tokens[position + 3], ')')):
+                raise ValueError(f'Неверный вызов функции {value}.')
+            items.append((function, tokens[position + 2][1]))
+            position += 4
+        else:
+            items.append((None, value))
+            position += 1
+        if position < len(tokens):
+            if not _is_punct(tokens[position], ','):
+                raise ValueError('Выражения select разделяются запятыми.')
+            position += 1
+    if not items:
+        raise ValueError('Не указаны выражения select.')
+    return items
+
+
+def parse_group_by(tokens: list) -> list:
+    """Находит столбцы группировки после слов GROUP BY.
+
+    Args:
+        tokens: Лексемы команды из tokenize
+
+    Returns:
+        list: Имена столбцов или пустой список без группировки
+    """
+    for position, token in enumerate(tokens[:-1]):
+        if (token[0] == 'word' and token[1].lower() == 'group'
+                and tokens[position + 1][1].lower() == 'by'):
+            columns = []
+            position += 2
+            while (position < len(tokens) and tokens[position][0] == 'word'
+                   and tokens[position][1].lower() not in ('limit', 'offset')):
+                columns.append(tokens[position][1])
+                position += 1
+                if position < len(tokens) and _is_punct(tokens[position], ','):
+                    position += 1
+                else:
+                    break
+            if not columns:
+                raise ValueError('После GROUP BY не указаны столбцы.')
+            return columns
+    return []
+
+
+def parse_aggregate(statement: str) -> tuple:
+    """Разбирает агрегатный запрос.
+
+    select count(*), avg(age) from users where active = true group by city
+
+    Args:
+        statement: Текст команды
+
+    Returns:
+        tuple: (выражения, таблица, дерево условия, столбцы группировки,
+            limit, offset)
+
+    Raises:
+        ValueError: Если команда записана неверно
+    """
+    tokens = tokenize(statement)
+    words = [token[1].lower() if token[0] == 'word' else None for token in tokens]
+    if 'from' not in words or words.index('from') + 1 >= len(tokens):
+        raise ValueError('Неверный формат команды select. Используйте: '
+                         'select <функции> from <таблица> [where условие] '
+                         '[group by столбцы]')
+    start = words.index('from')
+    items = parse_select_list(statement[tokens[0][3]:tokens[start][2]])
+    table_name = tokens[start + 1][1]
+    where_clause = parse_where(where_text(statement, ('group', 'limit', 'offset')))
+    _, limit, offset = parse_limit_offset(tokens[start + 2:])
+    return (items, table_name, where_clause, parse_group_by(tokens),
+            limit, offset)
+
+
+def validate_aggregate(items: list, group_by: list, columns: list) -> None:
+    """Проверяет столбцы и типы агрегатного запроса по схеме таблицы.
+
+    Raises:
+        ValueError: Если столбца нет, тип не подходит функции или столбец
+            без функции не входит в группировку
+    """
+    types = column_types(columns)
+    for column in group_by:
+        if column not in types:
+            raise ValueError(f'Столбец "{column}" не найден.')
+    for function, column in items:
+        if function is None:
+            if column not in group_by:
+                raise ValueError(f'Столбец "{column}" должен входить в GROUP BY '
+                                 'или стоять внутри агрегатной функции.')
+            continue
+        if column == '*':
+            if function != 'count':
+                raise ValueError(f'Функция {function} не принимает *.')
+            continue
+        if column not in types:
+            raise ValueError(f'Столбец "{column}" не найден.')
+        if types[column] not in FUNCTIONS[function]:
+            raise ValueError(f'Функция {function} неприменима к столбцу '
+                             f'{column}:{types[column]}.')
+
+
+def label(item: tuple) -> str:
+    """Возвращает заголовок выражения: count(*), avg(age) или имя столбца."""
+    function, column = item
+    return column if function is None else f'{function}({column})'
+
+
+# Состояние функции - [накопленное значение, число значений]
+def _tally(state: list, value) -> None:
+    state[1] += 1
+
+
+def _add(state: list, value) -> None:
+    state[0] += value
+    state[1] += 1
+
+
+def _min(state: list, value) -> None:
+    if not state[1] or value < state[0]:
+        state[0] = value
+    state[1] += 1
+
+
+def _max(state: list, value) -> None:
+    if not state[1] or value > state[0]:
+        state[0] = value
+    state[1] += 1
+
+
+UPDATERS = {'count': _tally, 'sum': _add, 'avg': _add, 'min': _min,
+            'max': _max}
+
+
+def _result(function: str, state: list):
+    total, count = state
+    if function == 'count':
+        return count
+    if not count:
+        return None
+    if function == 'avg':
+        return total / count
+    return total
+
+
+def _group_order(key: tuple) -> tuple:
+    # None в группе упорядочивается раньше значений и не сравнивается с ними
+    return tuple((value is not None, value) for value in key)
+
+
+def _output(items: list, group_by: list, groups: dict) -> list:
+    functions = [function for function, _ in items if function is not None]
+    rows = []
+    for key in sorted(groups, key=_group_order):
+        results = iter([_result(function, state)
+                        for function, state in zip(functions, groups[key])])
+        rows.append([key[group_by.index(column)] if function is None
+                     else next(results) for function, column in items])
+    return rows
+
+
+def aggregate(rows, items: list, group_by: list) -> list:
+    """Вычисляет агрегатные функции за один проход хеш-агрегацией.
+
+    Записи читаются по одной; в памяти держится только состояние функций
+    для каждой группы. Пустые значения (None) функции пропускают.
+
+    Args:
+        rows: Итератор по подходящим записям
+        items: Выражения из parse_select_list
+        group_by: Столбцы группировки
+
+    Returns:
+        list: Строки результата (значения в порядке выражений),
+            упорядоченные по группам
+    """
+    slots = [(None if column == '*' else column, UPDATERS[function])
+             for function, column in items if function is not None]
+    groups = {}
+    for record in rows:
+        key = tuple(record.get(column) for column in group_by)
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [[None, 0] if update in (_min, _max)
+                                    else [0, 0] for _, update in slots]
+        for state, (column, update) in zip(states, slots):
+            value = True if column is None else record.get(column)
+            if value is not None:
+                update(state, value)
+    if not group_by and not groups:
+        # Без группировки результат есть и у пустой выборки
+        groups[()] = [[None, 0] for _ in slots]
+    return _output(items, group_by, groups)
+
+
+def _from_index_key(key, col_type: str):
+    if key is None or col_type == 'str':
+        return key
+    if col_type == 'bool':
+        return key == 'true'
+    return int(key)
+
+
+def quick_aggregate(metadata: dict, table_name: str, items: list, predicate,
+                    group_by: list):
+    """Отвечает на запрос count(*) без чтения таблицы.
+
+    count(*) всей таблицы берется из счетчика записей за O(1), count(*)
+    по условию = или IN на проиндексированном столбце и count(*) с
+    группировкой по такому столбцу - из хеш-индекса.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        items: Выражения из parse_select_list
+        predicate: Скомпилированное условие из compile_where или None
+        group_by: Столбцы группировки
+
+    Returns:
+        list: Строки результата или None, если запрос требует просмотра
+    """
+    if any(function not in (None, 'count') or (function and column != '*')
+           for function, column in items):
+        return None
+    indexed = indexed_columns(metadata, table_name)
+
+    if not group_by:
+        if predicate is None:
+            count = row_count(metadata, table_name)
+        else:
+            node = predicate.node
+            if (node[0] == 'in' or (node[0] == 'cmp' and node[2] == '=')) \
+                    and node[1] in indexed:
+                values = node[2] if node[0] == 'in' else (node[3],)
+                count = len(lookup(metadata, table_name, node[1], values))
+            else:
+                count = None
+        return None if count is None else [[count for _ in items]]
+
+    if predicate is not None or len(group_by) != 1 or group_by[0] not in indexed:
+        return None
+    column = group_by[0]
+    col_type = column_type(metadata, table_name, column)
+    functions = [item for item in items if item[0] is not None]
+    groups = {(_from_index_key(key, col_type),): [[0, len(ids)] for _ in functions]  # noqa: E501
+              for key, ids in load_index(table_name, column).items() if ids}
+    return _output(items, group_by, groups)
+
+
+def matching_rows(metadata: dict, table_name: str, table_data: list,
+                  predicate=None, stats=None):
+    """Лениво выдает записи, подходящие под условие.
+
+    В отличие от select, подходящие записи не собираются в список:
+    столбцовая таблица выдает записи по номерам строк из маски условия,
+    остальные проверяются предикатом по одной.
+
+    Способ доступа выбирается по статистике таблицы stats, если она задана.
+
+    Returns:
+        Итератор по подходящим записям
+    """
+    kind, _ = access_path(metadata, table_name, table_data, predicate, stats)
+    if kind == 'columnar':
+        return map(table_data.row, table_data.positions(predicate.node))
+    candidates = index_scan(metadata, table_name, table_data, predicate,
+                            stats)
+    if predicate is None:
+        return iter(candidates)
+    return filter(predicate, candidates)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from .columnar import np
+from .core import select_cacher
+from .decorators import set_auto_confirm
+from .engine import (
+    define_table,
+    delete_records,
+    insert_record,
+    select_records,
+    update_records,
+)
+from .indexes import ROWS_KEY, SEQUENCES_KEY
+from .manager import TableManager
+from .predicates import parse_where
+from .utils import STORAGE_KEY, get_storage
+
+# Размеры синтетических таблиц по умолчанию
+SIZES = (1_000, 100_000, 1_000_000)
+COLUMNS = ['name:str', 'age:int', 'active:bool']
+
+# Замеров на операцию: точечные операции дешевы и замеряются много раз,
+# операции над всей таблицей - тем реже, чем она больше
+POINT_SAMPLES = 200
+SCAN_BUDGET = 3_000_000
+MIN_SAMPLES = 3
+MAX_SAMPLES = 30
+
+_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    """Разбирает размер таблицы: 1000, 1k, 100k, 1M.
+
+    Raises:
+        ValueError: Если размер не является положительным числом
+    """
+    text = text.strip().lower()
+    multiplier = _SUFFIXES.get(text[-1:], 1)
+    digits = text[:-1] if text[-1:] in _SUFFIXES else text
+    if not digits.isdigit() or int(digits) == 0:
+        raise ValueError(f'Некорректный размер таблицы: {text}')
+    return int(digits) * multiplier
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Возвращает перцентиль выборки методом ближайшего ранга."""
+    ordered = sorted(samples)
+    rank = max(1, round(fraction * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _scan_samples(size: int) -> int:
+    return max(MIN_SAMPLES, min(MAX_SAMPLES, SCAN_BUDGET // size))
+
+
+def _measure(operation, count: int, warmup: bool = False) -> tuple:
+    """Замеряет операцию count раз и один раз - пиковую память.
+
+    Сообщения операций отбрасываются. Память замеряется отдельным
+    запуском: tracemalloc замедляет выполнение и исказил бы время.
+
+    Args:
+        operation: Замеряемая функция без аргументов
+        count: Число замеров
+        warmup: Выполнить операцию один раз до замеров
+
+    Returns:
+        tuple: (список длительностей в секундах, пик памяти в байтах)
+    """
+    samples = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        if warmup:
+            operation()
+        for _ in range(count):
+            start = time.perf_counter()
+            operation()
+            samples.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            operation()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return samples, peak
+
+
+def _summary(size: int, name: str, samples: list, peak: int) -> dict:
+    total = sum(samples)
+    return {
+        'size': size,
+        'operation': name,
+        'samples': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 4),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 4),
+        'mean_ms': round(total / len(samples) * 1000, 4),
+        'ops_per_sec': round(len(samples) / total, 1) if total else None,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _rows(count: int) -> list:
+    return [{'ID': number, 'name': f'user{number}', 'age': number % 100,
+             'active': number % 2 == 0}
+            for number in range(1, count + 1)]
+
+
+def _build(manager: TableManager, table_name: str, size: int,
+           storage: str) -> list:
+    """Создает таблицу из size записей, сохраняя ее одним снимком."""
+    metadata = manager.lock_table(table_name)
+    metadata[STORAGE_KEY] = storage
+    manager.save_metadata(metadata)
+    define_table(manager, table_name, COLUMNS)
+    rows = _rows(size)
+    metadata = manager.lock_table(table_name)
+    get_storage(metadata).save(table_name, rows)
+    metadata[SEQUENCES_KEY][table_name] = size
+    metadata[ROWS_KEY][table_name] = size
+    manager.save_metadata(metadata)
+    manager.forget(table_name)
+    return rows
+
+
+def run_size(size: int, storage: str = 'log', seed: int = 0) -> list:
+    """Замеряет операции на таблице из size записей в текущем каталоге.
+
+    Returns:
+        list: Сводки по операциям (см. _summary)
+    """
+    rng = random.Random(seed)
+    table_name = f'bench_{size}'
+    manager = TableManager()
+    results = []
+
+    def record(name: str, operation, count: int, warmup: bool = False) -> None:
+        samples, peak = _measure(operation, count, warmup)
+        results.append(_summary(size, name, samples, peak))
+
+    try:
+        rows = _build(manager, table_name, size, storage)
+        metadata = manager.metadata()
+        scans = _scan_samples(size)
+
+        # Чтение: по ID, полный просмотр без кэша и повтор из кэша.
+        # Первый запрос загружает таблицу в память - он не замеряется
+        record('select_point', lambda: list(select_records(
+            manager, table_name,
+            parse_where(f'ID = {rng.randint(1, size)}'))), POINT_SAMPLES,
+            warmup=True)
+
+        def select_full():
+            select_cacher.clear()
+            list(select_records(manager, table_name,
+                                parse_where(f'age > {rng.randint(0, 99)}')))
+        record('select_full', select_full, scans)
+
+        cached = parse_where('age = 42')
+        record('select_cached', lambda: list(select_records(
+            manager, table_name, cached)), POINT_SAMPLES, warmup=True)
+
+        # Изменения: по ID и по условию, проверяемому просмотром таблицы
+        record('insert', lambda: insert_record(
+            manager, table_name, ['bench', rng.randint(0, 99), True]),
+            POINT_SAMPLES)
+        record('update_point', lambda: update_records(
+            manager, table_name, {'age': str(rng.randint(0, 99))},
+            parse_where(f'ID = {rng.randint(1, size)}')), POINT_SAMPLES)
+        record('update_scan', lambda: update_records(
+            manager, table_name, {'active': 'false'},
+            parse_where(f'name = "user{rng.randint(1, size)}"')), scans)
+        record('delete_point', lambda: delete_records(
+            manager, table_name,
+            parse_where(f'ID = {rng.randint(1, size)}')), POINT_SAMPLES)
+
+        # Загрузка и сохранение таблицы целиком движком хранения
+        storage_backend = get_storage(metadata)
+        storage_backend.wait(table_name)
+        record('load', lambda: storage_backend.load(table_name), scans)
+        record('save', lambda: storage_backend.save(table_name, rows), scans)
+    finally:
+        manager.close()
+    return results
+
+
+def environment(storage: str) -> dict:
+    """Описывает окружение замера для сравнения запусков."""
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np is not None,
+        'storage': storage,
+    }
+
+
+def run_suite(sizes=SIZES, storage: str = 'log', output: str = None,
+              compare: str = None) -> dict:
+    """Запускает набор замеров и сохраняет результаты в JSON.
+
+    Каждая таблица создается во временном каталоге, поэтому файлы базы
+    в текущем каталоге не затрагиваются.
+
+    Args:
+        sizes: Размеры таблиц
+        storage: Движок хранения таблиц
+        output: Путь к JSON-файлу результатов; по умолчанию
+            bench-<дата>-<время>.json в текущем каталоге
+        compare: Путь к JSON-файлу прежнего запуска для сравнения
+
+    Returns:
+        dict: Результаты: окружение и сводки по операциям
+    """
+    output = os.path.abspath(
+        output or datetime.now().strftime('bench-%Y%m%d-%H%M%S.json'))
+    previous = None
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+
+    report = {**environment(storage), 'results': []}
+    # Удаление записей не должно ждать подтверждения
+    set_auto_confirm(True)
+    workdir = os.getcwd()
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as path:
+                os.chdir(path)
+                try:
+                    results = run_size(size, storage)
+                finally:
+                    os.chdir(workdir)
+            report['results'].extend(results)
+            print_results(results, previous)
+    finally:
+        set_auto_confirm(None)
+
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'Результаты сохранены в {output}')
+    return report
+
+
+def print_results(results: list, previous: dict = None) -> None:
+    """Печатает сводки; с прежним запуском - изменение p50 в процентах."""
+    baseline = {}
+    if previous:
+        baseline = {(item['size'], item['operation']): item
+                    for item in previous.get('results', [])}
+    print(f'{"записей":>9} {"операция":<14} {"p50, мс":>10} {"p99, мс":>10} '
+          f'{"оп/с":>10} {"память, КБ":>11}')
+    for item in results:
+        line = (f'{item["size"]:>9} {item["operation"]:<14} '
+                f'{item["p50_ms"]:>10.3f} {item["p99_ms"]:>10.3f} '
+                f'{item["ops_per_sec"] or 0:>10.1f} {item["peak_kb"]:>11.1f}')
+        old = baseline.get((item['size'], item['operation']))
+        if old and old['p50_ms']:
+            change = (item['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+            line += f' {change:+7.1f}%'
+        print(line)
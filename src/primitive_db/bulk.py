@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import os
+from itertools import islice
+
+from .core import compile_converter
+from .indexes import SEQUENCES_KEY, adjust_row_count, next_ids, sync_indexes
+from .partitions import split_records
+
+# Сколько записей читается, проверяется и записывается за один раз
+BATCH_SIZE = 10000
+
+FORMATS = ('.csv', '.jsonl')
+
+
+def file_format(path: str) -> str:
+    """Определяет формат файла по расширению.
+
+    Raises:
+        ValueError: Если формат не поддерживается
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f'Неподдерживаемый формат файла: {path}. '
+                         f'Допустимые: {", ".join(FORMATS)}')
+    return extension
+
+
+def _read_csv(file, names: list):
+    """Читает строки CSV как списки значений в порядке столбцов таблицы.
+
+    Если первая строка - заголовок с именами столбцов, значения
+    сопоставляются по именам, иначе - по порядку.
+    """
+    reader = csv.reader(file)
+    first = next(reader, None)
+    if first is None:
+        return
+    header = [name.strip() for name in first]
+    if set(names) <= set(header):
+        positions = [header.index(name) for name in names]
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise ValueError(f'Строка {reader.line_num}: ожидается '
+                                 f'{len(header)} значений, получено {len(row)}')
+            yield [row[position] for position in positions]
+        return
+
+    yield first
+    for row in reader:
+        if row:
+            yield row
+
+
+def _read_jsonl(file, names: list):
+    """Читает строки JSON Lines (объекты или массивы значений)."""
+    for line in file:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            yield [item.get(name) for name in names]
+        else:
+            yield item
+
+
+def import_rows(manager, table_name: str, path: str) -> int:
+    """Загружает записи из файла CSV или JSON Lines в таблицу.
+
+    Файл читается пачками по BATCH_SIZE записей. Каждая пачка проверяется
+    заранее скомпилированной функцией схемы, получает непрерывный диапазон
+    ID, записывается одной операцией движка хранения и сразу фиксируется,
+    поэтому память не растет с размером файла. Вне явной транзакции
+    ошибка в пачке оставляет загруженными предыдущие пачки. Столбец ID
+    из файла не используется - записи получают новые ID.
+
+    Args:
+        manager: Менеджер таблиц (TableManager)
+        table_name: Имя таблицы
+        path: Путь к файлу .csv или .jsonl
+
+    Returns:
+        int: Количество загруженных записей
+
+    Raises:
+        ValueError: Если формат файла не поддерживается или данные неверны
+    """
+    extension = file_format(path)
+    metadata = manager.lock_table(table_name)
+    columns = metadata[table_name][1:]
+    names = [column.split(':')[0] for column in columns]
+    convert = compile_converter(tuple(columns))
+    reader = _read_csv if extension == '.csv' else _read_jsonl
+
+    # Данные нужны только таблицам, у которых еще нет счетчика ID
+    table_data = None
+    if table_name not in metadata.get(SEQUENCES_KEY, {}):
+        table_data = manager.table(table_name)
+    imported = 0
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        rows = reader(file, names)
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            validated = []
+            for number, values in enumerate(batch, imported + 1):
+                try:
+                    validated.append(convert(values))
+                except ValueError as e:
+                    raise ValueError(f'Запись {number}: {e}')
+
+            # После фиксации предыдущей пачки метаданные в памяти новые
+            metadata = manager.lock_table(table_name)
+            ids = next_ids(metadata, table_name, len(validated), table_data)
+            records = [{'ID': record_id, **dict(zip(names, values))}
+                       for record_id, values in zip(ids, validated)]
+            for name, part in split_records(metadata, table_name, records).items():  # noqa: E501
+                manager.append(name, part)
+            sync_indexes(metadata, table_name, new_records=records)
+            manager.sync_statistics(table_name, new_records=records)
+            adjust_row_count(metadata, table_name, len(records), table_data)
+            manager.save_metadata(metadata)
+            manager.commit_progress()
+            imported += len(records)
+    return imported
+
+
+def export_rows(manager, table_name: str, path: str) -> int:
+    """Выгружает записи таблицы в файл CSV или JSON Lines.
+
+    Args:
+        manager: Менеджер таблиц (TableManager)
+        table_name: Имя таблицы
+        path: Путь к файлу .csv или .jsonl
+
+    Returns:
+        int: Количество выгруженных записей
+
+    Raises:
+        ValueError: Если формат файла не поддерживается
+    """
+    extension = file_format(path)
+    names = [column.split(':')[0]
+             for column in manager.metadata()[table_name]]
+
+    exported = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        if extension == '.csv':
+            writer = csv.writer(file)
+            writer.writerow(names)
+            for record in manager.table(table_name):
+                writer.writerow([record.get(name, '') for name in names])
+                exported += 1
+        else:
+            for record in manager.table(table_name):
+                file.write(json.dumps(record, ensure_ascii=False))
+                file.write('\n')
+                exported += 1
+    return exported
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import json
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+
+from .server import DEFAULT_HOST, DEFAULT_PORT
+
+
+class Client:
+    """Соединение с сервером базы данных (project serve).
+
+    Пример:
+        with Client() as client:
+            client.create_table('users', ['name:str', 'age:int'])
+            client.insert('users', ['Ann', 30])
+            rows = client.select('users', where='age > 18')
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 timeout: float = 30.0):
+        self._socket = socket.create_connection((host, port), timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('r', encoding='utf-8')
+        self._counter = 0
+
+    def _send(self, requests: list) -> list:
+        ids = []
+        lines = []
+        for request in requests:
+            self._counter += 1
+            ids.append(self._counter)
+            lines.append(json.dumps({'id': self._counter, **request},
+                                    ensure_ascii=False))
+        self._socket.sendall(('\n'.join(lines) + '\n').encode('utf-8'))
+        return ids
+
+    def _receive(self) -> dict:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError('Сервер закрыл соединение.')
+        return json.loads(line)
+
+    def request(self, op: str, **params):
+        """Выполняет запрос и возвращает его результат.
+
+        Raises:
+            ValueError: Если сервер вернул ошибку
+        """
+        return self.pipeline([{'op': op, **params}])[0]
+
+    def pipeline(self, requests: list) -> list:
+        """Отправляет запросы одной пачкой, не дожидаясь ответов.
+
+        Сервер выполняет запросы по порядку, поэтому пачка из многих мелких
+        запросов оплачивает одно ожидание сети вместо ожидания на каждый.
+
+        Args:
+            requests: Словари запросов {"op": ..., ...}
+
+        Returns:
+            list: Результаты в порядке запросов
+
+        Raises:
+            ValueError: Если хотя бы один запрос завершился ошибкой
+                (сообщение первой ошибки)
+        """
+        ids = self._send(requests)
+        responses = [self._receive() for _ in ids]
+        for request_id, response in zip(ids, responses):
+            if response.get('id') != request_id:
+                raise ConnectionError('Ответ сервера не соответствует запросу.')
+        for response in responses:
+            if not response['ok']:
+                raise ValueError(response['error'])
+        return [response['result'] for response in responses]
+
+    def execute(self, command: str) -> str:
+        """Выполняет команду консоли и возвращает ее вывод."""
+        return self.request('command', text=command)
+
+    def create_table(self, table_name: str, columns: list) -> list:
+        """Создает таблицу со столбцами вида имя:тип."""
+        return self.request('create_table', table=table_name, columns=columns)
+
+    def insert(self, table_name: str, values: list) -> int:
+        """Добавляет запись и возвращает ее ID."""
+        return self.request('insert', table=table_name, values=values)
+
+    def insert_many(self, table_name: str, rows: list) -> list:
+        """Добавляет записи одной операцией и возвращает их ID."""
+        return self.request('insert', table=table_name, rows=rows)
+
+    def select(self, table_name: str, where: str = None, limit: int = None,
+               offset: int = 0) -> list:
+        """Возвращает записи, подходящие под условие."""
+        return self.request('select', table=table_name, where=where,
+                            limit=limit, offset=offset)
+
+    def update(self, table_name: str, values: dict, where: str = None) -> int:
+        """Обновляет записи и возвращает их количество."""
+        return self.request('update', table=table_name, set=values, where=where)
+
+    def delete(self, table_name: str, where: str = None) -> int:
+        """Удаляет записи и возвращает их количество."""
+        return self.request('delete', table=table_name, where=where)
+
+    def close(self) -> None:
+        """Закрывает соединение."""
+        self._reader.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ConnectionPool:
+    """Пул соединений с сервером для нескольких потоков.
+
+    Соединения открываются по мере надобности, но не больше size; поток,
+    которому не хватило соединения, ждет, пока другой вернет свое.
+    Соединение, на котором произошла ошибка, кроме ошибки самого запроса
+    (ValueError), закрывается.
+
+    Пример:
+        pool = ConnectionPool(size=8)
+        with pool.connection() as client:
+            client.insert('users', ['Ann', 30])
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 size: int = 4, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        # Сколько еще соединений можно открыть
+        self._slots = threading.Semaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение из пула на время блока with."""
+        client = self._acquire()
+        try:
+            yield client
+        except ValueError:
+            # Ошибка запроса: все ответы прочитаны, соединение исправно
+            self._idle.put(client)
+            raise
+        except BaseException:
+            client.close()
+            self._slots.release()
+            raise
+        self._idle.put(client)
+
+    def _acquire(self) -> Client:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._slots.acquire(blocking=False):
+                try:
+                    return Client(self.host, self.port, self.timeout)
+                except BaseException:
+                    self._slots.release()
+                    raise
+            try:
+                return self._idle.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+    def close(self) -> None:
+        """Закрывает свободные соединения пула."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+import operator
+from array import array
+from sys import intern
+
+from .predicates import OPERATORS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен - без него маски считаются через bytes
+    np = None
+
+# Таблица перекодировки для инверсии маски из байтов 0/1
+_INVERT = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+
+
+def _and(left, right):
+    if np is not None:
+        return left & right
+    size = len(left)
+    return (int.from_bytes(left, 'little')
+            & int.from_bytes(right, 'little')).to_bytes(size, 'little')
+
+
+def _or(left, right):
+    if np is not None:
+        return left | right
+    size = len(left)
+    return (int.from_bytes(left, 'little')
+            | int.from_bytes(right, 'little')).to_bytes(size, 'little')
+
+
+def _not(mask):
+    if np is not None:
+        return ~mask
+    return mask.translate(_INVERT)
+
+
+def _mask(values):
+    """Строит маску из последовательности логических значений."""
+    if np is not None:
+        return np.fromiter(values, dtype=bool)
+    return bytes(bytearray(values))
+
+
+def without_positions(column, positions: list):
+    """Возвращает копию последовательности без указанных позиций.
+
+    Копия собирается из срезов между удаляемыми позициями, поэтому
+    элементы переносятся на скорости C.
+
+    Args:
+        column: Список, array или bytearray
+        positions: Упорядоченные номера удаляемых элементов
+
+    Returns:
+        Последовательность того же типа
+    """
+    kept = column[:0]
+    start = 0
+    for position in positions:
+        kept += column[start:position]
+        start = position + 1
+    kept += column[start:]
+    return kept
+
+
+class DictionaryColumn:
+    """Столбец str в словарном кодировании.
+
+    Значения хранятся номерами в array('i'), а каждая различная строка -
+    один раз в списке strings. Номера не освобождаются до перестройки
+    таблицы.
+    """
+
+    def __init__(self):
+        self.codes = array('i')
+        self.strings = []
+        # {строка: номер}
+        self.lookup = {}
+
+    def code(self, value) -> int:
+        """Возвращает номер строки, добавляя ее в словарь."""
+        value = '' if value is None else str(value)
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.strings)
+            self.strings.append(intern(value))
+        return code
+
+
+class ColumnarTable:
+    """Таблица, хранящая данные по столбцам.
+
+    Столбцы int хранятся в array('q'), bool - в bytearray по байту на
+    значение, str - в общем буфере UTF-8 с массивами начал и концов строк,
+    а str в словарном кодировании - номерами строк (DictionaryColumn).
+    Условия WHERE вычисляются целыми столбцами в маску (с NumPy, если он
+    установлен), а словари записей создаются только для выбранных строк.
+
+    Пустые значения (None) отмечаются в байтовой маске столбца в nulls,
+    которая заводится при первом пустом значении; в самом столбце на их
+    месте лежит 0 или пустая строка.
+
+    Для остального кода таблица выглядит как список записей: поддерживает
+    len(), итерацию, индексы и срезы, возвращая словари.
+    """
+
+    # Столбцы str в словарном кодировании
+    encoded = frozenset()
+
+    def __init__(self, rows: list, columns: list, encoded=()):
+        self.encoded = frozenset(encoded)
+        self.names = []
+        self.types = {}
+        for column in columns:
+            col_name, col_type = column.split(':', 1)
+            self.names.append(col_name)
+            self.types[col_name] = col_type
+        self._clear()
+        self.extend(rows)
+
+    def _clear(self) -> None:
+        self.columns = {}
+        # {столбец: bytearray с 1 на местах пустых значений}
+        self.nulls = {}
+        for name, col_type in self.types.items():
+            if col_type == 'int':
+                self.columns[name] = array('q')
+            elif col_type == 'bool':
+                self.columns[name] = bytearray()
+            elif name in self.encoded:
+                self.columns[name] = DictionaryColumn()
+            else:
+                # (начала строк, концы строк, буфер UTF-8)
+                self.columns[name] = (array('q'), array('q'), bytearray())
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _value(self, name: str, position: int):
+        nulls = self.nulls.get(name)
+        if nulls is not None and nulls[position]:
+            return None
+        column = self.columns[name]
+        col_type = self.types[name]
+        if col_type == 'int':
+            return column[position]
+        if col_type == 'bool':
+            return bool(column[position])
+        if name in self.encoded:
+            return column.strings[column.codes[position]]
+        starts, ends, buffer = column
+        return buffer[starts[position]:ends[position]].decode('utf-8')
+
+    def row(self, position: int) -> dict:
+        """Собирает словарь записи по номеру строки."""
+        return {name: self._value(name, position) for name in self.names}
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.row(i) for i in range(*position.indices(self._size))]
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError('Номер строки вне таблицы')
+        return self.row(position)
+
+    def __iter__(self):
+        for position in range(self._size):
+            yield self.row(position)
+
+    def _mark_null(self, name: str, position: int, null: bool) -> None:
+        nulls = self.nulls.get(name)
+        if nulls is None:
+            if not null:
+                return
+            nulls = self.nulls[name] = bytearray(self._size)
+        nulls[position] = null
+
+    def _set(self, name: str, position: int, value) -> None:
+        self._mark_null(name, position, value is None)
+        column = self.columns[name]
+        col_type = self.types[name]
+        if col_type == 'int':
+            column[position] = value if value is not None else 0
+        elif col_type == 'bool':
+            column[position] = 1 if value else 0
+        elif name in self.encoded:
+            column.codes[position] = column.code(value)
+        else:
+            # Новая строка дописывается в конец буфера; место старой
+            # освобождается при следующей перестройке таблицы
+            starts, ends, buffer = column
+            encoded = str(value if value is not None else '').encode('utf-8')
+            starts[position] = len(buffer)
+            buffer.extend(encoded)
+            ends[position] = len(buffer)
+
+    def extend(self, rows) -> None:
+        """Добавляет записи в конец таблицы."""
+        for record in rows:
+            for name in self.names:
+                column = self.columns[name]
+                value = record.get(name)
+                nulls = self.nulls.get(name)
+                if nulls is not None:
+                    nulls.append(value is None)
+                elif value is None:
+                    self.nulls[name] = bytearray(self._size)
+                    self.nulls[name].append(1)
+                col_type = self.types[name]
+                if col_type == 'int':
+                    column.append(value if value is not None else 0)
+                elif col_type == 'bool':
+                    column.append(1 if value else 0)
+                elif name in self.encoded:
+                    column.codes.append(column.code(value))
+                else:
+                    starts, ends, buffer = column
+                    starts.append(len(buffer))
+                    buffer.extend(str(value if value is not None else '').encode('utf-8'))  # noqa: E501
+                    ends.append(len(buffer))
+            self._size += 1
+
+    def position(self, record_id: int):
+        """Находит номер строки по ID двоичным поиском по столбцу ID."""
+        ids = self.columns['ID']
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if ids[middle] < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._size and ids[low] == record_id:
+            return low
+        return None
+
+    def update_rows(self, records: list) -> None:
+        """Заменяет значения записей с совпадающими ID."""
+        for record in records:
+            position = self.position(record['ID'])
+            if position is None:
+                continue
+            for name in self.names:
+                if name in record and record[name] != self._value(name, position):  # noqa: E501
+                    self._set(name, position, record[name])
+
+    def delete_ids(self, ids) -> None:
+        """Удаляет записи с указанными ID.
+
+        Строки находятся двоичным поиском, столбцы собираются из срезов
+        оставшихся строк без создания словарей. Строки str остаются в
+        буфере до следующей перестройки таблицы.
+        """
+        positions = sorted({position for position in map(self.position, ids)
+                            if position is not None})
+        if not positions:
+            return
+        for name, column in self.columns.items():
+            if name in self.encoded:
+                column.codes = without_positions(column.codes, positions)
+            elif self.types[name] == 'str':
+                starts, ends, buffer = column
+                self.columns[name] = (without_positions(starts, positions),
+                                      without_positions(ends, positions), buffer)
+            else:
+                self.columns[name] = without_positions(column, positions)
+        for name, nulls in self.nulls.items():
+            self.nulls[name] = without_positions(nulls, positions)
+        self._size -= len(positions)
+
+    def sort_by_id(self) -> None:
+        """Упорядочивает записи по ID."""
+        self.rebuild(sorted(self, key=lambda record: record['ID']))
+
+    def rebuild(self, rows: list) -> None:
+        """Перестраивает столбцы по списку записей."""
+        self._clear()
+        self.extend(rows)
+
+    def _column_mask(self, name: str, compare, value):
+        mask = self._values_mask(name, compare, value)
+        nulls = self.nulls.get(name)
+        if nulls is None or nulls.find(1) == -1:
+            return mask
+        nulls = bytes(nulls)
+        if np is not None:
+            nulls = np.frombuffer(nulls, dtype=np.uint8).astype(bool)
+        # Пустое значение не равно никакому и не сравнивается по порядку
+        if compare is operator.ne:
+            return _or(mask, nulls)
+        return _and(mask, _not(nulls))
+
+    def _values_mask(self, name: str, compare, value):
+        column = self.columns[name]
+        col_type = self.types[name]
+        if col_type == 'int':
+            if np is not None:
+                return compare(np.frombuffer(column, dtype=np.int64), value)
+            return _mask(compare(item, value) for item in column)
+        if col_type == 'bool':
+            if compare in (operator.eq, operator.ne):
+                flags = bytes(column)
+                if (compare is operator.eq) != bool(value):
+                    flags = flags.translate(_INVERT)
+                if np is not None:
+                    return np.frombuffer(flags, dtype=np.uint8).astype(bool)
+                return flags
+            return _mask(compare(bool(item), value) for item in column)
+        if name in self.encoded:
+            return self._code_mask(column, compare, value)
+        starts, ends, buffer = column
+        if compare in (operator.eq, operator.ne):
+            # Равенство строк проверяется по байтам без декодирования
+            target = str(value).encode('utf-8')
+            view = memoryview(buffer)
+            equal = compare is operator.eq
+            return _mask((view[start:end] == target) is equal
+                         for start, end in zip(starts, ends))
+        return _mask(compare(buffer[start:end].decode('utf-8'), value)
+                     for start, end in zip(starts, ends))
+
+    def _code_mask(self, column: DictionaryColumn, compare, value):
+        if compare in (operator.eq, operator.ne):
+            # Строка условия ищется в словаре один раз, дальше сравниваются
+            # целые номера; строки, которой нет в словаре, нет и в столбце
+            code = column.lookup.get(str(value), -1)
+            if np is not None:
+                return compare(np.frombuffer(column.codes, dtype=np.intc), code)
+            return _mask(compare(item, code) for item in column.codes)
+        # Порядок проверяется один раз для каждой различной строки
+        matched = [bool(compare(item, value)) for item in column.strings]
+        if np is not None:
+            return np.array(matched, dtype=bool)[
+                np.frombuffer(column.codes, dtype=np.intc)]
+        return _mask(matched[item] for item in column.codes)
+
+    def evaluate(self, node):
+        """Вычисляет типизированное дерево условия целыми столбцами.
+
+        Args:
+            node: Типизированное дерево из predicates.normalize
+
+        Returns:
+            Маска строк: массив NumPy bool или bytes из 0/1
+        """
+        kind = node[0]
+        if kind == 'and':
+            return _and(self.evaluate(node[1]), self.evaluate(node[2]))
+        if kind == 'or':
+            return _or(self.evaluate(node[1]), self.evaluate(node[2]))
+        if kind == 'not':
+            return _not(self.evaluate(node[1]))
+        if kind == 'in':
+            masks = [self._column_mask(node[1], operator.eq, value)
+                     for value in node[2]]
+            if not masks:
+                return _mask(False for _ in range(self._size))
+            result = masks[0]
+            for mask in masks[1:]:
+                result = _or(result, mask)
+            return result
+        _, name, op, value = node
+        return self._column_mask(name, OPERATORS[op], value)
+
+    def positions(self, node) -> list:
+        """Возвращает номера строк, удовлетворяющих условию."""
+        mask = self.evaluate(node)
+        if np is not None:
+            return np.flatnonzero(mask).tolist()
+        found = []
+        position = mask.find(1)
+        while position != -1:
+            found.append(position)
+            position = mask.find(1, position + 1)
+        return found
+
+    def select(self, node) -> list:
+        """Возвращает записи, удовлетворяющие условию, в порядке ID."""
+        return [self.row(position) for position in self.positions(node)]
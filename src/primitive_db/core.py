@@ -1,13 +1,46 @@
 #!/usr/bin/env python3
 
-import os
+from functools import lru_cache
+from itertools import islice
 
-from .decorators import confirm_action, create_cacher, handle_db_errors, log_time
+from . import metrics
+from .columnar import ColumnarTable
+from .decorators import confirm_action, create_cacher, handle_db_errors
+from .dictionary import DICTIONARY_KEY
+from .indexes import (
+    ROWS_KEY,
+    SEQUENCES_KEY,
+    drop_indexes,
+    find_by_id,
+    id_range,
+    indexed_columns,
+    lookup,
+)
+from .parallel import parallel_matches
+from .partitions import PARTITIONS_KEY
+from .predicates import equality_values, id_bounds
+from .storage import generation
+from .table_stats import path_cost
 
 # Создаем кэшер для запросов select
 select_cacher = create_cacher()
 
 
+def _cache_gauges() -> dict:
+    stats = select_cacher.stats()
+    lookups = stats['hits'] + stats['misses']
+    return {
+        'cache_hits': stats['hits'],
+        'cache_misses': stats['misses'],
+        'cache_entries': stats['entries'],
+        'cache_bytes': stats['bytes'],
+        'cache_hit_ratio': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+    }
+
+
+metrics.register_gauges(_cache_gauges)
+
+
 @handle_db_errors
 def create_table(metadata: dict, table_name: str, columns: list) -> dict:
     """Создает новую таблицу в метаданных.
@@ -45,15 +78,20 @@ def create_table(metadata: dict, table_name: str, columns: list) -> dict:
         
         table_columns.append(f'{col_name}:{col_type}')
     
-    # Сохраняем таблицу в метаданные
+    # Сохраняем таблицу в метаданные и заводим счетчики ID и записей
     metadata[table_name] = table_columns
+    metadata.setdefault(SEQUENCES_KEY, {})[table_name] = 0
+    metadata.setdefault(ROWS_KEY, {})[table_name] = 0
     return metadata
 
 
 @handle_db_errors
 @confirm_action("удаление таблицы")
 def drop_table(metadata: dict, table_name: str) -> dict:
-    """Удаляет таблицу из метаданных и удаляет файл с данными.
+    """Удаляет таблицу из метаданных.
+    
+    Файлы таблицы и ее индексов удаляет менеджер таблиц (TableManager.drop)
+    в той же фиксации, что и новые метаданные.
     
     Args:
         metadata: Текущие метаданные базы данных
@@ -69,19 +107,90 @@ def drop_table(metadata: dict, table_name: str) -> dict:
     if table_name not in metadata:
         raise ValueError(f'Таблица "{table_name}" не существует.')
     
+    # Убираем индексы, секционирование, словарное кодирование
+    # и счетчики ID и записей таблицы
+    drop_indexes(metadata, table_name)
+    metadata.get(PARTITIONS_KEY, {}).pop(table_name, None)
+    metadata.get(DICTIONARY_KEY, {}).pop(table_name, None)
+    metadata.get(SEQUENCES_KEY, {}).pop(table_name, None)
+    metadata.get(ROWS_KEY, {}).pop(table_name, None)
+    
     # Удаляем таблицу из метаданных
     del metadata[table_name]
     
-    # Удаляем файл с данными таблицы
-    data_file = f"data/{table_name}.json"
-    if os.path.exists(data_file):
-        os.remove(data_file)
-    
     return metadata
 
 
+# Столбцовые таблицы и файлы mmap хранят целые числа как int64
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+
+def _to_int(value) -> int:
+    number = int(value)
+    if not INT_MIN <= number <= INT_MAX:
+        raise ValueError('Целое значение не помещается в 64 бита.')
+    return number
+
+
+def _to_bool(value) -> bool:
+    # Преобразуем строки в bool
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'Некорректное булево значение: {value}')
+
+
+def _to_str(value) -> str:
+    # Кавычки уже сняты при разборе команды, остальные - часть значения
+    return str(value)
+
+
+CONVERTERS = {'int': _to_int, 'bool': _to_bool, 'str': _to_str}
+
+
+@lru_cache(maxsize=64)
+def compile_converter(columns: tuple):
+    """Компилирует функцию проверки значений для схемы таблицы.
+    
+    Схема разбирается один раз, а функция затем применяет к каждому
+    значению готовый преобразователь типа его столбца.
+    
+    Args:
+        columns: Схема таблицы без столбца ID, например ('name:str', 'age:int')
+        
+    Returns:
+        Функция convert(values) -> list с проверенными значениями
+    """
+    converters = []
+    for column in columns:
+        col_name, col_type = column.split(':')
+        converters.append((col_name, CONVERTERS[col_type]))
+    expected_count = len(converters)
+    
+    def convert(values) -> list:
+        if len(values) != expected_count:
+            raise ValueError(f'Ожидается {expected_count} значений, '
+                             f'получено {len(values)}')
+        
+        validated_values = []
+        for (col_name, converter), value in zip(converters, values):
+            if value is None:
+                # Иначе str(None) сохранился бы как строка "None"
+                raise ValueError(f'Нет значения для столбца {col_name}')
+            try:
+                validated_values.append(converter(value))
+            except (ValueError, TypeError, AttributeError) as e:
+                raise ValueError(f'Неверный тип для столбца {col_name}: {e}')
+        return validated_values
+    
+    return convert
+
+
 @handle_db_errors
-@log_time
 def insert(metadata: dict, table_name: str, values: list) -> tuple:
     """Добавляет новую запись в таблицу.
     
@@ -91,7 +200,7 @@ def insert(metadata: dict, table_name: str, values: list) -> tuple:
         values: Список значений для вставки
         
     Returns:
-        tuple: (новый ID, обновленные данные таблицы)
+        list: Проверенные значения, приведенные к типам столбцов
         
     Raises:
         ValueError: Если таблица не существует или неверные данные
@@ -99,201 +208,285 @@ def insert(metadata: dict, table_name: str, values: list) -> tuple:
     if table_name not in metadata:
         raise ValueError(f'Таблица "{table_name}" не существует.')
     
-    # Получаем схему таблицы (без ID столбца для проверки количества)
-    table_columns = metadata[table_name][1:]  # Пропускаем ID:int
-    expected_count = len(table_columns)
-    
-    if len(values) != expected_count:
-        raise ValueError(f'Ожидается {expected_count} значений, '
-                       f'получено {len(values)}')
+    # Получаем схему таблицы без столбца ID:int
+    convert = compile_converter(tuple(metadata[table_name][1:]))
+    return convert(values)
+
+
+@handle_db_errors
+def insert_many(metadata: dict, table_name: str, rows: list) -> list:
+    """Проверяет значения нескольких записей за один проход.
     
-    # Валидируем типы данных
-    validated_values = []
-    for i, (column, value) in enumerate(zip(table_columns, values)):
-        col_name, col_type = column.split(':')
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        rows: Списки значений записей
         
+    Returns:
+        list: Проверенные значения записей, приведенные к типам столбцов
+        
+    Raises:
+        ValueError: Если таблица не существует или значения записи неверны
+            (для нескольких записей - с номером записи)
+    """
+    if table_name not in metadata:
+        raise ValueError(f'Таблица "{table_name}" не существует.')
+    
+    convert = compile_converter(tuple(metadata[table_name][1:]))
+    if len(rows) == 1:
+        return [convert(rows[0])]
+    validated = []
+    for number, values in enumerate(rows, 1):
         try:
-            if col_type == 'int':
-                validated_value = int(value)
-            elif col_type == 'bool':
-                # Преобразуем строки в bool
-                if value.lower() in ('true', '1', 'yes'):
-                    validated_value = True
-                elif value.lower() in ('false', '0', 'no'):
-                    validated_value = False
-                else:
-                    raise ValueError(f'Некорректное булево значение: {value}')
-            else:  # str
-                # Убираем кавычки если они есть
-                validated_value = str(value).strip('"\'')
-            
-            validated_values.append(validated_value)
-        except (ValueError, TypeError) as e:
-            raise ValueError(f'Неверный тип для столбца {col_name}: {e}')
-    
-    return validated_values
+            validated.append(convert(values))
+        except ValueError as e:
+            raise ValueError(f'Запись {number}: {e}')
+    return validated
+
+
+def access_path(metadata: dict, table_name: str, table_data: list,
+                predicate=None, stats=None) -> tuple:
+    """Выбирает способ доступа к записям для условия.
+    
+    Условия на ID (=, <, <=, >, >=) проверяются двоичным поиском по
+    упорядоченным данным, условия = и IN по другим столбцам - по хеш-индексу,
+    если он создан. Для столбцовой таблицы остальные условия вычисляются
+    целыми столбцами. Иначе условия проверяет сам предикат.
+    
+    Без статистики берется первый применимый способ в этом порядке.
+    Со статистикой таблицы способы сравниваются по оценке стоимости
+    path_cost, и просмотр выигрывает, когда диапазон ID или значение
+    индекса покрывают большую часть таблицы. Поиск одного ID выбирается
+    всегда.
+    
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        table_data: Данные таблицы
+        predicate: Скомпилированное условие из compile_where или None
+        stats: Статистика таблицы (TableStats) или None
+        
+    Returns:
+        tuple: (способ, параметр): ('all', None) без условия, ('id', ID),
+            ('id_range', (нижняя, верхняя)), ('index', (столбец, значения)),
+            ('columnar', None) или ('scan', None)
+    """
+    if predicate is None:
+        return 'all', None
+    
+    candidates = []
+    bounds = id_bounds(predicate.node)
+    if bounds is not None:
+        low, high = bounds
+        if low is not None and low == high:
+            return 'id', low
+        candidates.append(('id_range', bounds))
+    
+    indexed = indexed_columns(metadata, table_name)
+    for column, values in equality_values(predicate.node).items():
+        if column in indexed:
+            candidates.append(('index', (column, values)))
+    
+    fallback = ('columnar' if isinstance(table_data, ColumnarTable)
+                else 'scan', None)
+    if stats is None:
+        return candidates[0] if candidates else fallback
+    candidates.append(fallback)
+    return min(candidates, key=lambda path: path_cost(
+        path[0], path[1], table_data, predicate.node, stats))
+
+
+def index_scan(metadata: dict, table_name: str, table_data: list,
+               predicate=None, stats=None) -> list:
+    """Сужает данные таблицы до кандидатов способом из access_path.
+    
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        table_data: Данные таблицы
+        predicate: Скомпилированное условие из compile_where или None
+        stats: Статистика таблицы (TableStats) или None
+        
+    Returns:
+        list: Записи-кандидаты или все данные, если индекс неприменим
+    """
+    kind, argument = access_path(metadata, table_name, table_data, predicate,
+                                 stats)
+    if kind == 'id':
+        record = find_by_id(table_data, argument)
+        return [record] if record is not None else []
+    if kind == 'id_range':
+        return id_range(table_data, *argument)
+    if kind == 'index':
+        ids = lookup(metadata, table_name, *argument)
+        found = (find_by_id(table_data, record_id) for record_id in sorted(ids))
+        return [record for record in found if record is not None]
+    # Столбцовая таблица вычисляет условие целыми столбцами и собирает
+    # словари только для подошедших записей
+    if kind == 'columnar':
+        return table_data.select(predicate.node)
+    return table_data
+
+
+def iter_select(table_data: list, predicate=None,
+                limit: int = None, offset: int = 0):
+    """Лениво выбирает записи: просмотр, фильтрация и срез limit/offset.
+    
+    Записи выдаются по одной, поэтому результат целиком в памяти
+    не собирается, а просмотр останавливается после limit записей.
+    
+    Args:
+        table_data: Данные таблицы
+        predicate: Скомпилированное условие из compile_where или None
+        limit: Максимальное число записей или None
+        offset: Сколько подходящих записей пропустить
+        
+    Returns:
+        Итератор по подходящим записям
+    """
+    rows = iter(table_data)
+    if predicate is not None:
+        rows = filter(predicate, rows)
+    stop = None if limit is None else offset + limit
+    return islice(rows, offset, stop)
+
+
+def project(rows, field_names: list):
+    """Лениво оставляет в записях только указанные столбцы.
+    
+    Args:
+        rows: Итератор по записям
+        field_names: Имена столбцов
+        
+    Returns:
+        Итератор по спискам значений столбцов
+    """
+    for record in rows:
+        yield [record.get(col_name, '') for col_name in field_names]
+
+
+def _count_rows(operation: str, scanned: int, matched: int) -> None:
+    metrics.increment('rows_scanned_total', scanned, operation=operation)
+    metrics.increment('rows_returned_total', matched, operation=operation)
 
 
 @handle_db_errors
-@log_time
-def _select_impl(table_data: list, where_clause: dict = None) -> list:
+def _select_impl(table_data: list, predicate=None) -> list:
     """Внутренняя реализация select без кэширования."""
-    if where_clause is None:
+    if predicate is None:
         return table_data
     
-    filtered_data = []
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            record_value = record.get(column)
-            
-            # Преобразуем значение для сравнения
-            if isinstance(record_value, bool):
-                # Для bool преобразуем строки в булевы значения
-                if isinstance(value, str):
-                    if value.lower() in ('true', '1', 'yes', 'false', '0', 'no'):  # noqa: E501
-                        if value.lower() in ('true', '1', 'yes'):
-                            compare_value = True
-                        else:
-                            compare_value = False
-                    else:
-                        # Если это не булева строка, сравниваем как строки
-                        compare_value = value
-                else:
-                    compare_value = value
-            else:
-                compare_value = value
-            
-            # Сравниваем значения
-            if isinstance(record_value, bool) and isinstance(compare_value, bool):  # noqa: E501
-                if record_value != compare_value:
-                    match = False
-                    break
-            else:
-                if str(record_value) != str(compare_value):
-                    match = False
-                    break
-        
-        if match:
-            filtered_data.append(record)
+    # Большая таблица просматривается частями в нескольких процессах
+    positions = parallel_matches(table_data, predicate)
+    if positions is not None:
+        result = [table_data[position] for position in positions]
+    else:
+        result = list(iter_select(table_data, predicate))
+    _count_rows('select', len(table_data), len(result))
+    return result
+
+
+def select_cache_key(table_name: str, predicate, signature: tuple = ()) -> tuple:
+    """Возвращает ключ кэша запроса: таблица, поколение ее данных и условие.
     
-    return filtered_data
+    Любое изменение таблицы в этом процессе меняет поколение, а запись
+    файлов другим процессом - их подписи (TableManager.signature), и
+    старые результаты перестают находиться.
+    """
+    return (table_name, generation(table_name), signature, predicate.key)
 
 
-def select(table_data: list, where_clause: dict = None) -> list:
+def select(table_data: list, predicate=None, table_name: str = None) -> list:
     """Выбирает записи из данных таблицы с кэшированием.
     
     Args:
         table_data: Данные таблицы
-        where_clause: Условие фильтрации {столбец: значение}
+        predicate: Скомпилированное условие из compile_where или None
+        table_name: Имя таблицы. Без него результат не кэшируется
         
     Returns:
         list: Отфильтрованные данные
     """
-    # Создаем ключ для кэша на основе данных и условия
-    cache_key = f"select_{id(table_data)}_{str(where_clause)}"
+    # Без условия фильтровать нечего - кэшировать нет смысла
+    if table_name is None or predicate is None:
+        return _select_impl(table_data, predicate)
+    
+    cache_key = select_cache_key(table_name, predicate)
     
     def get_data():
-        return _select_impl(table_data, where_clause)
+        return _select_impl(table_data, predicate)
     
     return select_cacher(cache_key, get_data)
 
 
+def _matching(table_data: list, predicate=None):
+    """Выдает записи, подходящие под условие, по одной.
+    
+    Проверка условия на большой таблице делится между процессами.
+    """
+    if predicate is None:
+        return iter(table_data)
+    positions = parallel_matches(table_data, predicate)
+    if positions is not None:
+        return (table_data[position] for position in positions)
+    return filter(predicate, table_data)
+
+
+def _apply_set(record: dict, set_clause: dict) -> dict:
+    """Возвращает копию записи с новыми значениями столбцов."""
+    updated_record = record.copy()
+    for column, new_value in set_clause.items():
+        if column in updated_record:
+            # Преобразуем тип если нужно
+            if isinstance(updated_record[column], bool):
+                if new_value.lower() in ('true', '1', 'yes'):
+                    updated_record[column] = True
+                elif new_value.lower() in ('false', '0', 'no'):
+                    updated_record[column] = False
+            elif isinstance(updated_record[column], int):
+                updated_record[column] = _to_int(new_value)
+            else:
+                updated_record[column] = str(new_value)
+    return updated_record
+
+
 @handle_db_errors
-def update(table_data: list, set_clause: dict, where_clause: dict) -> list:
-    """Обновляет записи в данных таблицы.
+def update(table_data: list, set_clause: dict, predicate=None) -> list:
+    """Вычисляет новые версии записей, подходящих под условие.
+    
+    Копируются только подошедшие записи; сами данные таблицы не меняются,
+    новые версии переносит в них менеджер таблиц.
     
     Args:
-        table_data: Данные таблицы
+        table_data: Данные таблицы или кандидаты из index_scan
         set_clause: Поля для обновления {столбец: новое_значение}
-        where_clause: Условие фильтрации {столбец: значение}
+        predicate: Скомпилированное условие из compile_where или None
+            для всех записей
         
     Returns:
-        list: Обновленные данные
+        list: Пары (прежняя запись, новая запись)
     """
-    updated_data = []
-    updated_count = 0
-    
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if str(record.get(column)) != str(value):
-                match = False
-                break
-        
-        if match:
-            # Обновляем запись
-            updated_record = record.copy()
-            for column, new_value in set_clause.items():
-                if column in updated_record:
-                    # Преобразуем тип если нужно
-                    if isinstance(updated_record[column], bool):
-                        if new_value.lower() in ('true', '1', 'yes'):
-                            updated_record[column] = True
-                        elif new_value.lower() in ('false', '0', 'no'):
-                            updated_record[column] = False
-                    elif isinstance(updated_record[column], int):
-                        updated_record[column] = int(new_value)
-                    else:
-                        updated_record[column] = str(new_value).strip('"\'')
-            updated_data.append(updated_record)
-            updated_count += 1
-        else:
-            updated_data.append(record)
-    
-    return updated_data
+    pairs = [(record, _apply_set(record, set_clause))
+             for record in _matching(table_data, predicate)]
+    _count_rows('update', len(table_data), len(pairs))
+    return pairs
 
 
 @handle_db_errors
-@confirm_action("удаление записей")
-def delete(table_data: list, where_clause: dict) -> list:
-    """Удаляет записи из данных таблицы.
+@confirm_action("удаление записей", cancelled=lambda *args, **kwargs: [])
+def delete(table_data: list, predicate=None) -> list:
+    """Находит записи, подходящие под условие удаления.
+    
+    Данные таблицы не меняются: удаляет записи менеджер таблиц по их ID.
     
     Args:
-        table_data: Данные таблицы
-        where_clause: Условие фильтрации {столбец: значение}
+        table_data: Данные таблицы или кандидаты из index_scan
+        predicate: Скомпилированное условие из compile_where или None
+            для всех записей
         
     Returns:
-        list: Данные после удаления
+        list: Удаляемые записи; пустой список, если удаление отменено
     """
-    if where_clause is None:
-        return []
-    
-    filtered_data = []
-    
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            record_value = record.get(column)
-            
-            # Преобразуем значение для сравнения
-            if isinstance(record_value, bool):
-                # Для bool преобразуем строки в булевы значения
-                if isinstance(value, str):
-                    if value.lower() in ('true', '1', 'yes', 'false', '0', 'no'):  # noqa: E501
-                        if value.lower() in ('true', '1', 'yes'):
-                            compare_value = True
-                        else:
-                            compare_value = False
-                    else:
-                        # Если это не булева строка, сравниваем как строки
-                        compare_value = value
-                else:
-                    compare_value = value
-            else:
-                compare_value = value
-            
-            # Сравниваем значения
-            if isinstance(record_value, bool) and isinstance(compare_value, bool):  # noqa: E501
-                if record_value != compare_value:
-                    match = False
-                    break
-            else:
-                if str(record_value) != str(compare_value):
-                    match = False
-                    break
-        
-        if not match:
-            filtered_data.append(record)
-    
-    return filtered_data
\ No newline at end of file
+    deleted = list(_matching(table_data, predicate))
+    _count_rows('delete', len(table_data), len(deleted))
+    return deleted
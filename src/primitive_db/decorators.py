@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 
+import sys
 import time
+from collections import OrderedDict
+
+from .predicates import parse_where, tokenize
 
 
 def handle_db_errors(func):
@@ -23,19 +27,42 @@ def handle_db_errors(func):
     return wrapper
 
 
-def confirm_action(action_name: str):
+# Ответ на запросы подтверждения без участия пользователя:
+# None - спрашивать, True - подтверждать, False - отменять
+_auto_confirm = {'answer': None}
+
+
+def set_auto_confirm(answer) -> None:
+    """Задает ответ на запросы подтверждения для неинтерактивного режима.
+    
+    Args:
+        answer: True - подтверждать все операции (флаг --yes), False -
+            отменять их, None - снова спрашивать пользователя
+    """
+    _auto_confirm['answer'] = answer
+
+
+def confirm_action(action_name: str, cancelled=None):
     """Декоратор для подтверждения опасных операций.
     
     Args:
         action_name: Название действия для отображения в запросе подтверждения
+        cancelled: Функция от аргументов операции, возвращающая результат
+            отмененной операции. По умолчанию возвращается первый аргумент
     """
     def decorator(func):
         def wrapper(*args, **kwargs):
-            response = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ').strip().lower()  # noqa: E501
+            answer = _auto_confirm['answer']
+            if answer is None:
+                response = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ').strip().lower()  # noqa: E501
+            else:
+                response = 'y' if answer else 'n'
             if response == 'y':
                 return func(*args, **kwargs)
             else:
                 print("Операция отменена.")
+                if cancelled is not None:
+                    return cancelled(*args, **kwargs)
                 # Возвращаем исходные данные вместо None
                 if len(args) > 0:
                     return args[0]  # Возвращаем первый аргумент (обычно metadata или table_data) # noqa: E501
@@ -44,78 +71,152 @@ def confirm_action(action_name: str):
     return decorator
 
 
-def log_time(func):
-    """Декоратор для замера времени выполнения функции."""
-    def wrapper(*args, **kwargs):
-        start_time = time.monotonic()
-        result = func(*args, **kwargs)
-        end_time = time.monotonic()
-        execution_time = end_time - start_time
-        print(f"Функция {func.__name__} выполнилась за {execution_time:.3f} секунд.")  # noqa: E501
-        return result
-    return wrapper
+def _estimate_size(value) -> int:
+    """Приблизительно оценивает объем памяти результата запроса в байтах."""
+    size = sys.getsizeof(value)
+    if isinstance(value, list):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
 
 
-def create_cacher():
-    """Фабрика для создания кэшера с замыканием."""
-    cache = {}
+def create_cacher(max_entries: int = 128, max_bytes: int = 32 * 1024 * 1024,
+                  ttl: float = None):
+    """Фабрика для создания кэшера с замыканием.
+    
+    Кэш вытесняет давно не использованные результаты (LRU), когда превышено
+    число записей или оценка занятой памяти, и отбрасывает результаты старше
+    ttl секунд. Ключ - кортеж, первый элемент которого - имя таблицы, второй -
+    поколение ее данных. Результаты прежних поколений таблицы удаляются
+    при сохранении нового результата.
+    
+    Args:
+        max_entries: Максимальное число результатов в кэше
+        max_bytes: Максимальный объем памяти под результаты
+        ttl: Время жизни результата в секундах или None
+        
+    Returns:
+        Функция cache_result с атрибутами stats, clear, contains, invalidate
+        и configure
+    """
+    cache = OrderedDict()  # ключ -> (результат, размер, время сохранения)
+    limits = {'max_entries': max_entries, 'max_bytes': max_bytes, 'ttl': ttl}
+    counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+    
+    def _remove(key):
+        _, size, _ = cache.pop(key)
+        counters['bytes'] -= size
+    
+    def _evict():
+        while cache and (len(cache) > limits['max_entries']
+                         or counters['bytes'] > limits['max_bytes']):
+            _remove(next(iter(cache)))
+            counters['evictions'] += 1
     
     def cache_result(key, value_func):
         """Кэширует результат выполнения функции.
         
         Args:
-            key: Ключ для кэша
+            key: Ключ для кэша (таблица, поколение, условие)
             value_func: Функция для получения значения, если его нет в кэше
             
         Returns:
             Результат выполнения value_func или значение из кэша
         """
-        if key in cache:
-            return cache[key]
-        else:
-            result = value_func()
-            cache[key] = result
+        entry = cache.get(key)
+        if entry is not None:
+            expired = (limits['ttl'] is not None
+                       and time.monotonic() - entry[2] > limits['ttl'])
+            if not expired:
+                cache.move_to_end(key)
+                counters['hits'] += 1
+                return entry[0]
+            _remove(key)
+            counters['evictions'] += 1
+        
+        counters['misses'] += 1
+        result = value_func()
+        size = _estimate_size(result)
+        if size > limits['max_bytes']:
             return result
+        
+        # Результаты прежних поколений этой таблицы больше не понадобятся
+        invalidate(key[0], keep_generation=key[1])
+        cache[key] = (result, size, time.monotonic())
+        counters['bytes'] += size
+        _evict()
+        return result
+    
+    def contains(key):
+        """Проверяет, есть ли в кэше действующий результат, не меняя счетчики."""
+        entry = cache.get(key)
+        if entry is None:
+            return False
+        return (limits['ttl'] is None
+                or time.monotonic() - entry[2] <= limits['ttl'])
+    
+    def invalidate(table_name, keep_generation=None):
+        """Удаляет результаты запросов к таблице.
+        
+        Args:
+            table_name: Имя таблицы
+            keep_generation: Поколение, результаты которого нужно сохранить
+        """
+        for key in [key for key in cache
+                    if key[0] == table_name and key[1] != keep_generation]:
+            _remove(key)
+    
+    def clear():
+        """Очищает кэш."""
+        for key in list(cache):
+            _remove(key)
+    
+    def configure(**new_limits):
+        """Меняет ограничения кэша (max_entries, max_bytes, ttl)."""
+        for name, value in new_limits.items():
+            if name not in limits:
+                raise ValueError(f'Неизвестный параметр кэша: {name}')
+            limits[name] = value
+        _evict()
     
+    def stats():
+        """Возвращает счетчики и ограничения кэша."""
+        return {**counters, 'entries': len(cache), **limits}
+    
+    cache_result.contains = contains
+    cache_result.invalidate = invalidate
+    cache_result.clear = clear
+    cache_result.configure = configure
+    cache_result.stats = stats
     return cache_result
 
-def parse_where_condition(where_str: str) -> dict:
-    """Парсит условие WHERE в словарь.
+
+def parse_where_condition(where_str: str):
+    """Парсит условие WHERE в дерево условия.
     
     Args:
-        where_str: Строка условия вида "age = 28" или "name = 'John'"
+        where_str: Строка условия вида "age = 28", "name = 'John'" или
+            "age >= 18 and (city = 'Moscow' or city in ('Kazan', 'Omsk'))"
         
     Returns:
-        dict: Словарь {столбец: значение}
+        tuple: Дерево условия (см. predicates.parse_where) или None,
+            если условие пустое
         
     Raises:
         ValueError: Если формат условия некорректен
     """
-    if not where_str:
-        return {}
-    
-    # Разбиваем на части по оператору '='
-    parts = where_str.split('=', 1)
-    if len(parts) != 2:
-        raise ValueError('Некорректный формат условия WHERE. '
-                       'Используйте: столбец = значение')
-    
-    column = parts[0].strip()
-    value = parts[1].strip()
-    
-    # Убираем кавычки для строковых значений
-    if (value.startswith('"') and value.endswith('"')) or \
-       (value.startswith("'") and value.endswith("'")):
-        value = value[1:-1]
-    
-    return {column: value}
+    return parse_where(where_str)
 
 
 def parse_set_clause(set_str: str) -> dict:
     """Парсит условие SET в словарь.
     
+    Кавычки снимает лексический анализатор условий, поэтому кавычки
+    внутри строки сохраняются. Значение без кавычек из нескольких слов
+    берется целиком.
+    
     Args:
-        set_str: Строка условия вида "age = 29" или "name = 'John'"
+        set_str: Текст условия из исходной команды вида "age = 29"
+            или "name = 'John'"
         
     Returns:
         dict: Словарь {столбец: новое_значение}
@@ -123,21 +224,53 @@ def parse_set_clause(set_str: str) -> dict:
     Raises:
         ValueError: Если формат условия некорректен
     """
-    if not set_str:
+    if not set_str or not set_str.strip():
         return {}
     
-    # Разбиваем на части по оператору '='
-    parts = set_str.split('=', 1)
-    if len(parts) != 2:
+    tokens = tokenize(set_str)
+    if (len(tokens) < 3 or tokens[0][0] != 'word'
+            or tokens[1][:2] != ('op', '=')):
         raise ValueError('Некорректный формат условия SET. '
                        'Используйте: столбец = значение')
     
-    column = parts[0].strip()
-    value = parts[1].strip()
-    
-    # Убираем кавычки для строковых значений
-    if (value.startswith('"') and value.endswith('"')) or \
-       (value.startswith("'") and value.endswith("'")):
-        value = value[1:-1]
-    
-    return {column: value}
\ No newline at end of file
+    column = tokens[0][1]
+    value = tokens[2:]
+    if len(value) == 1 and value[0][0] in ('str', 'word'):
+        return {column: value[0][1]}
+    if any(kind != 'word' for kind, *_ in value):
+        raise ValueError('Некорректный формат условия SET. '
+                       'Используйте: столбец = значение')
+    return {column: set_str[value[0][2]:].strip()}
+
+def parse_limit_offset(tokens: list) -> tuple:
+    """Отделяет от команды необязательные части LIMIT и OFFSET.
+
+    Части начинаются с первого слова LIMIT или OFFSET вне кавычек - там же,
+    где where_text заканчивает условие, - поэтому такие слова в строках
+    условия (name = "limit") частью не считаются.
+
+    Args:
+        tokens: Лексемы команды после имени таблицы (см. tokenize)
+
+    Returns:
+        tuple: (лексемы до LIMIT и OFFSET, limit или None, offset)
+
+    Raises:
+        ValueError: Если значение LIMIT или OFFSET не является
+            неотрицательным целым числом
+    """
+    options = {'limit': None, 'offset': 0}
+    start = next((i for i, (kind, value, *_) in enumerate(tokens)
+                  if kind == 'word' and value.lower() in options), len(tokens))
+    i = start
+    while i < len(tokens):
+        kind, keyword = tokens[i][0], tokens[i][1].lower()
+        if kind != 'word' or keyword not in options:
+            raise ValueError(f'Ожидается LIMIT или OFFSET: {tokens[i][1]}')
+        kind, value = tokens[i + 1][:2] if i + 1 < len(tokens) else ('word', '')
+        if kind != 'word' or not value.isdigit():
+            raise ValueError(f'Значение {keyword.upper()} должно быть '
+                             f'неотрицательным целым числом: {value}')
+        options[keyword] = int(value)
+        i += 2
+    return tokens[:start], options['limit'], options['offset']
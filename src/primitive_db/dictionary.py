@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+from sys import intern
+
+# Служебный ключ метаданных со столбцами в словарном кодировании:
+# {таблица: [столбец, ...]}
+DICTIONARY_KEY = 'sys:dictionary'
+
+# Тип столбца в схеме файла, если вместо строк в нем хранятся номера
+CODE_TYPE = 'code'
+
+
+def encoded_columns(metadata: dict, table_name: str) -> list:
+    """Возвращает столбцы таблицы в словарном кодировании."""
+    if not metadata:
+        return []
+    return metadata.get(DICTIONARY_KEY, {}).get(table_name, [])
+
+
+def define_dictionary(metadata: dict, table_name: str, column: str,
+                      enabled: bool) -> dict:
+    """Включает или выключает словарное кодирование столбца в метаданных.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        column: Имя столбца str
+        enabled: Включить (True) или выключить (False)
+
+    Returns:
+        dict: Обновленные метаданные
+    """
+    tables = metadata.setdefault(DICTIONARY_KEY, {})
+    columns = [name for name in tables.get(table_name, []) if name != column]
+    if enabled:
+        columns.append(column)
+    if columns:
+        tables[table_name] = columns
+    else:
+        tables.pop(table_name, None)
+    return metadata
+
+
+def coded_schema(columns: list, encoded: list) -> list:
+    """Возвращает схему файла: столбцы в словарном кодировании получают тип code."""
+    if not columns or not encoded:
+        return columns
+    return [f'{column.split(":", 1)[0]}:{CODE_TYPE}'
+            if column.split(':', 1)[0] in encoded else column
+            for column in columns]
+
+
+def intern_values(records, columns: list) -> None:
+    """Заменяет строки столбцов в записях общими (интернированными) строками.
+
+    Одинаковые значения всех записей становятся одним объектом, а их
+    сравнение на равенство сводится к сравнению указателей.
+    """
+    if not columns:
+        return
+    for record in records:
+        for column in columns:
+            value = record.get(column)
+            if value is not None:
+                record[column] = intern(value)
+
+
+def encode_entries(entries: list, columns: list) -> list:
+    """Заменяет строки столбцов номерами в словаре пачки записей журнала.
+
+    Перед пачкой пишется запись {"op": "dict", "columns": {столбец:
+    [строки]}}: номер значения - его позиция в списке. Словарь действует
+    до следующего словаря, поэтому пачки, дописанные разными процессами,
+    не зависят друг от друга.
+
+    Args:
+        entries: Записи журнала {"op": "put", "row": ...} и {"op": "del", ...}
+        columns: Столбцы в словарном кодировании
+
+    Returns:
+        list: Записи журнала со словарем впереди
+    """
+    if not columns:
+        return entries
+    codes = {column: {} for column in columns}
+    encoded = []
+    for entry in entries:
+        if entry['op'] == 'put':
+            row = entry['row'].copy()
+            for column, known in codes.items():
+                value = row.get(column)
+                if value is not None:
+                    code = known.get(value)
+                    if code is None:
+                        code = known[value] = len(known)
+                    row[column] = code
+            entry = {'op': 'put', 'row': row}
+        encoded.append(entry)
+    if not any(codes.values()):
+        return encoded
+    dictionary = {column: list(known) for column, known in codes.items()}
+    return [{'op': 'dict', 'columns': dictionary}, *encoded]
+
+
+def read_dictionary(columns: dict) -> dict:
+    """Готовит словарь из записи журнала: строки интернируются."""
+    return {column: [intern(value) for value in values]
+            for column, values in columns.items()}
+
+
+def decode_row(row: dict, dictionary: dict) -> dict:
+    """Заменяет номера в записи строками словаря.
+
+    Строки, записанные без словаря, остаются как есть.
+    """
+    for column, values in dictionary.items():
+        code = row.get(column)
+        if type(code) is int:
+            row[column] = values[code]
+    return row
@@ -1,12 +1,72 @@
 #!/usr/bin/env python3
 
+import re
 import shlex
+from operator import itemgetter
 
 from prettytable import PrettyTable
 
-from .core import create_table, delete, drop_table, insert, select, update
-from .decorators import parse_set_clause, parse_where_condition
-from .utils import load_metadata, load_table_data, save_metadata, save_table_data
+from . import metrics
+from .aggregate import (
+    aggregate,
+    label,
+    matching_rows,
+    parse_aggregate,
+    quick_aggregate,
+    validate_aggregate,
+)
+from .bulk import export_rows, import_rows
+from .core import (
+    create_table,
+    delete,
+    drop_table,
+    index_scan,
+    insert_many,
+    iter_select,
+    project,
+    select,
+    select_cache_key,
+    select_cacher,
+    update,
+)
+from .decorators import parse_limit_offset, parse_set_clause, parse_where_condition
+from .dictionary import define_dictionary, encoded_columns
+from .explain import Profile, explain, format_plan, parse_statement
+from .indexes import (
+    SEQUENCES_KEY,
+    adjust_row_count,
+    column_type,
+    create_index,
+    indexed_columns,
+    next_ids,
+    row_count,
+    sync_indexes,
+)
+from .manager import TableManager
+from .parallel import configure_parallel, parallel_settings, partition_matches
+from .partitions import (
+    define_partitioning,
+    describe,
+    merge_partitions,
+    parse_partition,
+    partition_count,
+    partition_spec,
+    partition_tables,
+    prune,
+    split_records,
+)
+from .predicates import clause_text, compile_where, parse_values, tokenize, where_text
+from .serialization import CODECS
+from .storage import PARTITION_MARK, LogStorage
+from .table_stats import TableStats, format_stats
+from .utils import (
+    CODEC_KEY,
+    STORAGE_KEY,
+    get_storage,
+    migrate_codec,
+    migrate_storage,
+    table_names,
+)
 
 
 def welcome():
@@ -29,279 +89,1015 @@ def welcome():
             print(f"Неизвестная команда: {command}")
 
 
-def display_table(data: list, columns: list) -> None:
+# Сколько строк выводится одной таблицей при постраничном выводе
+PAGE_SIZE = 50
+
+
+def display_table(data, columns: list, page_size: int = PAGE_SIZE) -> None:
     """Отображает данные в виде красивой таблицы.
     
+    Данные читаются лениво и выводятся страницами по page_size строк,
+    поэтому в памяти одновременно находится не больше одной страницы.
+    
     Args:
-        data: Данные для отображения
+        data: Данные для отображения (список или итератор по записям)
         columns: Список столбцов в формате ['ID:int', 'name:str', ...]
+        page_size: Число строк на странице
     """
-    if not data:
-        print("Нет данных для отображения")
-        return
-    
-    # Создаем таблицу
-    table = PrettyTable()
-    
     # Извлекаем названия столбцов (без типов)
     field_names = []
     for column in columns:
         col_name = column.split(':')[0]
         field_names.append(col_name)
     
-    table.field_names = field_names
-    
-    # Добавляем данные
-    for record in data:
-        row = []
-        for col_name in field_names:
-            row.append(record.get(col_name, ''))
+    table = None
+    shown = 0
+    for row in project(data, field_names):
+        if table is None:
+            table = PrettyTable()
+            table.field_names = field_names
         table.add_row(row)
+        shown += 1
+        if shown % page_size == 0:
+            print(table)
+            table = None
     
-    print(table)
+    if table is not None:
+        print(table)
+    if not shown:
+        print("Нет данных для отображения")
 
 
-def run():
-    """Главная функция с основным циклом программы"""
-    metadata_file = "db_meta.json"
-    
+def print_help() -> None:
+    """Выводит справку по командам."""
     print("***Операции с данными***\n")
     print("Функции:")
-    print("<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .. - создать таблицу")  # noqa: E501
+    print("<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .. [partition by hash(<столбец>) <N> | partition by range(ID) <N>] - создать таблицу")  # noqa: E501
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
-    print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...) - создать запись.")  # noqa: E501
+    print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...)[, (...)] - создать одну или несколько записей.")  # noqa: E501
     print("<command> select from <имя_таблицы> where <столбец> = <значение> - прочитать записи по условию.")  # noqa: E501
     print("<command> select from <имя_таблицы> - прочитать все записи.")
+    print("<command> select from <имя_таблицы> [where ...] limit <N> offset <M> - прочитать часть записей.")  # noqa: E501
+    print("<command> select count(*), sum|avg|min|max(<столбец>) from <имя_таблицы> [where ...] [group by <столбцы>] - агрегаты.")  # noqa: E501
+    print("    Условия: =, !=, <, <=, >, >=, IN (...), AND, OR, NOT и скобки.")
     print("<command> update <имя_таблицы> set <столбец1> = <новое_значение1> where <столбец_условия> = <значение_условия> - обновить запись.")  # noqa: E501
     print("<command> delete from <имя_таблицы> where <столбец> = <значение> - удалить запись.")  # noqa: E501
-    print("<command> info <имя_таблицы> - вывести информацию о таблице.")
+    print("<command> info <имя_таблицы> - вывести информацию о таблице и ее статистику.")  # noqa: E501
+    print("<command> analyze <имя_таблицы> - собрать статистику таблицы заново.")  # noqa: E501
+    print("<command> import <имя_таблицы> <файл.csv|файл.jsonl> - загрузить записи из файла.")  # noqa: E501
+    print("<command> export <имя_таблицы> <файл.csv|файл.jsonl> - выгрузить записи в файл.")  # noqa: E501
+    print("<command> create_index <имя_таблицы> <столбец> - создать индекс по столбцу.")  # noqa: E501
+    print("<command> dictionary <имя_таблицы> [<столбец> [on|off]] - словарное кодирование столбца str.")  # noqa: E501
+    print("<command> cache [clear | set <max_entries|max_bytes|ttl> <значение>] - статистика и настройки кэша запросов.")  # noqa: E501
+    print("<command> write_policy [immediate|deferred [N]] - показать или сменить политику записи.")  # noqa: E501
+    print("<command> columnar [on|off] - столбцовое представление таблиц в памяти.")  # noqa: E501
+    print("<command> parallel [workers <N> | cost <N>] - настройки параллельного просмотра больших таблиц.")  # noqa: E501
+    print("<command> explain <команда> - план select, update или delete: способ доступа и оценка числа записей.")  # noqa: E501
+    print("<command> profile [-o <файл.prof>] <команда> - время и память по этапам команды, статистика cProfile в файл.")  # noqa: E501
+    print("<command> stats [on|off|reset|json|prometheus] - метрики операций, просмотра строк, ввода-вывода и кэша.")  # noqa: E501
+    print("<command> flush - записать отложенные изменения на диск.")
+    print("<command> begin | commit | rollback - начать, зафиксировать или отменить транзакцию.")  # noqa: E501
+    print("<command> wal [checkpoint | sync <always|batch|off> [N]] - журнал упреждающей записи.")  # noqa: E501
+    print("<command> storage [json|log|mmap] - показать или сменить движок хранения.")  # noqa: E501
+    print("<command> codec [json|orjson|msgpack|binary] - показать или сменить кодек файлов таблиц.")  # noqa: E501
     print("<command> exit - выход из программы")
     print("<command> help - справочная информация")
+
+
+def execute(manager: TableManager, user_input: str) -> bool:
+    """Выполняет одну команду.
+    
+    Разбор и выполнение команды отделены от цикла чтения, поэтому одна и
+    та же функция обслуживает интерактивный режим и сценарии. Вне явной
+    транзакции все изменения команды фиксируются вместе.
+    
+    Args:
+        manager: Менеджер таблиц с метаданными и таблицами в памяти
+        user_input: Текст команды
+    
+    Returns:
+        bool: False, если получена команда exit, иначе True
+    """
+    command = shlex.split(user_input)[0].lower()
+    
+    if command == "begin":
+        manager.begin()
+        print("Транзакция начата.")
+    elif command == "commit":
+        in_transaction = manager.in_transaction
+        manager.commit()
+        if in_transaction:
+            print("Транзакция зафиксирована.")
+        else:
+            print("Изменения записаны на диск.")
+    elif command == "rollback":
+        manager.rollback()
+        print("Транзакция отменена.")
+    elif command == "profile":
+        match = PROFILE_COMMAND.match(user_input)
+        if match is None or not match.group(2).strip():
+            print("Ошибка: Используйте: profile [-o <файл.prof>] <команда>")
+            return True
+        output, statement = match.group(1), match.group(2).strip()
+        profile = profile_statement(manager, statement, output)
+        for line in profile.report():
+            print(line)
+        if output:
+            print(f"Статистика cProfile сохранена в {output}")
+    else:
+        with manager.autocommit():
+            return dispatch(manager, user_input)
+    return True
+
+
+# profile [-o файл] команда; текст команды берется как есть, с кавычками
+PROFILE_COMMAND = re.compile(r'\s*profile(?:\s+-o\s+(\S+))?\s*(.*)$',
+                             re.IGNORECASE | re.DOTALL)
+
+
+def profile_statement(manager: TableManager, statement: str,
+                      output: str = None) -> Profile:
+    """Выполняет команду, замеряя время и память по этапам.
+
+    Выборка делится на разбор, загрузку таблицы, фильтрацию и вывод.
+    У остальных команд отдельно замеряется только загрузка таблицы,
+    а выполнение вместе с фиксацией изменений - одним этапом.
+
+    Args:
+        manager: Менеджер таблиц
+        statement: Текст команды
+        output: Путь к файлу статистики cProfile или None
+
+    Returns:
+        Profile: Замеры этапов
+    """
+    profile = Profile()
+    with profile.running(output):
+        with profile.stage('parse'):
+            command, table_name, where_clause, limit, offset = parse_statement(statement)  # noqa: E501
+            metadata = manager.metadata()
+            exists = table_name in table_names(metadata)
+
+        if command == 'select' and exists:
+            with profile.stage('load'):
+                manager.table(table_name)
+            with profile.stage('filter'):
+                rows = list(select_records(manager, table_name, where_clause,
+                                           limit, offset))
+            with profile.stage('render'):
+                display_table(rows, metadata[table_name])
+            return profile
+
+        if exists:
+            with profile.stage('load'):
+                manager.table(table_name)
+        with profile.stage('execute'):
+            execute(manager, statement)
+    return profile
+
+
+def _require_table(metadata: dict, table_name: str) -> None:
+    if table_name not in table_names(metadata):
+        raise ValueError(f'Таблица "{table_name}" не существует.')
+
+
+@metrics.timed('create_table')
+def define_table(manager: TableManager, table_name: str, columns: list,
+                 partitioning: dict = None) -> list:
+    """Создает таблицу и сохраняет метаданные.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        columns: Столбцы вида имя:тип
+        partitioning: Секционирование из parse_partition или None
+
+    Returns:
+        list: Столбцы созданной таблицы вместе с ID
+
+    Raises:
+        ValueError: Если таблица уже существует, столбцы или
+            секционирование неверны
+    """
+    metadata = manager.lock_table(table_name)
+    # Новая база данных сразу использует журнальный движок хранения
+    if not table_names(metadata) and STORAGE_KEY not in metadata:
+        metadata[STORAGE_KEY] = LogStorage.name
+    metadata = create_table(metadata, table_name, columns)
+    if partitioning is not None:
+        metadata = define_partitioning(metadata, table_name, partitioning)
+    manager.save_metadata(metadata)
+    manager.set_statistics(table_name, TableStats.empty(metadata[table_name]))
+    return metadata[table_name]
+
+
+@metrics.timed('insert')
+def insert_records(manager: TableManager, table_name: str, rows: list) -> range:
+    """Проверяет значения и добавляет записи одной операцией.
+
+    Все записи проверяются до изменения таблицы, получают один диапазон
+    ID и записываются одним добавлением, поэтому стоимость записи на диск
+    и фиксации делится между ними.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        rows: Списки значений столбцов без ID
+
+    Returns:
+        range: ID новых записей
+
+    Raises:
+        ValueError: Если таблица не существует или значения неверны
+    """
+    # Запись в таблицу идет под ее блокировкой и по свежим метаданным
+    metadata = manager.lock_table(table_name)
+    _require_table(metadata, table_name)
+    validated = insert_many(metadata, table_name, rows)
+
+    # Выделяем ID из счетчика таблицы. Данные загружаются только
+    # для таблиц, у которых счетчика еще нет
+    table_data = None
+    if table_name not in metadata.get(SEQUENCES_KEY, {}):
+        table_data = manager.table(table_name)
+    ids = next_ids(metadata, table_name, len(validated), table_data)
+
+    names = [column.split(':')[0] for column in metadata[table_name][1:]]
+    new_records = [{'ID': record_id, **dict(zip(names, values))}
+                   for record_id, values in zip(ids, validated)]
+
+    for name, records in split_records(metadata, table_name, new_records).items():  # noqa: E501
+        manager.append(name, records)
+    sync_indexes(metadata, table_name, new_records=new_records)
+    manager.sync_statistics(table_name, new_records=new_records)
+    adjust_row_count(metadata, table_name, len(new_records), table_data)
+    manager.save_metadata(metadata)
+    return ids
+
+
+def insert_record(manager: TableManager, table_name: str, values: list) -> int:
+    """Проверяет значения и добавляет запись с новым ID.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        values: Значения столбцов без ID
+
+    Returns:
+        int: ID новой записи
+
+    Raises:
+        ValueError: Если таблица не существует или значения неверны
+    """
+    return insert_records(manager, table_name, [values])[0]
+
+
+def table_candidates(manager: TableManager, metadata: dict, table_name: str,
+                     predicate=None) -> list:
+    """Сужает таблицу до кандидатов для условия.
+
+    У секционированной таблицы загружаются только секции, оставшиеся после
+    отсечения по условию. Каждая из них сужается по ID или индексу, а при
+    полном просмотре большие секции проверяются параллельно, по процессу
+    на секцию. Кандидаты секций собираются в один список по ID.
+    Способ доступа выбирается по статистике таблицы, если она есть.
+
+    Args:
+        manager: Менеджер таблиц
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        predicate: Скомпилированное условие из compile_where или None
+
+    Returns:
+        list: Записи-кандидаты, упорядоченные по ID
+    """
+    stats = manager.statistics(table_name)
+    numbers = prune(metadata, table_name, predicate)
+    if numbers is None:
+        return index_scan(metadata, table_name, manager.table(table_name),
+                          predicate, stats)
+    parts = [index_scan(metadata, table_name, data, predicate, stats)
+             for data in manager.partitions(table_name, numbers)]
+    matches = partition_matches(parts, predicate)
+    if matches is not None:
+        parts = [[rows[position] for position in positions]
+                 for rows, positions in zip(parts, matches)]
+    return merge_partitions(metadata, table_name, parts)
+
+
+@metrics.timed('select')
+def select_records(manager: TableManager, table_name: str, where_clause=None,
+                   limit: int = None, offset: int = 0):
+    """Выбирает записи таблицы по условию.
+
+    Запрос с условием без limit/offset целиком берется из кэша, а
+    кандидаты для него собираются только при промахе кэша. Остальные
+    запросы выполняются лениво.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        where_clause: Дерево условия из parse_where_condition или None
+        limit: Максимальное число записей или None
+        offset: Сколько подходящих записей пропустить
+
+    Returns:
+        Список или итератор подходящих записей
+
+    Raises:
+        ValueError: Если таблица не существует или условие неверно
+    """
+    metadata = manager.metadata()
+    _require_table(metadata, table_name)
+    predicate = compile_where(where_clause, metadata[table_name])
+
+    if predicate is not None and limit is None and not offset:
+        return select_cacher(
+            select_cache_key(table_name, predicate,
+                             manager.signature(table_name)),
+            lambda: select(table_candidates(manager, metadata, table_name,
+                                            predicate), predicate))
+    candidates = table_candidates(manager, metadata, table_name, predicate)
+    return iter_select(candidates, predicate, limit, offset)
+
+
+@metrics.timed('aggregate')
+def aggregate_records(manager: TableManager, table_name: str, items: list,
+                      where_clause=None, group_by: list = ()) -> list:
+    """Вычисляет агрегатные функции по записям, подходящим под условие.
+
+    count(*) по счетчику записей или индексу отвечается без чтения таблицы,
+    остальные запросы - за один проход по подходящим записям.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        items: Выражения из parse_select_list
+        where_clause: Дерево условия из parse_where_condition или None
+        group_by: Столбцы группировки
+
+    Returns:
+        list: Строки результата в порядке выражений
+
+    Raises:
+        ValueError: Если таблица не существует или запрос неверен
+    """
+    metadata = manager.metadata()
+    _require_table(metadata, table_name)
+    columns = metadata[table_name]
+    group_by = list(group_by)
+    validate_aggregate(items, group_by, columns)
+    predicate = compile_where(where_clause, columns)
+
+    result = quick_aggregate(metadata, table_name, items, predicate, group_by)
+    if result is None:
+        if partition_spec(metadata, table_name) is not None:
+            table_data = table_candidates(manager, metadata, table_name,
+                                          predicate)
+        else:
+            table_data = manager.table(table_name)
+        rows = matching_rows(metadata, table_name, table_data, predicate,
+                             manager.statistics(table_name))
+        result = aggregate(rows, items, group_by)
+    return result
+
+
+@metrics.timed('update')
+def update_records(manager: TableManager, table_name: str, set_clause: dict,
+                   where_clause=None) -> int:
+    """Обновляет записи, подходящие под условие.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        set_clause: Новые значения {столбец: значение}
+        where_clause: Дерево условия из parse_where_condition или None
+
+    Returns:
+        int: Количество обновленных записей
+
+    Raises:
+        ValueError: Если таблица не существует условие неверно
+            или SET меняет ID
+    """
+    metadata = manager.lock_table(table_name)
+    _require_table(metadata, table_name)
+    predicate = compile_where(where_clause, metadata[table_name])
+    # ID - ключ записи в памяти, на диске и в индексах, поэтому не меняется
+    if 'ID' in set_clause:
+        raise ValueError('Столбец ID нельзя изменить.')
+    spec = partition_spec(metadata, table_name)
+    if spec is not None and spec['column'] in set_clause:
+        raise ValueError(f'Столбец секционирования "{spec["column"]}" '
+                         'нельзя изменить.')
+
+    # Выполняем обновление: кандидаты берутся по ID или индексу из нужных
+    # секций, копируются только подошедшие записи
+    candidates = table_candidates(manager, metadata, table_name, predicate)
+    pairs = update(candidates, set_clause, predicate)
+
+    # Менеджер заменяет записи на месте и сохраняет только их. Прежний ID
+    # передается вместе с новой версией: хранилище проверяет, что он не изменен
+    if pairs:
+        changed = [new for old, new in pairs]
+        updates = [(old['ID'], new) for old, new in pairs]
+        for name, group in split_records(metadata, table_name, updates,
+                                         record=itemgetter(1)).items():
+            manager.update(name, group)
+        old_records = [old for old, new in pairs]
+        sync_indexes(metadata, table_name, old_records=old_records,
+                     new_records=changed)
+        manager.sync_statistics(table_name, old_records, changed)
+    return len(pairs)
+
+
+@metrics.timed('delete')
+def delete_records(manager: TableManager, table_name: str,
+                   where_clause=None) -> int:
+    """Удаляет записи, подходящие под условие.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        where_clause: Дерево условия из parse_where_condition или None
+
+    Returns:
+        int: Количество удаленных записей
+
+    Raises:
+        ValueError: Если таблица не существует или условие неверно
+    """
+    metadata = manager.lock_table(table_name)
+    _require_table(metadata, table_name)
+    predicate = compile_where(where_clause, metadata[table_name])
+
+    # Выполняем удаление: delete возвращает только удаляемые записи
+    candidates = table_candidates(manager, metadata, table_name, predicate)
+    deleted = delete(candidates, predicate)
+
+    # Менеджер удаляет записи на месте и сохраняет только их надгробия
+    if deleted:
+        for name, records in split_records(metadata, table_name, deleted).items():  # noqa: E501
+            manager.delete(name, [record['ID'] for record in records])
+        sync_indexes(metadata, table_name, old_records=deleted)
+        manager.sync_statistics(table_name, old_records=deleted)
+        # Данные нужны только таблицам, у которых еще нет счетчика записей
+        table_data = None
+        if row_count(metadata, table_name) is None:
+            table_data = manager.table(table_name)
+        adjust_row_count(metadata, table_name, -len(deleted), table_data)
+        manager.save_metadata(metadata)
+    return len(deleted)
+
+
+@metrics.timed('analyze')
+def analyze_table(manager: TableManager, table_name: str) -> TableStats:
+    """Собирает статистику таблицы заново по ее данным.
+
+    Статистика поддерживается при каждом изменении, но число различных
+    значений и границы столбцов после удаления записей не уменьшаются,
+    а частые значения после вытеснения оцениваются с завышением.
+    Пересборка делает оценки точными.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+
+    Returns:
+        TableStats: Новая статистика таблицы
+
+    Raises:
+        ValueError: Если таблица не существует
+    """
+    metadata = manager.lock_table(table_name)
+    _require_table(metadata, table_name)
+    stats = TableStats.build(metadata[table_name], manager.table(table_name))
+    manager.set_statistics(table_name, stats)
+    return stats
+
+
+@metrics.timed('dictionary')
+def encode_column(manager: TableManager, table_name: str, column: str,
+                  enabled: bool) -> list:
+    """Включает или выключает словарное кодирование столбца str.
+
+    Журнал таблицы сразу переписывается в новом виде: со словарем перед
+    каждой пачкой записей и номерами строк в записях (или снова со
+    строками). В памяти таблица перечитывается при следующем обращении.
+
+    Args:
+        manager: Менеджер таблиц
+        table_name: Имя таблицы
+        column: Имя столбца
+        enabled: Включить (True) или выключить (False)
+
+    Returns:
+        list: Столбцы таблицы в словарном кодировании
+
+    Raises:
+        ValueError: Если таблица не существует, столбец не str или
+            открыта транзакция
+    """
+    if manager.in_transaction:
+        raise ValueError("Перекодирование файлов таблицы нельзя выполнить в транзакции.")  # noqa: E501
+    metadata = manager.lock_table(table_name)
+    _require_table(metadata, table_name)
+    col_type = column_type(metadata, table_name, column)
+    if col_type != 'str':
+        raise ValueError(f'Словарное кодирование возможно только для столбцов '
+                         f'str, а не {column}:{col_type}.')
+    # Журнал не должен ссылаться на файлы в прежнем виде
+    manager.flush()
+    manager.checkpoint()
+    metadata = define_dictionary(metadata, table_name, column, enabled)
+    storage = get_storage(metadata)
+    # Остальные движки хранят строки в файле как есть
+    if isinstance(storage, LogStorage):
+        for name in partition_tables(metadata, table_name):
+            storage.wait(name)
+            storage.save(name, storage.load(name))
+    manager.forget(table_name)
+    manager.save_metadata(metadata)
+    manager.flush()
+    return encoded_columns(metadata, table_name)
+
+
+def dispatch(manager: TableManager, user_input: str) -> bool:
+    """Разбирает и выполняет команду, не управляя транзакциями.
+    
+    Args:
+        manager: Менеджер таблиц с метаданными и таблицами в памяти
+        user_input: Текст команды
+    
+    Returns:
+        bool: False, если получена команда exit, иначе True
+    """
+    args = shlex.split(user_input)
+    command = args[0].lower()
+
+    # Получаем актуальные метаданные
+    metadata = manager.metadata()
+
+    if command == "exit":
+        return False
+
+    elif command == "help":
+        print_help()
+        
+    elif command == "create_table":
+        if len(args) < 3:
+            print("Ошибка: Недостаточно аргументов для create_table")
+            return True
+        table_name = args[1]
+        if ':' in table_name or PARTITION_MARK in table_name:
+            print(f'Ошибка: Некорректное имя таблицы "{table_name}". '
+                  f'Имя таблицы не должно содержать двоеточие и {PARTITION_MARK}.')  # noqa: E501
+            return True
+        columns, partitioning = parse_partition(args[2:])
+        column_list = ", ".join(define_table(manager, table_name, columns,
+                                             partitioning))
+        print(f'Таблица "{table_name}" успешно создана со столбцами: {column_list}')  # noqa: E501
+        if partitioning is not None:
+            print(f'Секционирование: {describe(partitioning)}')
+
+    elif command == "list_tables":
+        if not table_names(metadata):
+            print("Нет созданных таблиц")
+        else:
+            for table_name in table_names(metadata):
+                print(f"- {table_name}")
+
+    elif command == "drop_table":
+        if len(args) < 2:
+            print("Ошибка: Недостаточно аргументов для drop_table")
+            return True
+        table_name = args[1]
+        metadata = manager.lock_table(table_name)
+        columns = list(indexed_columns(metadata, table_name))
+        partitions = []
+        if partition_spec(metadata, table_name) is not None:
+            partitions = partition_tables(metadata, table_name)
+        metadata = drop_table(metadata, table_name)
+        if table_name in metadata:
+            # Удаление отменено при подтверждении
+            return True
+        # Метаданные и удаление файлов фиксируются одной записью журнала
+        manager.drop(table_name, metadata, columns, partitions)
+        print(f'Таблица "{table_name}" успешно удалена.')
+
+    elif command == "insert":
+        if len(args) < 5 or args[1].lower() != "into" or args[3].lower() != "values":  # noqa: E501
+            print("Ошибка: Неверный формат команды insert. Используйте: insert into <таблица> values (<значения>)")  # noqa: E501
+            return True
+
+        table_name = args[2]
+        # Запись в таблицу идет под ее блокировкой и по свежим метаданным
+        metadata = manager.lock_table(table_name)
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        # Кортежи значений разбираются по исходной строке: строки
+        # в кавычках могут содержать запятые и скобки
+        rows = parse_values(user_input.split(None, 4)[4])
+        ids = insert_records(manager, table_name, rows)
+        if len(ids) == 1:
+            print(f'Запись с ID={ids[0]} успешно добавлена в таблицу "{table_name}".')  # noqa: E501
+        else:
+            print(f'Добавлено {len(ids)} записей в таблицу "{table_name}" '
+                  f'(ID {ids[0]}-{ids[-1]}).')
+
+    elif command == "select":
+        if len(args) >= 2 and args[1].lower() != "from":
+            # select <функции> from <таблица> ... - агрегатный запрос
+            items, table_name, where_clause, group_by, limit, offset = parse_aggregate(user_input)  # noqa: E501
+            if table_name not in table_names(metadata):
+                print(f'Ошибка: Таблица "{table_name}" не существует.')
+                return True
+            rows = aggregate_records(manager, table_name, items,
+                                     where_clause, group_by)
+            stop = None if limit is None else offset + limit
+            labels = [label(item) for item in items]
+            display_table((dict(zip(labels, row)) for row in rows[offset:stop]),
+                          labels)
+            return True
+
+        if len(args) < 3 or args[1].lower() != "from":
+            print("Ошибка: Неверный формат команды select. Используйте: select from <таблица> [where условие]")  # noqa: E501
+            return True
+
+        table_name = args[2]
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        # Проверяем наличие условия WHERE и частей LIMIT/OFFSET
+        # Условие берется из исходной строки, чтобы сохранить кавычки
+        _, limit, offset = parse_limit_offset(tokenize(user_input)[3:])
+        where_clause = parse_where_condition(where_text(user_input))
+
+        # Запрос с условием целиком берется из кэша, остальные
+        # выполняются лениво и выводятся постранично
+        result_data = select_records(manager, table_name, where_clause,
+                                     limit, offset)
+        display_table(result_data, metadata[table_name])
+
+    elif command == "update":
+        if len(args) < 6:
+            print("Ошибка: Неверный формат команды update. Используйте: update <таблица> set <столбец>=<значение> where <условие>")  # noqa: E501
+            return True
+
+        table_name = args[1]
+        metadata = manager.lock_table(table_name)
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        if args[2].lower() != "set":
+            print("Ошибка: Отсутствует ключевое слово SET")
+            return True
+
+        # Парсим SET условие по исходной строке, чтобы сохранить кавычки
+        set_clause = parse_set_clause(clause_text(user_input, 'set', ('where',)))
+
+        # Парсим WHERE условие
+        where_clause = parse_where_condition(where_text(user_input, ()))
+        updated_count = update_records(manager, table_name, set_clause,
+                                       where_clause)
+        print(f'Обновлено {updated_count} записей в таблице "{table_name}".')  # noqa: E501
+
+    elif command == "delete":
+        if len(args) < 4 or args[1].lower() != "from":
+            print("Ошибка: Неверный формат команды delete. Используйте: delete from <таблица> where <условие>")  # noqa: E501
+            return True
+
+        table_name = args[2]
+        metadata = manager.lock_table(table_name)
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        if args[3].lower() != "where":
+            print("Ошибка: Отсутствует ключевое слово WHERE")
+            return True
+
+        # Парсим WHERE условие
+        where_clause = parse_where_condition(where_text(user_input, ()))
+        deleted_count = delete_records(manager, table_name, where_clause)
+        print(f'Удалено {deleted_count} записей из таблицы "{table_name}".')  # noqa: E501
+
+    elif command == "info":
+        if len(args) < 2:
+            print("Ошибка: Недостаточно аргументов для info")
+            return True
+
+        table_name = args[1]
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        columns = metadata[table_name]
+        column_list = ", ".join(columns)
+        # Число записей берется из счетчика; таблицы без счетчика
+        # загружаются (или берутся из памяти, если уже загружены)
+        record_count = row_count(metadata, table_name)
+        if record_count is None:
+            record_count = len(manager.table(table_name))
+
+        print(f"Таблица: {table_name}")
+        print(f"Столбцы: {column_list}")
+        print(f"Количество записей: {record_count}")
+        indexes = indexed_columns(metadata, table_name)
+        print(f"Индексы: {', '.join(indexes) if indexes else 'нет'}")
+        encoded = encoded_columns(metadata, table_name)
+        print(f"Словарное кодирование: {', '.join(encoded) if encoded else 'нет'}")  # noqa: E501
+        spec = partition_spec(metadata, table_name)
+        if spec is not None:
+            print(f"Секционирование: {describe(spec)}, "
+                  f"секций: {partition_count(metadata, table_name)}")
+        stats = manager.statistics(table_name)
+        if stats is None:
+            print(f"Статистика: нет (выполните analyze {table_name})")
+        else:
+            for line in format_stats(stats):
+                print(line)
+
+    elif command == "dictionary":
+        if len(args) < 2:
+            print("Ошибка: Недостаточно аргументов для dictionary")
+            return True
+
+        table_name = args[1]
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        if len(args) >= 3:
+            state = args[3].lower() if len(args) > 3 else "on"
+            if state not in ("on", "off"):
+                print("Ошибка: Используйте: dictionary <таблица> [<столбец> [on|off]]")  # noqa: E501
+                return True
+            encode_column(manager, table_name, args[2], state == "on")
+        encoded = encoded_columns(manager.metadata(), table_name)
+        print(f"Словарное кодирование: {', '.join(encoded) if encoded else 'нет'}")  # noqa: E501
+
+    elif command == "analyze":
+        if len(args) < 2:
+            print("Ошибка: Недостаточно аргументов для analyze")
+            return True
+
+        table_name = args[1]
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        stats = analyze_table(manager, table_name)
+        print(f'Статистика таблицы "{table_name}" собрана: записей {stats.rows}.')  # noqa: E501
+
+    elif command in ("import", "export"):
+        if len(args) < 3:
+            print(f"Ошибка: Используйте: {command} <таблица> <файл.csv|файл.jsonl>")  # noqa: E501
+            return True
+
+        table_name, path = args[1], args[2]
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        if command == "import":
+            count = import_rows(manager, table_name, path)
+            print(f'Загружено {count} записей в таблицу "{table_name}".')  # noqa: E501
+        else:
+            count = export_rows(manager, table_name, path)
+            print(f'Выгружено {count} записей из таблицы "{table_name}" в {path}.')  # noqa: E501
+
+    elif command == "create_index":
+        if len(args) < 3:
+            print("Ошибка: Недостаточно аргументов для create_index")
+            return True
+
+        table_name, column = args[1], args[2]
+        metadata = manager.lock_table(table_name)
+        if table_name not in table_names(metadata):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return True
+
+        table_data = manager.table(table_name)
+        metadata = create_index(metadata, table_name, column, table_data)
+        manager.save_metadata(metadata)
+        print(f'Индекс по столбцу "{column}" таблицы "{table_name}" создан.')  # noqa: E501
+
+    elif command == "cache":
+        if len(args) >= 2 and args[1].lower() == "clear":
+            select_cacher.clear()
+            print("Кэш запросов очищен.")
+            return True
+
+        if len(args) >= 4 and args[1].lower() == "set":
+            param, value = args[2].lower(), args[3].lower()
+            if param == "ttl":
+                value = None if value == "none" else float(value)
+            else:
+                value = int(value)
+            select_cacher.configure(**{param: value})
+
+        for name, value in select_cacher.stats().items():
+            print(f"{name}: {value}")
+
+    elif command == "explain":
+        statement = user_input.strip()[len(args[0]):].strip()
+        if not statement:
+            print("Ошибка: Используйте: explain <select|update|delete ...>")
+            return True
+        for line in format_plan(explain(manager, statement)):
+            print(line)
+
+    elif command == "stats":
+        option = args[1].lower() if len(args) > 1 else ""
+        if option in ("on", "off"):
+            metrics.set_enabled(option == "on")
+        elif option == "reset":
+            metrics.reset()
+        elif option == "json":
+            print(metrics.to_json())
+            return True
+        elif option == "prometheus":
+            print(metrics.to_prometheus(), end="")
+            return True
+        elif option:
+            print("Ошибка: Используйте: stats [on|off|reset|json|prometheus]")
+            return True
+        for line in metrics.report():
+            print(line)
+
+    elif command == "write_policy":
+        if len(args) < 2:
+            print(f"Политика записи: {manager.write_policy}")
+            return True
+
+        flush_every = int(args[2]) if len(args) > 2 else 0
+        manager.set_write_policy(args[1].lower(), flush_every)
+        print(f"Политика записи: {manager.write_policy}")
+
+    elif command == "columnar":
+        if len(args) >= 2:
+            if args[1].lower() not in ("on", "off"):
+                print("Ошибка: Используйте: columnar on|off")
+                return True
+            manager.set_columnar(args[1].lower() == "on")
+        state = "включено" if manager.columnar else "выключено"
+        print(f"Столбцовое представление таблиц: {state}")
+
+    elif command == "parallel":
+        if len(args) >= 3 and args[1].lower() in ("workers", "cost"):
+            configure_parallel(**{args[1].lower(): int(args[2])})
+        elif len(args) >= 2:
+            print("Ошибка: Используйте: parallel [workers <N> | cost <N>]")
+            return True
+        for name, value in parallel_settings().items():
+            print(f"{name}: {value}")
+
+    elif command == "flush":
+        manager.flush()
+        print("Изменения записаны на диск.")
+        
+    elif command == "wal":
+        if len(args) >= 2 and args[1].lower() == "checkpoint":
+            manager.checkpoint()
+            print("Контрольная точка выполнена, журнал очищен.")
+            return True
+        
+        if len(args) >= 3 and args[1].lower() == "sync":
+            sync_every = int(args[3]) if len(args) > 3 else None
+            manager.wal.configure(args[2].lower(), sync_every)
+        
+        for name, value in manager.wal.stats().items():
+            print(f"{name}: {value}")
+
+    elif command == "storage":
+        if len(args) < 2:
+            print(f"Движок хранения: {get_storage(metadata).name}")
+            return True
+
+        if manager.in_transaction:
+            raise ValueError("Перенос файлов таблиц нельзя выполнить в транзакции.")
+        for table_name in sorted(table_names(metadata)):
+            metadata = manager.lock_table(table_name)
+        # Журнал не должен ссылаться на файлы прежнего движка
+        manager.flush()
+        manager.checkpoint()
+        metadata = migrate_storage(metadata, args[1].lower())
+        manager.forget()
+        manager.save_metadata(metadata)
+        # Файлы уже перенесены, поэтому новые метаданные записываются сразу
+        # и при отложенной политике записи
+        manager.flush()
+        print(f"Движок хранения: {metadata[STORAGE_KEY]}")
+
+    elif command == "codec":
+        if len(args) < 2:
+            current = get_storage(metadata).codec.name
+            print(f"Кодек: {current}. Доступные: {', '.join(CODECS)}")
+            return True
+
+        if manager.in_transaction:
+            raise ValueError("Перенос файлов таблиц нельзя выполнить в транзакции.")
+        for table_name in sorted(table_names(metadata)):
+            metadata = manager.lock_table(table_name)
+        # Журнал не должен ссылаться на файлы в прежнем формате
+        manager.flush()
+        manager.checkpoint()
+        metadata = migrate_codec(metadata, args[1].lower())
+        manager.forget()
+        manager.save_metadata(metadata)
+        # Файлы уже перенесены, поэтому новые метаданные записываются сразу
+        # и при отложенной политике записи
+        manager.flush()
+        print(f"Кодек: {metadata[CODEC_KEY]}")
+
+    else:
+        print(f'Функции "{command}" нет. Попробуйте снова.')
+    
+    return True
+
+
+def report_recovery(manager: TableManager) -> None:
+    """Сообщает о транзакциях, восстановленных из журнала после сбоя."""
+    if manager.recovered:
+        print(f"Восстановлено транзакций из журнала: {manager.recovered}")
+
+
+def script_lines(lines):
+    """Выделяет команды из строк сценария.
+    
+    Пустые строки и комментарии (начинающиеся с "--" или "#") пропускаются,
+    точка с запятой в конце команды отбрасывается.
+    
+    Args:
+        lines: Итератор по строкам сценария
+    
+    Yields:
+        tuple: (номер строки, команда)
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith(('--', '#')):
+            continue
+        yield number, line.rstrip(';').strip()
+
+
+def run_script(lines, manager: TableManager = None) -> int:
+    """Выполняет команды сценария в одном процессе.
+    
+    Таблицы остаются в памяти на все время сценария, а изменения копятся
+    по отложенной политике записи и сохраняются на диск только в точках
+    фиксации (команды commit и flush) и в конце сценария.
+    
+    Args:
+        lines: Итератор по строкам сценария (файл или stdin)
+        manager: Менеджер таблиц; по умолчанию создается новый
+    
+    Returns:
+        int: Число команд, завершившихся ошибкой
+    """
+    manager = manager or TableManager("db_meta.json", write_policy='deferred')
+    report_recovery(manager)
+    errors = 0
+    try:
+        for number, command in script_lines(lines):
+            try:
+                if not execute(manager, command):
+                    break
+            except Exception as e:
+                # Изменения неудавшейся команды уже отменены
+                # (TableManager.autocommit), изменения предыдущих сохранены
+                errors += 1
+                print(f"Ошибка в строке {number}: {e}")
+    finally:
+        manager.close()
+    return errors
+
+
+def run():
+    """Главная функция с основным циклом программы"""
+    # Метаданные и таблицы остаются в памяти между командами
+    manager = TableManager("db_meta.json")
+    
+    print_help()
+    report_recovery(manager)
     
     while True:
         try:
             user_input = input("\n>>> Введите команду: ").strip()
             if not user_input:
                 continue
-                
-            args = shlex.split(user_input)
-            command = args[0].lower()
             
-            # Загружаем актуальные метаданные
-            metadata = load_metadata(metadata_file)
-            
-            if command == "exit":
+            if not execute(manager, user_input):
+                manager.close()
                 print("Выход из программы.")
                 break
                 
-            elif command == "help":
-                print("***Операции с данными***")
-                print("Функции:")
-                print("<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .. - создать таблицу")  # noqa: E501
-                print("<command> list_tables - показать список всех таблиц")
-                print("<command> drop_table <имя_таблицы> - удалить таблицу")
-                print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...) - создать запись.")  # noqa: E501
-                print("<command> select from <имя_таблицы> where <столбец> = <значение> - прочитать записи по условию.")  # noqa: E501
-                print("<command> select from <имя_таблицы> - прочитать все записи.")
-                print("<command> update <имя_таблицы> set <столбец1> = <новое_значение1> where <столбец_условия> = <значение_условия> - обновить запись.")  # noqa: E501
-                print("<command> delete from <имя_таблицы> where <столбец> = <значение> - удалить запись.")  # noqa: E501
-                print("<command> info <имя_таблицы> - вывести информацию о таблице.")
-                print("<command> exit - выход из программы")
-                print("<command> help - справочная информация")
-                
-            elif command == "create_table":
-                if len(args) < 3:
-                    print("Ошибка: Недостаточно аргументов для create_table")
-                    continue
-                table_name = args[1]
-                if ':' in table_name:
-                    print(f'Ошибка: Некорректное имя таблицы "{table_name}". '
-                          'Имя таблицы не должно содержать двоеточие.')
-                    continue
-                columns = args[2:]
-                metadata = create_table(metadata, table_name, columns)
-                save_metadata(metadata_file, metadata)
-                column_list = ", ".join(metadata[table_name])
-                print(f'Таблица "{table_name}" успешно создана со столбцами: {column_list}')  # noqa: E501
-                    
-            elif command == "list_tables":
-                if not metadata:
-                    print("Нет созданных таблиц")
-                else:
-                    for table_name in metadata:
-                        print(f"- {table_name}")
-                        
-            elif command == "drop_table":
-                if len(args) < 2:
-                    print("Ошибка: Недостаточно аргументов для drop_table")
-                    continue
-                table_name = args[1]
-                metadata = drop_table(metadata, table_name)
-                save_metadata(metadata_file, metadata)
-                print(f'Таблица "{table_name}" успешно удалена.')
-                
-            elif command == "insert":
-                if len(args) < 4 or args[1].lower() != "into" or args[3].lower() != "values":  # noqa: E501
-                    print("Ошибка: Неверный формат команды insert. Используйте: insert into <таблица> values (<значения>)")  # noqa: E501
-                    continue
-                
-                table_name = args[2]
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-                
-                # Извлекаем значения из скобок
-                values_str = ' '.join(args[4:])
-                if not values_str.startswith('(') or not values_str.endswith(')'):  # noqa: E501
-                    print("Ошибка: Значения должны быть в скобках")
-                    continue
-                
-                values_str = values_str[1:-1]  # Убираем скобки
-                values = [v.strip().strip('"\'') for v in values_str.split(',')]
-                
-                # Загружаем данные таблицы
-                table_data = load_table_data(table_name)
-                
-                validated_values = insert(metadata, table_name, values)
-                
-                # Генерируем новый ID
-                if table_data:
-                    max_id = max(record.get('ID', 0) for record in table_data)  # noqa: E501
-                    new_id = max_id + 1
-                else:
-                    new_id = 1
-                
-                # Создаем новую запись
-                columns = metadata[table_name]
-                new_record = {'ID': new_id}
-                
-                # Добавляем остальные значения
-                for i, column in enumerate(columns[1:]):  # Пропускаем ID
-                    col_name = column.split(':')[0]
-                    new_record[col_name] = validated_values[i]
-                
-                table_data.append(new_record)
-                save_table_data(table_name, table_data)
-                print(f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".')  # noqa: E501
-                    
-            elif command == "select":
-                if len(args) < 3 or args[1].lower() != "from":
-                    print("Ошибка: Неверный формат команды select. Используйте: select from <таблица> [where условие]")  # noqa: E501
-                    continue
-                
-                table_name = args[2]
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-                
-                # Загружаем данные таблицы
-                table_data = load_table_data(table_name)
-                
-                # Проверяем наличие условия WHERE
-                where_clause = {}
-                if len(args) > 4 and args[3].lower() == "where":
-                    where_str = ' '.join(args[4:])
-                    where_clause = parse_where_condition(where_str)
-                
-                # Выполняем выборку
-                result_data = select(table_data, where_clause)
-                display_table(result_data, metadata[table_name])
-                
-            elif command == "update":
-                if len(args) < 6:
-                    print("Ошибка: Неверный формат команды update. Используйте: update <таблица> set <столбец>=<значение> where <условие>")  # noqa: E501
-                    continue
-                
-                table_name = args[1]
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-                
-                if args[2].lower() != "set":
-                    print("Ошибка: Отсутствует ключевое слово SET")
-                    continue
-                
-                # Парсим SET условие
-                set_parts = []
-                i = 3
-                while i < len(args) and args[i].lower() != "where":
-                    set_parts.append(args[i])
-                    i += 1
-                
-                set_str = ' '.join(set_parts)
-                set_clause = parse_set_clause(set_str)
-                
-                # Парсим WHERE условие
-                where_clause = {}
-                if i < len(args) and args[i].lower() == "where":
-                    where_str = ' '.join(args[i+1:])
-                    where_clause = parse_where_condition(where_str)
-                
-                # Загружаем данные таблицы
-                table_data = load_table_data(table_name)
-                
-                # Выполняем обновление
-                updated_data = update(table_data, set_clause, where_clause)
-                save_table_data(table_name, updated_data)
-                
-                # Подсчитываем количество обновленных записей
-                original_count = len(table_data)
-                updated_count = len([r for r in updated_data if r not in table_data])  # noqa: E501
-                print(f'Обновлено {updated_count} записей в таблице "{table_name}".')  # noqa: E501
-                
-            elif command == "delete":
-                if len(args) < 4 or args[1].lower() != "from":
-                    print("Ошибка: Неверный формат команды delete. Используйте: delete from <таблица> where <условие>")  # noqa: E501
-                    continue
-                
-                table_name = args[2]
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-                
-                if args[3].lower() != "where":
-                    print("Ошибка: Отсутствует ключевое слово WHERE")
-                    continue
-                
-                # Парсим WHERE условие
-                where_str = ' '.join(args[4:])
-                where_clause = parse_where_condition(where_str)
-                
-                # Загружаем данные таблицы
-                table_data = load_table_data(table_name)
-                
-                # Выполняем удаление
-                original_count = len(table_data)
-                updated_data = delete(table_data, where_clause)
-                save_table_data(table_name, updated_data)
-                
-                deleted_count = original_count - len(updated_data)
-                print(f'Удалено {deleted_count} записей из таблицы "{table_name}".')  # noqa: E501
-                
-            elif command == "info":
-                if len(args) < 2:
-                    print("Ошибка: Недостаточно аргументов для info")
-                    continue
-                
-                table_name = args[1]
-                if table_name not in metadata:
-                    print(f'Ошибка: Таблица "{table_name}" не существует.')
-                    continue
-                
-                # Загружаем данные таблицы
-                table_data = load_table_data(table_name)
-                
-                columns = metadata[table_name]
-                column_list = ", ".join(columns)
-                record_count = len(table_data)
-                
-                print(f"Таблица: {table_name}")
-                print(f"Столбцы: {column_list}")
-                print(f"Количество записей: {record_count}")
-                
-            else:
-                print(f'Функции "{command}" нет. Попробуйте снова.')
-                
         except Exception as e:
-            print(f"Ошибка: {e}")
\ No newline at end of file
+            # Изменения неудавшейся команды уже отменены (TableManager.autocommit)
+            print(f"Ошибка: {e}")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import cProfile
+import shlex
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from .core import access_path, select_cache_key, select_cacher
+from .decorators import parse_limit_offset
+from .indexes import find_by_id, id_positions, lookup, row_count
+from .parallel import scan_workers
+from .partitions import merge_partitions, partition_count, prune
+from .predicates import compile_where, conjuncts, parse_where, tokenize, where_text
+from .table_stats import selectivity
+from .utils import table_names
+
+ACCESS_NAMES = {
+    'cache': 'результат из кэша запросов',
+    'all': 'все записи без условия',
+    'id': 'поиск по ID двоичным поиском',
+    'id_range': 'диапазон ID двоичным поиском',
+    'index': 'хеш-индекс',
+    'columnar': 'столбцовый просмотр',
+    'scan': 'полный просмотр',
+}
+
+
+def _residual(node, skip, stats=None) -> float:
+    """Оценивает долю условий верхнего AND, кроме проверенных индексом."""
+    fraction = 1.0
+    for condition in conjuncts(node):
+        if not skip(condition):
+            fraction *= selectivity(condition, stats)
+    return fraction
+
+
+def parse_statement(statement: str) -> tuple:
+    """Выделяет из команды таблицу, условие и части LIMIT/OFFSET.
+
+    Args:
+        statement: Текст команды select, update или delete
+
+    Returns:
+        tuple: (команда, таблица, дерево условия, limit, offset); для других
+            команд таблица и условие - None
+    """
+    args = shlex.split(statement)
+    command = args[0].lower() if args else ''
+    if command == 'select' and len(args) >= 3 and args[1].lower() == 'from':
+        _, limit, offset = parse_limit_offset(tokenize(statement)[3:])
+        return command, args[2], parse_where(where_text(statement)), limit, offset  # noqa: E501
+    if command == 'update' and len(args) >= 2:
+        return command, args[1], parse_where(where_text(statement, ())), None, 0
+    if command == 'delete' and len(args) >= 3 and args[1].lower() == 'from':
+        return command, args[2], parse_where(where_text(statement, ())), None, 0
+    return command, None, None, None, 0
+
+
+def explain(manager, statement: str) -> dict:
+    """Строит план команды, не выполняя ее.
+
+    Способ доступа выбирается той же функцией access_path и по той же
+    статистике таблицы, что и при выполнении. Для поиска по ID и по
+    индексу число записей известно точно, для просмотра оценивается по
+    статистике, а без нее - по виду условия. У секционированной таблицы
+    загружаются только секции, оставшиеся после отсечения.
+
+    Args:
+        manager: Менеджер таблиц
+        statement: Текст команды select, update или delete
+
+    Returns:
+        dict: План: таблица, число записей, способ доступа, число
+            просматриваемых записей, оценка результата, число процессов,
+            число просматриваемых секций и всех секций
+
+    Raises:
+        ValueError: Если команда не поддерживается или таблицы нет
+    """
+    command, table_name, where_clause, limit, offset = parse_statement(statement)  # noqa: E501
+    if table_name is None:
+        raise ValueError('explain поддерживает команды select, update и delete.')
+    metadata = manager.metadata()
+    if table_name not in table_names(metadata):
+        raise ValueError(f'Таблица "{table_name}" не существует.')
+
+    predicate = compile_where(where_clause, metadata[table_name])
+    node = predicate.node if predicate is not None else None
+    numbers = prune(metadata, table_name, predicate)
+    partitions = None
+    if numbers is None:
+        table_data = manager.table(table_name)
+        total = len(table_data)
+    else:
+        table_data = merge_partitions(metadata, table_name,
+                                      manager.partitions(table_name, numbers))
+        total = row_count(metadata, table_name)
+        if total is None:
+            total = len(manager.table(table_name))
+        partitions = (len(numbers), partition_count(metadata, table_name))
+    stats = manager.statistics(table_name)
+    kind, argument = access_path(metadata, table_name, table_data, predicate,
+                                 stats)
+
+    detail = ''
+    if kind == 'id':
+        scanned = 1 if find_by_id(table_data, argument) is not None else 0
+        estimated = scanned * _residual(node, lambda item: item[1] == 'ID',
+                                        stats)
+        detail = f'ID = {argument}'
+    elif kind == 'id_range':
+        start, end = id_positions(table_data, *argument)
+        scanned = end - start
+        estimated = scanned * _residual(node, lambda item: item[1] == 'ID',
+                                        stats)
+        low, high = argument
+        detail = f'ID от {"-" if low is None else low} до {"-" if high is None else high}'  # noqa: E501
+    elif kind == 'index':
+        column = argument[0]
+        scanned = len(lookup(metadata, table_name, *argument))
+        estimated = scanned * _residual(
+            node, lambda item: item[0] in ('cmp', 'in') and item[1] == column
+            and (item[0] == 'in' or item[2] == '='), stats)
+        detail = f'столбец {column}'
+    else:
+        scanned = len(table_data)
+        estimated = scanned * selectivity(node, stats)
+
+    cached = (command == 'select' and predicate is not None and limit is None
+              and not offset
+              and select_cacher.contains(select_cache_key(
+                  table_name, predicate, manager.signature(table_name))))
+    if cached:
+        kind, scanned = 'cache', 0
+
+    # Кэшируемый select без limit/offset делит полный просмотр списка
+    # записей между процессами
+    workers = 1
+    if (kind == 'scan' and command == 'select' and limit is None
+            and not offset):
+        workers = scan_workers(table_data, predicate)
+
+    estimated = round(estimated)
+    if limit is not None:
+        estimated = min(max(estimated - offset, 0), limit)
+    return {
+        'command': command,
+        'table': table_name,
+        'rows': total,
+        'access': kind,
+        'detail': detail,
+        'scanned': scanned,
+        'estimated': estimated,
+        'workers': workers,
+        'partitions': partitions,
+        'limit': limit,
+        'offset': offset,
+    }
+
+
+def format_plan(plan: dict) -> list:
+    """Возвращает план строками для вывода в консоль."""
+    access = ACCESS_NAMES[plan['access']]
+    if plan['detail']:
+        access += f" ({plan['detail']})"
+    lines = [
+        f"Команда: {plan['command']}",
+        f"Таблица: {plan['table']} (записей: {plan['rows']})",
+        f"Доступ: {access}",
+        f"Просматривается записей: {plan['scanned']}",
+        f"Оценка результата: {plan['estimated']}",
+    ]
+    if plan['partitions'] is not None:
+        scanned, total = plan['partitions']
+        lines.append(f"Секций: {scanned} из {total}")
+    if plan['workers'] > 1:
+        lines.append(f"Процессов: {plan['workers']}")
+    if plan['limit'] is not None or plan['offset']:
+        lines.append(f"limit: {plan['limit']}, offset: {plan['offset']}")
+    return lines
+
+
+class Profile:
+    """Время и выделенная память по этапам одной команды."""
+
+    def __init__(self):
+        # [(этап, секунды, прирост памяти, пик памяти)], память в байтах
+        self.stages = []
+
+    @contextmanager
+    def running(self, output: str = None):
+        """Включает трассировку памяти и, если задан файл, cProfile.
+
+        Args:
+            output: Путь к файлу статистики cProfile или None
+        """
+        profiler = cProfile.Profile() if output else None
+        tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(output)
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Замеряет этап: время и память, выделенную за время этапа."""
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            self.stages.append((name, elapsed, current - before, peak - before))
+
+    def report(self) -> list:
+        """Возвращает замеры строками для вывода в консоль."""
+        lines = [f'{"этап":<10} {"время, мс":>10} {"память, КБ":>11} '
+                 f'{"пик, КБ":>9}']
+        for name, elapsed, allocated, peak in self.stages:
+            lines.append(f'{name:<10} {elapsed * 1000:>10.3f} '
+                         f'{allocated / 1024:>11.1f} {peak / 1024:>9.1f}')
+        total = sum(stage[1] for stage in self.stages)
+        lines.append(f'{"итого":<10} {total * 1000:>10.3f}')
+        return lines
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import os
+
+from .columnar import ColumnarTable
+from .storage import COMPACT_MIN_RECORDS, COMPACT_RATIO, DATA_DIR, atomic_write
+
+# Служебный ключ метаданных со списком индексов: {таблица: [столбцы]}
+INDEXES_KEY = 'sys:indexes'
+# Служебный ключ метаданных с последними выданными ID: {таблица: ID}
+SEQUENCES_KEY = 'sys:sequences'
+# Служебный ключ метаданных с числом записей: {таблица: число}
+ROWS_KEY = 'sys:rows'
+
+# Загруженные индексы: {(таблица, столбец): (подпись файла, индекс,
+# строк в файле, из них устаревших)}
+_loaded = {}
+
+
+def index_path(table_name: str, column: str) -> str:
+    """Возвращает путь к файлу индекса."""
+    return os.path.join(DATA_DIR, f"{table_name}.{column}.idx.jsonl")
+
+
+def column_type(metadata: dict, table_name: str, column: str) -> str:
+    """Возвращает тип столбца таблицы.
+
+    Raises:
+        ValueError: Если столбца нет в таблице
+    """
+    for item in metadata[table_name]:
+        col_name, col_type = item.split(':', 1)
+        if col_name == column:
+            return col_type
+    raise ValueError(f'Столбец "{column}" не найден в таблице "{table_name}".')
+
+
+def index_key(value, col_type: str):
+    """Приводит значение к ключу индекса.
+
+    Значения записей и строковые значения из условия WHERE приводятся
+    к одному виду, поэтому поиск по индексу не зависит от формы записи.
+
+    Args:
+        value: Значение из записи или из условия
+        col_type: Тип столбца (int, str, bool)
+
+    Returns:
+        str: Ключ индекса или None, если значение не приводится к типу столбца
+    """
+    if col_type == 'bool':
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        lowered = str(value).lower()
+        if lowered in ('true', '1', 'yes'):
+            return 'true'
+        if lowered in ('false', '0', 'no'):
+            return 'false'
+        return None
+    if col_type == 'int':
+        try:
+            return str(int(value))
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+def indexed_columns(metadata: dict, table_name: str) -> list:
+    """Возвращает список проиндексированных столбцов таблицы."""
+    return metadata.get(INDEXES_KEY, {}).get(table_name, [])
+
+
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_index(table_name: str, column: str) -> dict:
+    """Загружает индекс из файла.
+
+    Файл индекса - журнал изменений в формате JSON Lines: ["+", ключ, ID]
+    добавляет ID к ключу, ["-", ключ, ID] убирает. Загруженный индекс
+    остается в памяти, пока файл не изменится. Когда устаревших строк
+    становится много, sync_indexes переписывает файл снимком индекса.
+
+    Args:
+        table_name: Имя таблицы
+        column: Имя столбца
+
+    Returns:
+        dict: Индекс {ключ: [ID, ...]}
+    """
+    path = index_path(table_name, column)
+    signature = _signature(path)
+    cached = _loaded.get((table_name, column))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    index = {}
+    lines = dead = 0
+    if signature is not None:
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.endswith('\n'):
+                    # Строку еще дописывает другой процесс
+                    break
+                if not line.strip():
+                    continue
+                op, key, record_id = json.loads(line)
+                _apply(index, op, key, record_id)
+                lines += 1
+                # Строка "-" устаревает вместе со строкой "+", которую отменяет
+                dead += 2 if op == '-' else 0
+    _loaded[(table_name, column)] = (signature, index, lines, dead)
+    return index
+
+
+def _apply(index: dict, op: str, key: str, record_id: int) -> None:
+    if op == '+':
+        index.setdefault(key, []).append(record_id)
+    else:
+        ids = index.get(key, [])
+        if record_id in ids:
+            ids.remove(record_id)
+        if not ids:
+            index.pop(key, None)
+
+
+def save_index(table_name: str, column: str, index: dict) -> None:
+    """Перезаписывает файл индекса снимком его содержимого."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = index_path(table_name, column)
+
+    def write(file):
+        for key, ids in index.items():
+            for record_id in ids:
+                file.write(json.dumps(['+', key, record_id], ensure_ascii=False))
+                file.write('\n')
+
+    atomic_write(path, write)
+    lines = sum(len(ids) for ids in index.values())
+    _loaded[(table_name, column)] = (_signature(path), index, lines, 0)
+
+
+def build_index(table_data: list, column: str, col_type: str) -> dict:
+    """Строит индекс по данным таблицы.
+
+    Args:
+        table_data: Данные таблицы
+        column: Имя столбца
+        col_type: Тип столбца
+
+    Returns:
+        dict: Индекс {ключ: [ID, ...]}
+    """
+    index = {}
+    for record in table_data:
+        key = index_key(record.get(column), col_type)
+        index.setdefault(key, []).append(record['ID'])
+    return index
+
+
+def create_index(metadata: dict, table_name: str, column: str,
+                 table_data: list) -> dict:
+    """Создает индекс по столбцу таблицы и сохраняет его.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        column: Имя столбца
+        table_data: Данные таблицы
+
+    Returns:
+        dict: Обновленные метаданные
+
+    Raises:
+        ValueError: Если столбец не найден или индекс уже существует
+    """
+    col_type = column_type(metadata, table_name, column)
+    table_indexes = metadata.setdefault(INDEXES_KEY, {}).setdefault(table_name, [])  # noqa: E501
+    if column in table_indexes:
+        raise ValueError(f'Индекс по столбцу "{column}" уже существует.')
+
+    save_index(table_name, column, build_index(table_data, column, col_type))
+    table_indexes.append(column)
+    return metadata
+
+
+def drop_indexes(metadata: dict, table_name: str) -> dict:
+    """Убирает индексы таблицы из метаданных.
+
+    Файлы индексов удаляются отдельно функцией remove_index_files - вместе
+    с файлом таблицы, когда удаление зафиксировано.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+
+    Returns:
+        dict: Обновленные метаданные
+    """
+    metadata.get(INDEXES_KEY, {}).pop(table_name, None)
+    return metadata
+
+
+def remove_index_files(table_name: str, columns: list) -> None:
+    """Удаляет файлы индексов таблицы по указанным столбцам."""
+    for column in columns:
+        path = index_path(table_name, column)
+        if os.path.exists(path):
+            os.remove(path)
+        _loaded.pop((table_name, column), None)
+
+
+def rebuild_indexes(metadata: dict, table_name: str, table_data: list) -> None:
+    """Перестраивает все индексы таблицы по ее данным.
+
+    Нужна после отката транзакции и восстановления по журналу упреждающей
+    записи, когда файлы индексов могли разойтись с данными.
+    """
+    for column in indexed_columns(metadata, table_name):
+        col_type = column_type(metadata, table_name, column)
+        save_index(table_name, column, build_index(table_data, column, col_type))
+
+
+def sync_indexes(metadata: dict, table_name: str,
+                 old_records: list = (), new_records: list = ()) -> None:
+    """Переносит изменения записей в индексы таблицы.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        old_records: Прежние версии измененных или удаленных записей
+        new_records: Новые версии измененных или добавленных записей
+    """
+    for column in indexed_columns(metadata, table_name):
+        col_type = column_type(metadata, table_name, column)
+        index = load_index(table_name, column)
+
+        old_keys = {record['ID']: index_key(record.get(column), col_type)
+                    for record in old_records}
+        new_keys = {record['ID']: index_key(record.get(column), col_type)
+                    for record in new_records}
+
+        changes = []
+        for record_id, key in old_keys.items():
+            if new_keys.get(record_id, object()) != key:
+                changes.append(['-', key, record_id])
+        for record_id, key in new_keys.items():
+            if record_id not in old_keys or old_keys[record_id] != key:
+                changes.append(['+', key, record_id])
+        if not changes:
+            continue
+
+        path = index_path(table_name, column)
+        with open(path, 'a', encoding='utf-8') as file:
+            for change in changes:
+                _apply(index, *change)
+                file.write(json.dumps(change, ensure_ascii=False))
+                file.write('\n')
+        _, _, lines, dead = _loaded[(table_name, column)]
+        lines += len(changes)
+        dead += 2 * sum(change[0] == '-' for change in changes)
+        if lines >= COMPACT_MIN_RECORDS and dead >= lines * COMPACT_RATIO:
+            # Запись идет под блокировкой таблицы, поэтому снимок не теряет
+            # строк, дописанных другими процессами
+            save_index(table_name, column, index)
+        else:
+            _loaded[(table_name, column)] = (_signature(path), index, lines, dead)
+
+
+def lookup(metadata: dict, table_name: str, column: str, values: tuple):
+    """Ищет ID записей по индексу столбца.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        column: Имя столбца
+        values: Искомые значения, приведенные к типу столбца
+
+    Returns:
+        set: ID подходящих записей или None, если индекса по столбцу нет
+    """
+    if column not in indexed_columns(metadata, table_name):
+        return None
+    col_type = column_type(metadata, table_name, column)
+    index = load_index(table_name, column)
+    ids = set()
+    for value in values:
+        ids.update(index.get(index_key(value, col_type), []))
+    return ids
+
+
+def _record_id(record: dict) -> int:
+    return record['ID']
+
+
+def next_ids(metadata: dict, table_name: str, count: int = 1,
+             table_data: list = None) -> range:
+    """Выделяет новые ID из счетчика таблицы за O(1).
+
+    Счетчик хранится в метаданных и никогда не уменьшается, поэтому ID
+    остаются уникальными и после удаления записей. Для таблиц, созданных
+    до появления счетчика, он один раз инициализируется максимальным ID.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        count: Количество выделяемых ID
+        table_data: Данные таблицы (нужны только для инициализации счетчика)
+
+    Returns:
+        range: Выделенные ID
+    """
+    sequences = metadata.setdefault(SEQUENCES_KEY, {})
+    if table_name not in sequences:
+        if table_data is None:
+            raise ValueError(f'Счетчик ID таблицы "{table_name}" не найден.')
+        sequences[table_name] = table_data[-1]['ID'] if table_data else 0
+    first_id = sequences[table_name] + 1
+    sequences[table_name] += count
+    return range(first_id, first_id + count)
+
+
+def row_count(metadata: dict, table_name: str):
+    """Возвращает число записей таблицы из счетчика за O(1).
+
+    Returns:
+        int: Число записей или None, если счетчика у таблицы нет
+    """
+    return metadata.get(ROWS_KEY, {}).get(table_name)
+
+
+def adjust_row_count(metadata: dict, table_name: str, delta: int,
+                     table_data: list = None) -> None:
+    """Меняет счетчик записей таблицы после вставки или удаления.
+
+    Счетчик меняется в тех же метаданных, что и счетчик ID, поэтому
+    фиксируется вместе с изменением записей. Для таблиц, созданных
+    до появления счетчика, он заводится по данным таблицы, если они
+    уже загружены.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        delta: Изменение числа записей
+        table_data: Данные таблицы после изменения или None
+    """
+    counts = metadata.setdefault(ROWS_KEY, {})
+    if table_name in counts:
+        counts[table_name] += delta
+    elif table_data is not None:
+        counts[table_name] = len(table_data)
+
+
+def find_by_id(table_data: list, record_id: int):
+    """Находит запись по ID двоичным поиском за O(log n).
+
+    Данные таблицы всегда упорядочены по ID, поэтому сам список записей
+    служит упорядоченным индексом первичного ключа.
+
+    Args:
+        table_data: Данные таблицы
+        record_id: Искомый ID
+
+    Returns:
+        dict: Найденная запись или None
+    """
+    if isinstance(table_data, ColumnarTable):
+        position = table_data.position(record_id)
+        return table_data.row(position) if position is not None else None
+    position = bisect.bisect_left(table_data, record_id, key=_record_id)
+    if position < len(table_data) and table_data[position]['ID'] == record_id:
+        return table_data[position]
+    return None
+
+
+def id_positions(table_data: list, low: int = None, high: int = None) -> tuple:
+    """Возвращает позиции [начало, конец) записей с ID в диапазоне [low, high].
+
+    Позиции находятся двоичным поиском за O(log n), сами записи не читаются.
+    """
+    start = 0 if low is None else bisect.bisect_left(
+        table_data, low, key=_record_id)
+    end = len(table_data) if high is None else bisect.bisect_right(
+        table_data, high, key=_record_id)
+    return start, end
+
+
+def id_range(table_data: list, low: int = None, high: int = None) -> list:
+    """Возвращает записи с ID в диапазоне [low, high] за O(log n + k).
+
+    Args:
+        table_data: Данные таблицы
+        low: Нижняя граница или None
+        high: Верхняя граница или None
+
+    Returns:
+        list: Записи из диапазона в порядке ID
+    """
+    start, end = id_positions(table_data, low, high)
+    return table_data[start:end]
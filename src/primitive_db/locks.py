@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # На Windows fcntl нет - остаются только блокировки потоков
+    fcntl = None
+
+# Сколько секунд ждать блокировку, прежде чем сообщить об ошибке
+LOCK_TIMEOUT = 10.0
+# Пауза между попытками захватить занятую блокировку
+LOCK_POLL = 0.005
+
+# Блокировки процесса: {путь: FileLock}. Файл блокировки открывается
+# в процессе один раз, а потоки процесса разделяет RLock
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class FileLock:
+    """Исключительная блокировка файла между процессами и потоками.
+
+    Между процессами действует fcntl.flock, между потоками одного
+    процесса - RLock. Поток, уже владеющий блокировкой, может захватить
+    ее повторно; файл освобождается после последнего release().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._file = None
+        self._depth = 0
+
+    def acquire(self, timeout: float = LOCK_TIMEOUT, cancelled=None) -> bool:
+        """Захватывает блокировку.
+
+        Args:
+            timeout: Сколько секунд ждать; None - ждать без ограничения
+            cancelled: Функция без аргументов; если она вернула True,
+                ожидание прекращается
+
+        Returns:
+            bool: True, если блокировка захвачена
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._thread_lock.acquire(timeout=LOCK_POLL):
+            if _expired(deadline, cancelled):
+                return False
+
+        if self._depth == 0:
+            try:
+                locked = self._lock_file(deadline, cancelled)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            if not locked:
+                self._thread_lock.release()
+                return False
+        self._depth += 1
+        return True
+
+    def _lock_file(self, deadline, cancelled) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a')
+        while True:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if _expired(deadline, cancelled):
+                    self._file.close()
+                    self._file = None
+                    return False
+                time.sleep(LOCK_POLL)
+
+    def release(self) -> None:
+        """Освобождает блокировку, захваченную текущим потоком."""
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError(f'Не удалось захватить блокировку {self.path}.')
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _expired(deadline, cancelled) -> bool:
+    if cancelled is not None and cancelled():
+        return True
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def file_lock(path: str) -> FileLock:
+    """Возвращает общую для процесса блокировку файла."""
+    with _registry_lock:
+        lock = _registry.get(path)
+        if lock is None:
+            lock = _registry[path] = FileLock(path)
+        return lock
+
+
+def open_owned(path: str):
+    """Открывает файл на дозапись и захватывает его на все время работы.
+
+    Пока файл открыт, другие процессы видят, что его владелец жив. После
+    захвата проверяется, что файл не удалили и не подменили, пока
+    блокировка ожидалась.
+
+    Returns:
+        Открытый файл с захваченной блокировкой
+    """
+    while True:
+        file = open(path, 'a', encoding='utf-8')
+        if fcntl is None:
+            return file
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(file.fileno()).st_ino:
+                return file
+        except FileNotFoundError:
+            pass
+        file.close()
+
+
+def claim_orphan(path: str):
+    """Захватывает файл, владелец которого завершился.
+
+    Returns:
+        Открытый файл с захваченной блокировкой или None, если владелец
+        еще работает или файла уже нет. Без fcntl проверка невозможна,
+        и файл считается брошенным
+    """
+    try:
+        file = open(path, 'r+', encoding='utf-8')
+    except FileNotFoundError:
+        return None
+    if fcntl is None:
+        return file
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        file.close()
+        return None
+    return file
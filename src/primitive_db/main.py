@@ -1,12 +1,74 @@
 #!/usr/bin/env python3
 
-from .engine import run
+import argparse
+import sys
+
+from . import metrics
+from .bench import SIZES, parse_size, run_suite
+from .decorators import set_auto_confirm
+from .engine import run, run_script
+from .server import DEFAULT_HOST, DEFAULT_PORT, serve
+from .storage import BACKENDS
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(prog="project",
+                                     description="Простая база данных")
+    parser.add_argument("--file", "-f",
+                        help="выполнить команды из файла сценария")
+    parser.add_argument("--yes", "-y", action="store_true",
+                        help="подтверждать опасные операции без вопросов")
+    parser.add_argument("--metrics", action="store_true",
+                        help="собирать метрики операций (команда stats)")
+    commands = parser.add_subparsers(dest="command")
+    server = commands.add_parser("serve", help="запустить сетевой сервер")
+    server.add_argument("--port", "-p", type=int, default=DEFAULT_PORT,
+                        help=f"порт (по умолчанию {DEFAULT_PORT})")
+    server.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"адрес (по умолчанию {DEFAULT_HOST})")
+    bench = commands.add_parser("bench", help="замерить производительность")
+    bench.add_argument("--sizes", default=",".join(str(size) for size in SIZES),
+                       help="размеры таблиц через запятую, например 1k,100k,1M")
+    bench.add_argument("--storage", choices=list(BACKENDS), default="log",
+                       help="движок хранения (по умолчанию log)")
+    bench.add_argument("--output", "-o",
+                       help="файл JSON с результатами")
+    bench.add_argument("--compare",
+                       help="файл JSON прежнего запуска для сравнения")
+    return parser.parse_args(argv)
 
 
 def main():
     """Основная функция приложения"""
-    run()
+    args = parse_args()
+    if args.metrics:
+        metrics.set_enabled(True)
+    if args.command == "serve":
+        serve(args.port, args.host)
+        return
+    if args.command == "bench":
+        sizes = [parse_size(size) for size in args.sizes.split(",")]
+        run_suite(sizes, args.storage, args.output, args.compare)
+        return
+
+    interactive = sys.stdin.isatty()
+    if args.yes:
+        set_auto_confirm(True)
+    elif not interactive:
+        # Ввод идет не с терминала - отвечать на вопросы некому
+        set_auto_confirm(False)
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as file:
+            errors = run_script(file)
+    elif not interactive:
+        errors = run_script(sys.stdin)
+    else:
+        run()
+        return
+    sys.exit(1 if errors else 0)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
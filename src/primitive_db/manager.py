@@ -0,0 +1,1054 @@
+#!/usr/bin/env python3
+
+import bisect
+import copy
+import os
+import time
+from contextlib import ExitStack, contextmanager
+
+from .columnar import ColumnarTable, without_positions
+from .dictionary import encoded_columns, intern_values
+from .indexes import (
+    INDEXES_KEY,
+    SEQUENCES_KEY,
+    indexed_columns,
+    rebuild_indexes,
+    remove_index_files,
+)
+from .locks import LOCK_POLL, claim_orphan, file_lock
+from .mapped import MappedTable
+from .partitions import (
+    load_partitioned,
+    merge_partitions,
+    partition_count,
+    partition_name,
+    partition_spec,
+    partition_tables,
+)
+from .storage import (
+    DATA_DIR,
+    MappedStorage,
+    backends,
+    base_table,
+    bump_generation,
+    read_version,
+    set_table_version,
+    sync_directory,
+    sync_file,
+    table_lock,
+    table_version,
+    updated_rows,
+    write_version,
+)
+from .table_stats import (
+    TableStats,
+    encode_stats,
+    read_stats,
+    save_stats,
+    stats_path,
+)
+from .utils import (
+    apply_metadata_changes,
+    get_storage,
+    load_metadata,
+    metadata_changes,
+    save_metadata,
+    table_names,
+)
+from .wal import (
+    WAL_FILE,
+    WriteAheadLog,
+    process_wal_path,
+    read_transactions,
+    wal_entries,
+    wal_files,
+)
+
+WRITE_POLICIES = ('immediate', 'deferred')
+
+# Размер журнала упреждающей записи, после которого делается контрольная точка
+CHECKPOINT_BYTES = 4 * 1024 * 1024
+# Сколько секунд отложенные изменения вне транзакции держат блокировки таблиц
+LOCK_HOLD_SECONDS = 0.5
+
+
+def file_signature(path: str):
+    """Возвращает подпись файла (время изменения и размер) или None."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _record_id(record: dict) -> int:
+    return record['ID']
+
+
+class TableManager:
+    """Держит метаданные и загруженные таблицы в памяти между командами.
+
+    Перед выдачей таблицы сверяется подпись ее файла (время изменения и
+    размер): если файл изменили снаружи, таблица перечитывается. Изменения
+    записываются на диск по политике записи:
+    - immediate - сразу, одной фиксацией на команду;
+    - deferred - в памяти, а на диск при flush(), при выходе, после
+      каждых flush_every изменений, если flush_every больше нуля, и вне
+      транзакции после команды, если блокировки таблиц держатся дольше
+      LOCK_HOLD_SECONDS.
+      Метаданные при этой политике тоже сохраняются только при flush().
+
+    Каждая фиксация сначала попадает в журнал упреждающей записи
+    (WriteAheadLog), а затем в файлы таблиц. После сбоя зафиксированные
+    транзакции восстанавливаются из журнала при создании менеджера.
+    Между begin() и commit() изменения копятся в памяти и фиксируются
+    вместе; rollback() их отбрасывает.
+
+    Несколько процессов могут работать с одним каталогом. Перед изменением
+    таблицы менеджер захватывает ее блокировку записи (lock_table) и держит
+    до фиксации, поэтому писатели разных таблиц не мешают друг другу.
+    Читатели блокировок не берут. Метаданные сохраняются как изменения
+    поверх текущего файла, чтобы не затереть изменения других процессов.
+
+    В столбцовом режиме (columnar=True) таблицы держатся в памяти
+    как ColumnarTable вместо списков словарей.
+    """
+
+    def __init__(self, metadata_file: str = "db_meta.json",
+                 write_policy: str = 'immediate', flush_every: int = 0,
+                 columnar: bool = False, wal_file: str = WAL_FILE):
+        self.metadata_file = metadata_file
+        self.stats_file = stats_path(metadata_file)
+        self.columnar = columnar
+        # Статистика таблиц {таблица: TableStats}, загружается при обращении
+        self._stats = None
+        # Номер версии файла статистики и его содержимое: {таблица: JSON}
+        self.stats_version_file = self.stats_file + '.lsn'
+        self._stats_version = None
+        self._stats_data = {}
+        # Таблицы, статистика которых изменена и еще не записана в файл
+        self._stats_pending = set()
+        self._stats_before = None
+        # Открытые кадры отмены статистики
+        self._stats_frames = []
+        self._metadata = None
+        # Версия метаданных с диска, от которой считаются свои изменения
+        self._metadata_base = {}
+        self._metadata_signature = None
+        self._metadata_dirty = False
+        # Захваченные блокировки записи: {таблица: FileLock}
+        self._held = {}
+        # Когда захвачена первая из удерживаемых блокировок (time.monotonic)
+        self._held_since = 0.0
+        # {таблица: [подпись файла, данные]}
+        self._tables = {}
+        # Несохраненные операции: {таблица: [(операция, аргумент), ...]}
+        self._pending = {}
+        self._pending_count = 0
+        # Число сбросов отложенных изменений; по нему rollback_to() узнает,
+        # что часть изменений команды уже на диске
+        self._flushes = 0
+        self._in_transaction = False
+        # Транзакция открыта autocommit() на время одной команды, а не begin()
+        self._implicit = False
+        # Таблицы, измененные после последней контрольной точки
+        self._touched = set()
+        self.wal_file = wal_file
+        self.wal = WriteAheadLog(process_wal_path(wal_file))
+        self.set_write_policy(write_policy, flush_every)
+        self.recovered = self.recover()
+
+    def set_write_policy(self, write_policy: str, flush_every: int = 0) -> None:
+        """Меняет политику записи изменений на диск.
+
+        Raises:
+            ValueError: Если политика неизвестна
+        """
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f'Неизвестная политика записи: {write_policy}. '
+                             f'Доступные: {", ".join(WRITE_POLICIES)}')
+        if write_policy == 'immediate':
+            self.flush()
+        self.write_policy = write_policy
+        self.flush_every = flush_every
+
+    def set_columnar(self, columnar: bool) -> None:
+        """Включает или выключает столбцовое представление таблиц в памяти.
+
+        Режим меняется, только если все загруженные таблицы удалось
+        перевести в новое представление.
+
+        Raises:
+            ValueError: Если целое значение таблицы не помещается в 64 бита
+        """
+        if columnar == self.columnar:
+            return
+        metadata = self._current_metadata()
+        converted = {}
+        for table_name, entry in self._tables.items():
+            if isinstance(entry[1], MappedTable):
+                # Таблица mmap и так вычисляет условия по столбцам
+                continue
+            rows = list(entry[1])
+            base = base_table(table_name)
+            if not columnar:
+                converted[table_name] = rows
+                continue
+            try:
+                converted[table_name] = ColumnarTable(
+                    rows, metadata[base], encoded_columns(metadata, base))
+            except OverflowError:
+                raise ValueError(f'В таблице "{base}" есть целое значение, '
+                                 'не помещающееся в 64 бита.')
+        for table_name, data in converted.items():
+            self._tables[table_name][1] = data
+        self.columnar = columnar
+
+    def metadata(self) -> dict:
+        """Возвращает метаданные, перечитывая файл только после его изменения.
+
+        Если файл изменил другой процесс, а в памяти есть несохраненные
+        изменения, они переносятся поверх новой версии файла.
+        """
+        signature = file_signature(self.metadata_file)
+        if self._metadata is not None and signature == self._metadata_signature:
+            return self._metadata
+
+        base = load_metadata(self.metadata_file)
+        if self._metadata_dirty:
+            changes = metadata_changes(self._metadata_base, self._metadata)
+            self._metadata = apply_metadata_changes(copy.deepcopy(base), changes)
+        else:
+            self._metadata = copy.deepcopy(base)
+        self._metadata_base = base
+        self._metadata_signature = signature
+        return self._metadata
+
+    def _current_metadata(self) -> dict:
+        # Внутри команды метаданные не перечитываются, чтобы ссылки на них
+        # в вызывающем коде оставались действительными
+        if self._metadata is None:
+            return self.metadata()
+        return self._metadata
+
+    def save_metadata(self, metadata: dict) -> None:
+        """Сохраняет метаданные и оставляет их в памяти.
+
+        При отложенной политике записи и внутри транзакции файл
+        обновляется при фиксации.
+        """
+        self._metadata = metadata
+        self._metadata_dirty = True
+        if not self._defers():
+            self._commit({})
+
+    def _write_metadata(self, changes: list) -> None:
+        # Изменения накладываются на текущий файл под короткой блокировкой.
+        # Долговечность обеспечивает журнал, поэтому fsync здесь не нужен
+        with file_lock(self.metadata_file + '.lock'):
+            merged = apply_metadata_changes(load_metadata(self.metadata_file),
+                                            changes)
+            save_metadata(self.metadata_file, merged, sync=False)
+            self._metadata_signature = file_signature(self.metadata_file)
+        self._metadata = merged
+        self._metadata_base = copy.deepcopy(merged)
+        self._metadata_dirty = False
+
+    def discard_metadata(self) -> None:
+        """Забывает метаданные в памяти - при следующем обращении они перечитаются."""  # noqa: E501
+        self._metadata = None
+        self._metadata_dirty = False
+
+    def _path(self, table_name: str) -> str:
+        return get_storage(self._current_metadata()).path(table_name)
+
+    def table(self, table_name: str) -> list:
+        """Возвращает данные таблицы из памяти или загружает их.
+
+        Секционированная таблица собирается из всех секций; чтобы загрузить
+        только нужные секции, используется partitions().
+
+        Args:
+            table_name: Имя таблицы или секции
+
+        Returns:
+            list: Данные таблицы, упорядоченные по ID
+        """
+        metadata = self._current_metadata()
+        if partition_spec(metadata, table_name) is not None:
+            return merge_partitions(metadata, table_name,
+                                    self.partitions(table_name))
+
+        signature = file_signature(self._path(table_name))
+        entry = self._tables.get(table_name)
+        if entry is not None and (entry[0] == signature
+                                  or table_name in self._pending):
+            return entry[1]
+
+        data = get_storage(metadata).load(table_name)
+        if self.columnar and not isinstance(data, MappedTable):
+            base = base_table(table_name)
+            data = ColumnarTable(data, metadata[base],
+                                 encoded_columns(metadata, base))
+        if entry is not None:
+            # Файл изменили снаружи - результаты в кэше устарели
+            bump_generation(table_name)
+        # Подпись снята до чтения: если файл дописали во время загрузки,
+        # таблица перечитается при следующем обращении
+        self._tables[table_name] = [signature, data]
+        return data
+
+    def signature(self, table_name: str) -> tuple:
+        """Возвращает подписи файлов таблицы или всех ее секций.
+
+        Подписи меняются при записи файлов любым процессом, поэтому по ним
+        кэш выборок узнает об изменениях, сделанных другими процессами.
+        """
+        return tuple(file_signature(self._path(name)) for name in
+                     partition_tables(self._current_metadata(), table_name))
+
+    def partitions(self, table_name: str, numbers=None) -> list:
+        """Возвращает данные секций таблицы, загружая только указанные.
+
+        Args:
+            table_name: Имя секционированной таблицы
+            numbers: Номера секций или None для всех
+
+        Returns:
+            list: Данные секций в порядке номеров
+        """
+        if numbers is None:
+            numbers = range(partition_count(self._current_metadata(), table_name))
+        return [self.table(partition_name(table_name, number))
+                for number in numbers]
+
+    def is_loaded(self, table_name: str) -> bool:
+        """Проверяет, находится ли таблица в памяти."""
+        return table_name in self._tables
+
+    def forget(self, table_name: str = None) -> None:
+        """Убирает таблицу (или все таблицы) из памяти без сохранения.
+
+        Args:
+            table_name: Имя таблицы или None для всех таблиц
+        """
+        names = [name for name in self._tables
+                 if table_name is None or base_table(name) == table_name]
+        for name in names:
+            self._tables.pop(name, None)
+            self._pending_count -= len(self._pending.pop(name, []))
+
+    def lock_table(self, table_name: str) -> dict:
+        """Захватывает блокировку записи таблицы до конца фиксации.
+
+        Блокировка освобождается после фиксации или отката, поэтому все
+        чтения и записи команды (или транзакции) видят таблицу, которую
+        не меняют другие процессы.
+
+        Args:
+            table_name: Имя таблицы
+
+        Returns:
+            dict: Свежие метаданные
+
+        Raises:
+            TimeoutError: Если таблицу слишком долго держит другой процесс
+        """
+        if table_name not in self._held:
+            if not self._held:
+                self._held_since = time.monotonic()
+            lock = table_lock(table_name)
+            if not lock.acquire():
+                raise TimeoutError(f'Таблица "{table_name}" занята другим процессом.')  # noqa: E501
+            self._held[table_name] = lock
+        return self.metadata()
+
+    def _release_locks(self) -> None:
+        for lock in self._held.values():
+            lock.release()
+        self._held = {}
+
+    @property
+    def in_transaction(self) -> bool:
+        """Открыта ли явная транзакция (begin)."""
+        return self._in_transaction and not self._implicit
+
+    def _defers(self) -> bool:
+        # Изменения копятся в памяти при отложенной политике и в транзакции
+        return self.write_policy == 'deferred' or self._in_transaction
+
+    def _prepare(self, table_name: str) -> None:
+        self.lock_table(table_name)
+        # Отложенные изменения применяются к таблице в памяти,
+        # поэтому она должна быть загружена до первого изменения
+        if self._defers():
+            self.table(table_name)
+
+    def _persist(self, table_name: str, operations: list) -> None:
+        storage = get_storage(self._current_metadata())
+        whole = storage.name == 'json' and table_name in self._tables
+        for operation, argument in operations:
+            if operation == 'drop':
+                storage.drop(table_name)
+                remove_index_files(table_name, argument)
+            elif not whole:
+                getattr(storage, operation)(table_name, argument)
+        if whole and base_table(table_name) in self._current_metadata():
+            # Устаревший формат все равно переписывает файл целиком,
+            # поэтому сохраняем таблицу из памяти один раз
+            storage.save(table_name, list(self._tables[table_name][1]))
+        if storage.name == MappedStorage.name:
+            # Таблица mmap открывается за O(1), поэтому после фиксации
+            # ее копия с изменениями в памяти не хранится
+            self._tables.pop(table_name, None)
+        else:
+            self._refresh_signature(table_name)
+
+    def _commit(self, pending: dict, durable: bool = False) -> None:
+        """Фиксирует изменения: сначала журнал, затем файлы таблиц.
+
+        Args:
+            pending: Операции по таблицам {таблица: [(операция, аргумент)]}
+            durable: Сбросить журнал на диск независимо от режима сброса
+        """
+        try:
+            changes = []
+            if self._metadata_dirty:
+                changes = metadata_changes(self._metadata_base, self._metadata)
+                self._metadata_dirty = bool(changes)
+            entries = [{'op': 'meta', 'changes': changes}] if changes else []
+            # Номера фиксаций выдаются под блокировками записи таблиц
+            versions = {table_name: table_version(table_name) + 1
+                        for table_name in pending}
+            for table_name, operations in pending.items():
+                for operation, argument in operations:
+                    entries.extend(wal_entries(table_name, operation, argument,
+                                               versions[table_name]))
+            if not entries:
+                self.save_statistics()
+                return
+
+            self.wal.commit(entries, durable)
+            # Метаданные пишутся первыми: счетчик ID на диске может только
+            # опережать данные, но не отставать от них
+            if changes:
+                self._write_metadata(changes)
+            for table_name, operations in pending.items():
+                self._persist(table_name, operations)
+                set_table_version(table_name, versions[table_name])
+                self._touched.add(table_name)
+                if base_table(table_name) not in self._current_metadata():
+                    # Таблица удалена - ее пустая копия в памяти больше не нужна
+                    self._tables.pop(table_name, None)
+            # Статистика пишется под блокировками таблиц, поэтому изменения
+            # одной таблицы из разных процессов не затирают друг друга
+            self.save_statistics()
+            if self.wal.size() >= CHECKPOINT_BYTES:
+                self.checkpoint()
+        finally:
+            # Вне транзакции блокировки таблиц держатся только до фиксации
+            if not self._in_transaction:
+                self._release_locks()
+
+    def _write(self, table_name: str, operation: str, argument: list) -> None:
+        bump_generation(table_name)
+        if not self._defers():
+            self._commit({table_name: [(operation, argument)]})
+            return
+
+        self._pending.setdefault(table_name, []).append((operation, argument))
+        self._pending_count += 1
+        if (self.flush_every and not self._in_transaction
+                and self._pending_count >= self.flush_every):
+            self.flush()
+
+    def _refresh_signature(self, table_name: str) -> None:
+        if table_name in self._tables:
+            self._tables[table_name][0] = file_signature(self._path(table_name))
+
+    def _apply(self, table_name: str, operation: str, argument: list) -> None:
+        # Переносит изменение в копию таблицы в памяти, если она загружена
+        if table_name not in self._tables:
+            return
+        data = self._tables[table_name][1]
+        if operation == 'update':
+            argument = updated_rows(argument)
+        if operation in ('append', 'update') and type(data) is list:
+            # Строки столбцов в словарном кодировании в памяти общие
+            intern_values(argument, encoded_columns(
+                self._current_metadata(), base_table(table_name)))
+        if operation == 'append':
+            in_order = (not data or not argument
+                        or argument[0]['ID'] > data[-1]['ID'])
+            data.extend(argument)
+            if not in_order and isinstance(data, ColumnarTable):
+                data.sort_by_id()
+            elif not in_order:
+                data.sort(key=_record_id)
+        elif operation == 'update':
+            if isinstance(data, ColumnarTable):
+                data.update_rows(argument)
+                return
+            for record in argument:
+                position = bisect.bisect_left(data, record['ID'], key=_record_id)
+                if position < len(data) and data[position]['ID'] == record['ID']:
+                    data[position] = record
+        elif operation == 'delete':
+            if isinstance(data, ColumnarTable):
+                data.delete_ids(argument)
+                return
+            # Записи находятся двоичным поиском, список собирается из
+            # срезов между ними без проверки каждой записи
+            positions = set()
+            for record_id in argument:
+                position = bisect.bisect_left(data, record_id, key=_record_id)
+                if position < len(data) and data[position]['ID'] == record_id:
+                    positions.add(position)
+            if positions:
+                data[:] = without_positions(data, sorted(positions))
+        elif operation == 'drop':
+            self._tables[table_name] = [None, []]
+
+    def append(self, table_name: str, records: list) -> None:
+        """Добавляет записи в таблицу.
+
+        Args:
+            table_name: Имя таблицы
+            records: Новые записи с ID больше существующих
+        """
+        self._prepare(table_name)
+        self._apply(table_name, 'append', records)
+        self._write(table_name, 'append', records)
+
+    def update(self, table_name: str, pairs: list) -> None:
+        """Заменяет записи новыми версиями с теми же ID.
+
+        Args:
+            table_name: Имя таблицы
+            pairs: Пары (прежний ID, новая версия записи)
+
+        Raises:
+            ValueError: Если новая версия записи меняет ID
+        """
+        updated_rows(pairs)
+        self._prepare(table_name)
+        self._apply(table_name, 'update', pairs)
+        self._write(table_name, 'update', pairs)
+
+    def delete(self, table_name: str, ids: list) -> None:
+        """Удаляет записи с указанными ID.
+
+        Args:
+            table_name: Имя таблицы
+            ids: ID удаляемых записей
+        """
+        self._prepare(table_name)
+        self._apply(table_name, 'delete', ids)
+        self._write(table_name, 'delete', ids)
+
+    def drop(self, table_name: str, metadata: dict, columns: list = (),
+             partitions: list = ()) -> None:
+        """Удаляет таблицу одной фиксацией вместе с новыми метаданными.
+
+        Файлы таблицы и индексов удаляются только после того, как удаление
+        записано в журнал, поэтому сбой не оставляет таблицу в метаданных
+        без данных.
+
+        Args:
+            table_name: Имя таблицы
+            metadata: Метаданные уже без этой таблицы
+            columns: Столбцы индексов таблицы, файлы которых нужно удалить
+            partitions: Имена секций таблицы, файлы которых нужно удалить
+        """
+        self._metadata = metadata
+        self._metadata_dirty = True
+        for name in [*partitions, table_name]:
+            self._pending_count -= len(self._pending.pop(name, []))
+            if self._defers():
+                # До фиксации таблица с этим именем в памяти пуста
+                self._tables[name] = [None, []]
+            else:
+                self._tables.pop(name, None)
+        for name in partitions:
+            self._write(name, 'drop', [])
+        self._write(table_name, 'drop', list(columns))
+        self.set_statistics(table_name, None)
+
+    def _statistics(self) -> dict:
+        # Каждая запись статистики увеличивает номер ее версии, поэтому
+        # статистику, измененную другими процессами, видно по номеру
+        version = read_version(self.stats_version_file)
+        if self._stats is None or version != self._stats_version:
+            with file_lock(self.stats_file + '.lock'):
+                self._stats_version = read_version(self.stats_version_file)
+                data = read_stats(self.stats_file)
+            self._stats_data = {table_name: encode_stats(item)
+                                for table_name, item in data.items()}
+            loaded = {table_name: TableStats.from_dict(item)
+                      for table_name, item in data.items()}
+            # Своя еще не записанная статистика новее файла
+            for table_name in self._stats_pending:
+                if table_name in self._stats:
+                    loaded[table_name] = self._stats[table_name]
+                else:
+                    loaded.pop(table_name, None)
+            self._stats = loaded
+        return self._stats
+
+    def _change_statistics(self, table_name: str) -> None:
+        # Статистику таблицы меняют под ее блокировкой записи, поэтому
+        # проверенная по номеру версии статистика остается свежей до записи
+        self._remember_statistics(table_name)
+        self._stats_pending.add(table_name)
+
+    def statistics(self, table_name: str):
+        """Возвращает статистику таблицы (TableStats) или None."""
+        return self._statistics().get(base_table(table_name))
+
+    def set_statistics(self, table_name: str, stats) -> None:
+        """Заменяет статистику таблицы; None удаляет ее."""
+        all_stats = self._statistics()
+        self._change_statistics(table_name)
+        if stats is None:
+            all_stats.pop(table_name, None)
+        else:
+            all_stats[table_name] = stats
+
+    def sync_statistics(self, table_name: str, old_records=(),
+                        new_records=()) -> None:
+        """Переносит изменение записей в статистику таблицы, если она есть.
+
+        Args:
+            table_name: Имя таблицы
+            old_records: Прежние версии измененных или удаленных записей
+            new_records: Новые версии измененных или добавленных записей
+        """
+        table_name = base_table(table_name)
+        stats = self._statistics().get(table_name)
+        if stats is not None:
+            self._change_statistics(table_name)
+            stats.apply(old_records, new_records)
+
+    def _rebuild_statistics(self, metadata: dict, tables: set) -> None:
+        for table_name in tables:
+            if table_name in table_names(metadata):
+                self.set_statistics(table_name, TableStats.build(
+                    metadata[table_name], self.table(table_name)))
+            else:
+                self.set_statistics(table_name, None)
+
+    def _snapshot_statistics(self) -> dict:
+        # Статистика не копируется целиком на каждую команду: открывается
+        # кадр отмены {таблица: (копия, была ли изменена)}, в который
+        # таблица копируется перед первым изменением
+        frame = {}
+        self._stats_frames.append(frame)
+        return frame
+
+    def _remember_statistics(self, table_name: str) -> None:
+        for saved in self._stats_frames:
+            if table_name not in saved:
+                stats = self._stats.get(table_name)
+                saved[table_name] = (stats.copy() if stats is not None else None,
+                                     table_name in self._stats_pending)
+
+    def _release_statistics(self, frame) -> None:
+        # Кадр больше не нужен: изменения зафиксированы или отменены
+        self._stats_frames = [item for item in self._stats_frames
+                              if item is not frame]
+
+    def _restore_statistics(self, frame) -> None:
+        self._release_statistics(frame)
+        if not frame:
+            return
+        stats = self._statistics()
+        for table_name, (table_stats, pending) in frame.items():
+            if table_stats is None:
+                stats.pop(table_name, None)
+            else:
+                stats[table_name] = table_stats
+            if not pending:
+                # Статистика снова совпадает с файлом
+                self._stats_pending.discard(table_name)
+
+    def save_statistics(self) -> None:
+        """Сохраняет статистику таблиц, измененную в этом процессе.
+
+        Вызывается при каждой фиксации. Статистика измененных таблиц
+        накладывается на текущий файл под короткой блокировкой, как
+        метаданные, поэтому статистика других таблиц, записанная другими
+        процессами, не затирается.
+        """
+        if not self._stats_pending:
+            return
+        with file_lock(self.stats_file + '.lock'):
+            version = read_version(self.stats_version_file)
+            changed = version != self._stats_version
+            if changed:
+                data = read_stats(self.stats_file)
+                encoded = {table_name: encode_stats(item)
+                           for table_name, item in data.items()}
+            else:
+                # Файл не менялся после нашей записи: перечитывать его не
+                # нужно, а кодируется только измененная статистика
+                encoded = self._stats_data
+            for table_name in self._stats_pending:
+                stats = self._stats.get(table_name)
+                if stats is None:
+                    encoded.pop(table_name, None)
+                else:
+                    encoded[table_name] = encode_stats(stats.to_dict())
+            save_stats(self.stats_file, encoded)
+            write_version(self.stats_version_file, version + 1)
+        if changed:
+            # Статистику остальных таблиц изменили другие процессы
+            self._stats = {
+                table_name: (self._stats[table_name]
+                             if table_name in self._stats_pending
+                             else TableStats.from_dict(data[table_name]))
+                for table_name in encoded}
+        self._stats_data = encoded
+        self._stats_version = version + 1
+        self._stats_pending.clear()
+
+    def begin(self) -> None:
+        """Начинает транзакцию.
+
+        Raises:
+            ValueError: Если транзакция уже открыта
+        """
+        if self._in_transaction:
+            raise ValueError('Транзакция уже начата.')
+        self.flush()
+        self._in_transaction = True
+        self._stats_before = self._snapshot_statistics()
+
+    def commit(self) -> None:
+        """Фиксирует транзакцию (или отложенные изменения) с fsync журнала."""
+        self._in_transaction = False
+        self.flush()
+        self._release_statistics(self._stats_before)
+        self._stats_before = None
+
+    def rollback(self) -> list:
+        """Отменяет изменения открытой транзакции.
+
+        Таблицы, измененные в транзакции, перечитываются с диска, а их
+        индексы перестраиваются. Статистика возвращается к началу транзакции.
+
+        Returns:
+            list: Имена таблиц, изменения которых отменены
+
+        Raises:
+            ValueError: Если транзакция не открыта
+        """
+        if not self._in_transaction:
+            raise ValueError('Нет открытой транзакции.')
+        self._in_transaction = False
+        touched = list(self._pending)
+        self._pending = {}
+        self._pending_count = 0
+        created = self._metadata
+        self.discard_metadata()
+        metadata = self.metadata()
+        self._remove_created_indexes(created)
+        for table_name in touched:
+            self._tables.pop(table_name, None)
+            bump_generation(table_name)
+        # Индексы общие для всех секций таблицы
+        for table_name in {base_table(name) for name in touched}:
+            if indexed_columns(metadata, table_name):
+                rebuild_indexes(metadata, table_name, self.table(table_name))
+        self._restore_statistics(self._stats_before)
+        self._stats_before = None
+        self._release_locks()
+        return touched
+
+    def savepoint(self) -> tuple:
+        """Запоминает отложенные изменения перед командой.
+
+        Нужна при отложенной политике записи и в транзакции: rollback_to()
+        отменяет изменения одной неудавшейся команды, сохраняя изменения
+        предыдущих.
+
+        Returns:
+            tuple: Состояние для rollback_to()
+        """
+        metadata = copy.deepcopy(self._metadata)
+        lengths = {table_name: len(operations)
+                   for table_name, operations in self._pending.items()}
+        stats = self._snapshot_statistics()
+        return metadata, self._metadata_dirty, lengths, self._flushes, stats
+
+    def rollback_to(self, savepoint: tuple) -> None:
+        """Отменяет изменения, сделанные после savepoint().
+
+        Таблицы, измененные после точки, перечитываются с диска, к ним
+        заново применяются отложенные изменения, сделанные до точки,
+        а их индексы перестраиваются. Статистика возвращается к точке.
+        """
+        metadata, dirty, lengths, flushes, stats = savepoint
+        created = self._metadata
+        if flushes != self._flushes:
+            # Изменения до точки уже на диске вместе с частью изменений
+            # команды: метаданные перечитываются, а в памяти отменяется
+            # только то, что записано после сброса
+            self.discard_metadata()
+            lengths = {}
+        else:
+            self._metadata = metadata
+            self._metadata_dirty = dirty
+        self._remove_created_indexes(created)
+        reindex = set()
+        for table_name in list(self._pending):
+            operations = self._pending[table_name]
+            kept = lengths.get(table_name, 0)
+            if len(operations) == kept:
+                continue
+            self._pending_count -= len(operations) - kept
+            del operations[kept:]
+            if not operations:
+                del self._pending[table_name]
+            self._tables.pop(table_name, None)
+            bump_generation(table_name)
+            metadata = self._current_metadata()
+            if base_table(table_name) in table_names(metadata):
+                self.table(table_name)
+            reindex.add(base_table(table_name))
+            for operation, argument in operations:
+                self._apply(table_name, operation, argument)
+        metadata = self._current_metadata()
+        for table_name in reindex:
+            if (table_name in table_names(metadata)
+                    and indexed_columns(metadata, table_name)):
+                rebuild_indexes(metadata, table_name, self.table(table_name))
+        if flushes != self._flushes:
+            # Часть изменений команды осталась на диске
+            self._release_statistics(stats)
+            self._rebuild_statistics(metadata, reindex)
+        else:
+            self._restore_statistics(stats)
+
+    def _remove_created_indexes(self, created) -> None:
+        # Файл индекса create_index пишет сразу, а в метаданные индекс
+        # попадает при фиксации. Индексы, которых после отката нет
+        # в метаданных, удаляются вместе с файлами
+        if not created:
+            return
+        kept = self._current_metadata().get(INDEXES_KEY, {})
+        for table_name, columns in created.get(INDEXES_KEY, {}).items():
+            remove_index_files(table_name, [column for column in columns
+                                            if column not in kept.get(table_name, [])])  # noqa: E501
+
+    @contextmanager
+    def autocommit(self):
+        """Объединяет изменения одной команды в одну фиксацию.
+
+        Фиксирует только при политике immediate вне явной транзакции.
+        При ошибке изменения команды отменяются; при отложенной политике
+        и в транзакции изменения предыдущих команд сохраняются.
+        """
+        if self._defers():
+            savepoint = self.savepoint()
+            try:
+                yield
+            except BaseException:
+                self.rollback_to(savepoint)
+                raise
+            self._release_statistics(savepoint[-1])
+            self._yield_locks()
+            return
+        self._stats_before = self._snapshot_statistics()
+        self._in_transaction = True
+        self._implicit = True
+        try:
+            yield
+        except BaseException:
+            if self._in_transaction:
+                self.rollback()
+            raise
+        finally:
+            self._implicit = False
+            self._release_statistics(self._stats_before)
+            self._stats_before = None
+        if self._in_transaction:
+            self._in_transaction = False
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._commit(pending)
+
+    def _yield_locks(self) -> None:
+        # Вне явной транзакции отложенные изменения сбрасываются, если
+        # блокировки держатся дольше LOCK_HOLD_SECONDS: иначе писатели
+        # других процессов ждут конца сценария и получают TimeoutError
+        if (self._in_transaction or not self._held
+                or time.monotonic() - self._held_since < LOCK_HOLD_SECONDS):
+            return
+        self.flush()
+        # Ожидающие процессы опрашивают блокировку раз в LOCK_POLL и должны
+        # успеть захватить ее до следующей команды
+        time.sleep(LOCK_POLL * 2)
+
+    def flush(self) -> None:
+        """Фиксирует все отложенные изменения с fsync журнала.
+
+        Внутри транзакции ничего не делает - изменения фиксирует commit().
+        """
+        if self._in_transaction:
+            return
+        pending, self._pending = self._pending, {}
+        self._pending_count = 0
+        self._flushes += 1
+        self._commit(pending, durable=True)
+
+    def commit_progress(self) -> None:
+        """Фиксирует изменения, уже сделанные долгой командой.
+
+        Нужна командам, которые пишут данные пачками (import): каждая
+        пачка фиксируется отдельно и не копится в памяти до конца команды.
+        Вне явной транзакции при политике immediate изменения фиксируются
+        в журнал и файлы, при политике deferred - сбрасываются как flush().
+        В явной транзакции ничего не делает.
+        """
+        if self.in_transaction:
+            return
+        if not self._in_transaction:
+            self.flush()
+            return
+        pending, self._pending = self._pending, {}
+        self._pending_count = 0
+        self._commit(pending)
+        # Ошибка в следующей пачке отменяет только ее изменения
+        self._release_statistics(self._stats_before)
+        self._stats_before = self._snapshot_statistics()
+
+    def checkpoint(self) -> None:
+        """Сбрасывает файлы на диск, сохраняет статистику и очищает журнал."""
+        self.save_statistics()
+        storage = get_storage(self._current_metadata())
+        for table_name in self._touched:
+            storage.sync(table_name)
+        sync_directory(DATA_DIR)
+        sync_file(self.metadata_file)
+        sync_directory(os.path.dirname(self.metadata_file))
+        self._touched.clear()
+        self.wal.truncate()
+
+    def recover(self) -> int:
+        """Восстанавливает транзакции из журналов, брошенных при сбое.
+
+        Журнал считается брошенным, если его не держит работающий процесс.
+        Изменения всех брошенных журналов проигрываются поверх файлов
+        таблиц в порядке номеров фиксаций таблиц. Изменения с номером не
+        больше записанного в data/<таблица>.lsn пропускаются: они уже
+        в файле таблицы или их заменили более поздние фиксации работающих
+        процессов. Затем индексы затронутых таблиц перестраиваются,
+        а журналы удаляются.
+
+        Returns:
+            int: Количество восстановленных транзакций
+        """
+        transactions = []
+        claimed = []
+        try:
+            for path in wal_files(self.wal_file):
+                file = claim_orphan(path)
+                if file is None:
+                    continue
+                claimed.append((path, file))
+                transactions.extend(read_transactions(file))
+            if transactions:
+                self._replay(transactions)
+            for path, _ in claimed:
+                os.remove(path)
+        finally:
+            for _, file in claimed:
+                file.close()
+        if transactions:
+            self.discard_metadata()
+            self.forget()
+        return len(transactions)
+
+    def _replay(self, transactions: list) -> None:
+        tables = sorted({entry['table'] for entries in transactions
+                         for entry in entries if 'table' in entry})
+        with ExitStack() as stack:
+            for table_name in tables:
+                stack.enter_context(table_lock(table_name))
+
+            with file_lock(self.metadata_file + '.lock'):
+                metadata = load_metadata(self.metadata_file)
+                sequences = dict(metadata.get(SEQUENCES_KEY, {}))
+                for entries in transactions:
+                    for entry in entries:
+                        if entry['op'] == 'meta':
+                            apply_metadata_changes(metadata, entry['changes'])
+                            tables.extend(change[0][1] for change in entry['changes']  # noqa: E501
+                                          if change[0][0] == INDEXES_KEY)
+                # Счетчик ID не должен откатиться назад, если его уже
+                # продвинул другой процесс
+                for table_name, last_id in sequences.items():
+                    current = metadata.get(SEQUENCES_KEY, {}).get(table_name)
+                    if current is not None and current < last_id:
+                        metadata[SEQUENCES_KEY][table_name] = last_id
+                save_metadata(self.metadata_file, metadata)
+            storage = get_storage(metadata)
+
+            changes = {}
+            for entries in transactions:
+                for entry in entries:
+                    if 'table' in entry:
+                        changes.setdefault(entry['table'], []).append(entry)
+            for table_name, entries in changes.items():
+                self._replay_table(storage, metadata, table_name, entries)
+            for table_name in {base_table(name) for name in tables}:
+                if indexed_columns(metadata, table_name):
+                    rebuild_indexes(metadata, table_name,
+                                    load_partitioned(storage, metadata, table_name))  # noqa: E501
+
+    @staticmethod
+    def _replay_table(storage, metadata: dict, table_name: str,
+                      entries: list) -> None:
+        current = table_version(table_name)
+        # Записи без номера (журнал прежней версии) применяются всегда
+        entries = sorted((entry for entry in entries
+                          if entry.get('lsn', current + 1) > current),
+                         key=lambda entry: entry.get('lsn', 0))
+        if not entries:
+            return
+        records = None
+        for entry in entries:
+            if entry['op'] == 'drop':
+                storage.drop(table_name)
+                remove_index_files(table_name, entry['columns'])
+                records = {}
+                continue
+            if records is None:
+                records = {record['ID']: record
+                           for record in storage.load(table_name)}
+            if entry['op'] == 'put':
+                for record in entry['rows']:
+                    records[record['ID']] = record
+            else:
+                for record_id in entry['ids']:
+                    records.pop(record_id, None)
+
+        if records is not None and base_table(table_name) in table_names(metadata):
+            storage.save(table_name, sorted(records.values(), key=_record_id))
+            storage.sync(table_name)
+        last = max(entry.get('lsn', current) for entry in entries)
+        if last > current:
+            set_table_version(table_name, last)
+
+    def close(self) -> None:
+        """Сохраняет отложенные изменения и дожидается фоновых задач хранения.
+
+        Незафиксированная транзакция при этом отменяется.
+        """
+        if self._in_transaction:
+            self.rollback()
+        self.flush()
+        for backend in backends():
+            backend.wait()
+        self.checkpoint()
+        self.wal.remove()
@@ -0,0 +1,705 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import mmap
+import operator
+import struct
+from array import array
+from functools import lru_cache
+
+from . import metrics
+from .columnar import ColumnarTable, _mask, np
+
+# Файл таблицы: заголовок, схема, участок записей фиксированной ширины
+# (с запасом мест под новые записи) и куча строк.
+# Заголовок: сигнатура, длина схемы, занятых мест, всех мест, размер кучи,
+# байт устаревших строк в куче, флаги
+MAGIC = b'PDBT'
+HEADER = struct.Struct('<4sIQQQQI')
+# В файле есть пустые (null) значения - условия проверяются с их учетом
+HAS_NULLS = 1
+# В файле есть надгробия удаленных записей - места с пустым ID. ID в месте
+# сохраняется, поэтому места остаются упорядоченными по ID
+HAS_DELETED = 2
+# До стольких мест удаление в памяти сдвигает массив живых мест,
+# больше - собирает его заново
+DELETE_IN_PLACE = 64
+_ID = struct.Struct('<q')
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def capacity_for(count: int) -> int:
+    """Возвращает число мест под записи в новом файле: с запасом на вставки."""
+    return count + max(count // 2, 64)
+
+
+class RowLayout:
+    """Раскладка записи фиксированной ширины по схеме таблицы.
+
+    Запись - битовая маска пустых значений, затем по столбцам схемы:
+    int - 8 байт, bool - 1 байт, str - смещение (8 байт) и длина (4 байта)
+    строки в куче. Первым всегда идет столбец ID.
+    """
+
+    def __init__(self, columns: tuple):
+        self.columns = list(columns)
+        self.names = []
+        self.types = {}
+        self.mask_size = (len(columns) + 7) // 8
+        self.empty_mask = bytes(self.mask_size)
+        fmt = f'<{self.mask_size}s'
+        # (имя, тип, номер поля в распакованном кортеже)
+        self.plan = []
+        # Поля для NumPy: (имя поля, формат, смещение)
+        fields = [('m', ('u1', (self.mask_size,)), 0)]
+        index = 1
+        offset = self.mask_size
+        for position, column in enumerate(columns):
+            name, col_type = column.split(':', 1)
+            self.names.append(name)
+            self.types[name] = col_type
+            self.plan.append((name, col_type, index))
+            if col_type == 'int':
+                fmt += 'q'
+                fields.append((f'f{position}', '<i8', offset))
+                index += 1
+                offset += 8
+            elif col_type == 'bool':
+                fmt += 'B'
+                fields.append((f'f{position}', 'u1', offset))
+                index += 1
+                offset += 1
+            else:
+                fmt += 'QI'
+                fields.append((f'f{position}', '<u8', offset))
+                fields.append((f'l{position}', '<u4', offset + 8))
+                index += 2
+                offset += 12
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+        self.id_offset = self.mask_size
+        self.dtype = None
+        if np is not None:
+            self.dtype = np.dtype({'names': [field[0] for field in fields],
+                                   'formats': [field[1] for field in fields],
+                                   'offsets': [field[2] for field in fields],
+                                   'itemsize': self.size})
+
+    def pack(self, record: dict, heap: bytearray, heap_size: int) -> tuple:
+        """Упаковывает запись, дописывая ее строки в heap.
+
+        Args:
+            record: Запись
+            heap: Новые байты кучи, которые будут дописаны после heap_size
+            heap_size: Размер кучи в файле до дописывания heap
+
+        Returns:
+            tuple: (байты записи, есть ли в записи пустые значения)
+        """
+        mask = 0
+        values = []
+        for bit, (name, col_type, _) in enumerate(self.plan):
+            value = record.get(name)
+            if value is None:
+                mask |= 1 << bit
+            if col_type == 'str':
+                encoded = (value or '').encode('utf-8')
+                values.append(heap_size + len(heap))
+                values.append(len(encoded))
+                heap += encoded
+            else:
+                values.append(value or 0)
+        try:
+            row = self.struct.pack(mask.to_bytes(self.mask_size, 'little'), *values)
+        except struct.error:
+            raise ValueError('Целое значение не помещается в 64 бита.')
+        return row, mask != 0
+
+    def record(self, values: tuple, heap) -> dict:
+        """Собирает словарь записи из распакованного кортежа."""
+        record = {}
+        for name, col_type, index in self.plan:
+            if col_type == 'int':
+                record[name] = values[index]
+            elif col_type == 'bool':
+                record[name] = bool(values[index])
+            else:
+                start = values[index]
+                record[name] = str(heap[start:start + values[index + 1]], 'utf-8')
+        mask = values[0]
+        if mask != self.empty_mask:
+            bits = int.from_bytes(mask, 'little')
+            for bit, name in enumerate(self.names):
+                if bits >> bit & 1:
+                    record[name] = None
+        return record
+
+    def string_bytes(self, values: tuple) -> int:
+        """Возвращает, сколько байт кучи занимают строки записи."""
+        return sum(values[index + 1] for _, col_type, index in self.plan
+                   if col_type == 'str')
+
+    @staticmethod
+    def tombstone(row) -> bytes:
+        """Возвращает место записи, помеченное как удаленное (пустой ID)."""
+        row = bytearray(row)
+        row[0] |= 1
+        return bytes(row)
+
+
+@lru_cache(maxsize=64)
+def _layout(columns: tuple) -> RowLayout:
+    return RowLayout(columns)
+
+
+def _read_header(data) -> tuple:
+    """Разбирает заголовок файла.
+
+    Returns:
+        tuple: (раскладка, записей, мест, размер кучи, устаревших байт,
+            флаги, смещение записей, смещение кучи)
+
+    Raises:
+        ValueError: Если файл не является таблицей этого формата
+    """
+    if len(data) < HEADER.size:
+        raise ValueError('Файл таблицы поврежден: нет заголовка.')
+    magic, schema_size, count, capacity, heap_size, garbage, flags = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('Файл не является таблицей формата mmap.')
+    schema = json.loads(bytes(data[HEADER.size:HEADER.size + schema_size]))
+    layout = _layout(tuple(schema))
+    rows_offset = _align(HEADER.size + schema_size)
+    heap_offset = rows_offset + capacity * layout.size
+    return (layout, count, capacity, heap_size, garbage, flags,
+            rows_offset, heap_offset)
+
+
+def write_table(file, columns: list, rows, capacity: int = None) -> None:
+    """Пишет файл таблицы целиком.
+
+    Args:
+        file: Файл, открытый для записи в двоичном режиме
+        columns: Схема таблицы ['ID:int', 'name:str', ...]
+        rows: Записи в порядке ID
+        capacity: Число мест под записи; по умолчанию capacity_for(len(rows))
+    """
+    layout = _layout(tuple(columns))
+    count = len(rows)
+    capacity = max(capacity or capacity_for(count), count)
+    heap = bytearray()
+    packed = bytearray()
+    flags = 0
+    for record in rows:
+        row, has_nulls = layout.pack(record, heap, 0)
+        packed += row
+        if has_nulls:
+            flags |= HAS_NULLS
+    _write_file(file, layout, count, capacity, packed, heap, 0, flags)
+
+
+def _write_file(file, layout: RowLayout, count: int, capacity: int, rows,
+                heap, garbage: int, flags: int) -> None:
+    schema = json.dumps(layout.columns).encode('utf-8')
+    rows_offset = _align(HEADER.size + len(schema))
+    file.write(HEADER.pack(MAGIC, len(schema), count, capacity, len(heap),
+                           garbage, flags))
+    file.write(schema)
+    file.write(bytes(rows_offset - HEADER.size - len(schema)))
+    file.write(rows)
+    # Свободные места не пишутся: файл остается разреженным
+    file.seek(rows_offset + capacity * layout.size)
+    file.write(heap)
+    file.truncate()
+
+
+def append_rows(path: str, records: list) -> bool:
+    """Дописывает записи в свободные места файла, не переписывая его.
+
+    Строки дописываются в кучу, записи - в свободные места, и только затем
+    в заголовке увеличивается число записей. Читатель, открывший файл
+    раньше, видит прежнее число записей и не замечает дописанного.
+
+    Args:
+        path: Путь к файлу таблицы
+        records: Новые записи
+
+    Returns:
+        bool: False, если места не хватает или ID записей не больше
+            последнего - тогда файл нужно переписать
+    """
+    with open(path, 'r+b') as file:
+        head = file.read(HEADER.size)
+        schema_size = HEADER.unpack(head)[1]
+        (layout, count, capacity, heap_size, garbage, flags, rows_offset,
+         heap_offset) = _read_header(head + file.read(schema_size))
+        if count + len(records) > capacity:
+            return False
+        last_id = None
+        if count:
+            file.seek(rows_offset + (count - 1) * layout.size + layout.id_offset)
+            (last_id,) = _ID.unpack(file.read(_ID.size))
+        for record in records:
+            if last_id is not None and record['ID'] <= last_id:
+                return False
+            last_id = record['ID']
+
+        heap = bytearray()
+        rows = bytearray()
+        for record in records:
+            row, has_nulls = layout.pack(record, heap, heap_size)
+            rows += row
+            if has_nulls:
+                flags |= HAS_NULLS
+        file.seek(heap_offset + heap_size)
+        file.write(heap)
+        file.seek(rows_offset + count * layout.size)
+        file.write(rows)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, schema_size, count + len(records), capacity,
+                               heap_size + len(heap), garbage, flags))
+    metrics.increment('bytes_written_total', len(heap) + len(rows) + HEADER.size,
+                      kind='table')
+    return True
+
+
+def patch_rows(path: str, updated: list = (), removed=()) -> tuple:
+    """Заменяет и удаляет записи на их местах в файле, не переписывая его.
+
+    Строки новых версий дописываются в конец кучи, затем заголовок
+    получает новый размер кучи, и только после этого новые версии
+    записываются на места прежних. Удаленная запись остается на месте
+    надгробием: в маске помечается пустым ее ID. Строки замененных и
+    удаленных записей учитываются как устаревшие, надгробия - как
+    удаленные места; по ним движок решает, когда переписать файл.
+
+    Args:
+        path: Путь к файлу таблицы
+        updated: Новые версии записей
+        removed: ID удаленных записей
+
+    Returns:
+        tuple: (устаревших байт кучи, размер кучи, удаленных мест,
+            занятых мест)
+    """
+    table = MappedTable(path)
+    layout = table.layout
+    heap = bytearray()
+    garbage = table.garbage
+    flags = table.flags
+    deleted = table.mapped - table.live
+
+    # {номер места: новые байты места}
+    changes = {}
+    for record_id in removed:
+        slot = table.mapped_position(record_id)
+        if slot is None or slot in changes:
+            continue
+        offset = table.slot(slot)
+        old = layout.struct.unpack_from(table.map, offset)
+        garbage += layout.string_bytes(old)
+        changes[slot] = layout.tombstone(table.map[offset:offset + layout.size])
+        flags |= HAS_DELETED
+        deleted += 1
+    for record in updated:
+        slot = table.mapped_position(record['ID'])
+        if slot is None or slot in changes:
+            continue
+        old = layout.struct.unpack_from(table.map, table.slot(slot))
+        garbage += layout.string_bytes(old)
+        row, has_nulls = layout.pack(record, heap, table.heap_size)
+        changes[slot] = row
+        if has_nulls:
+            flags |= HAS_NULLS
+    if not changes:
+        return table.garbage, table.heap_size, deleted, table.mapped
+
+    with open(path, 'r+b') as file:
+        if heap:
+            file.seek(table.heap_offset + table.heap_size)
+            file.write(heap)
+        head = HEADER.unpack_from(table.map, 0)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, head[1], table.mapped, table.capacity,
+                               table.heap_size + len(heap), garbage, flags))
+        for slot in sorted(changes):
+            file.seek(table.slot(slot))
+            file.write(changes[slot])
+    metrics.increment('bytes_written_total',
+                      len(heap) + HEADER.size + len(changes) * layout.size,
+                      kind='table')
+    return garbage, table.heap_size + len(heap), deleted, table.mapped
+
+
+def patch_table(table, file, appended: list = ()) -> None:
+    """Пишет новую версию файла с новыми записями после записей таблицы.
+
+    Неизмененные записи копируются байтами без распаковки, куча
+    копируется целиком, строки новых записей дописываются в ее конец.
+    Если в файле есть надгробия или новые записи не продолжают порядок ID,
+    файл пишется заново.
+
+    Args:
+        table: Таблица MappedTable, открытая до изменений
+        file: Файл для новой версии, открытый для записи в двоичном режиме
+        appended: Новые записи
+    """
+    layout = table.layout
+    ids = [record['ID'] for record in appended]
+    if table.live != table.mapped or (ids and (
+            ids != sorted(ids)
+            or table.mapped and ids[0] <= table._id_at(table.mapped - 1))):
+        rows = sorted([*table, *appended], key=lambda record: record['ID'])
+        write_table(file, layout.columns, rows)
+        return
+    view = memoryview(table.map)
+    heap_size = table.heap_size
+    heap = bytearray()
+    flags = table.flags
+
+    rows = bytearray(view[table.slot(0):table.slot(table.mapped)])
+    for record in appended:
+        row, has_nulls = layout.pack(record, heap, heap_size)
+        rows += row
+        if has_nulls:
+            flags |= HAS_NULLS
+    count = table.mapped + len(appended)
+    old_heap = view[table.heap_offset:table.heap_offset + heap_size]
+    _write_file(file, layout, count, capacity_for(count), rows,
+                bytes(old_heap) + heap, table.garbage, flags)
+
+
+class MappedTable(ColumnarTable):
+    """Таблица, читаемая из файла формата mmap без загрузки в память.
+
+    Открытие читает только заголовок, чтение записи по ID распаковывает
+    одно место фиксированной ширины, а условия WHERE по столбцам int и bool
+    вычисляются по значениям прямо в отображенном файле (через NumPy, если
+    он установлен), без создания словарей записей.
+
+    Для остального кода таблица выглядит как ColumnarTable. Новые записи
+    держатся в памяти после отображенных, новые версии отображенных
+    записей - в словаре по местам, а удаленные места исключаются из
+    списка живых мест. Целиком в память таблица переносится только
+    при сортировке.
+
+    Надгробия удаленных записей пропускаются: если они есть в файле,
+    при открытии собирается список живых мест, и номер строки переводится
+    в место через него.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            while True:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                header = _read_header(data)
+                # Заголовок мог обновиться после отображения - тогда
+                # дописанная куча не вошла в отображение
+                if header[7] + header[3] <= len(data):
+                    break
+                data.close()
+        (self.layout, self.mapped, self.capacity, self.heap_size, self.garbage,
+         self.flags, self.rows_offset, self.heap_offset) = header
+        self.map = data
+        self.names = self.layout.names
+        self.types = self.layout.types
+        self._heap = memoryview(data)[self.heap_offset:self.heap_offset + self.heap_size]  # noqa: E501
+        # Записи, добавленные в памяти после отображенных
+        self._tail = []
+        # Вся таблица в памяти после сортировки
+        self._rows = None
+        # Новые версии отображенных записей по местам
+        self._changed = {}
+        # Места, удаленные в памяти, - надгробий в файле у них еще нет
+        self._deleted = set()
+        # Живые места по порядку (array('q')) или None, если надгробий нет
+        self._live = None
+        self.live = self.mapped
+        if self.flags & HAS_DELETED:
+            self._live = self._live_slots()
+            self.live = len(self._live)
+
+    def _live_slots(self) -> array:
+        """Собирает номера мест без надгробий."""
+        if np is not None:
+            view = np.ndarray((self.mapped,), dtype=self.layout.dtype,
+                              buffer=self.map, offset=self.rows_offset)
+            slots = np.flatnonzero((view['m'][:, 0] & 1) == 0)
+            return array('q', slots.astype(np.int64).tobytes())
+        return array('q', (slot for slot in range(self.mapped)
+                           if not self.map[self.slot(slot)] & 1))
+
+    @property
+    def _size(self) -> int:
+        return len(self)
+
+    def __len__(self) -> int:
+        if self._rows is not None:
+            return len(self._rows)
+        return self.live + len(self._tail)
+
+    def slot(self, position: int) -> int:
+        """Возвращает смещение места записи в файле."""
+        return self.rows_offset + position * self.layout.size
+
+    def _id_at(self, position: int) -> int:
+        return _ID.unpack_from(self.map, self.slot(position) + self.layout.id_offset)[0]  # noqa: E501
+
+    def row(self, position: int) -> dict:
+        if self._rows is not None:
+            return self._rows[position]
+        if position >= self.live:
+            return self._tail[position - self.live]
+        if self._live is not None:
+            position = self._live[position]
+        return self.row_at(position)
+
+    def row_at(self, slot: int) -> dict:
+        """Возвращает запись по номеру места в файле."""
+        if slot in self._changed:
+            return self._changed[slot]
+        values = self.layout.struct.unpack_from(self.map, self.slot(slot))
+        return self.layout.record(values, self._heap)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            start, stop, step = position.indices(len(self))
+            if (self._rows is None and self._live is None and step == 1
+                    and stop <= self.mapped):
+                return list(self._iter_mapped(start, stop))
+            return [self.row(i) for i in range(start, stop, step)]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('Номер строки вне таблицы')
+        return self.row(position)
+
+    def _iter_mapped(self, start: int, stop: int):
+        record = self.layout.record
+        heap = self._heap
+        changed = self._changed
+        deleted = self._live is not None
+        region = memoryview(self.map)[self.slot(start):self.slot(stop)]
+        for slot, values in enumerate(self.layout.struct.iter_unpack(region), start):  # noqa: E501
+            if deleted and (values[0][0] & 1 or slot in self._deleted):
+                continue
+            yield changed[slot] if slot in changed else record(values, heap)
+
+    def __iter__(self):
+        if self._rows is not None:
+            yield from self._rows
+            return
+        yield from self._iter_mapped(0, self.mapped)
+        yield from self._tail
+
+    def mapped_position(self, record_id: int):
+        """Находит место записи в файле по ID.
+
+        Пока в ID нет пропусков, место равно ID минус первый ID, и поиск
+        читает одну страницу файла; иначе место ищется двоичным поиском.
+
+        Returns:
+            int: Номер места или None, если записи нет или она удалена
+        """
+        if not self.mapped:
+            return None
+        guess = record_id - self._id_at(0)
+        if 0 <= guess < self.mapped and self._id_at(guess) == record_id:
+            slot = guess
+        else:
+            low, high = 0, self.mapped
+            while low < high:
+                middle = (low + high) // 2
+                if self._id_at(middle) < record_id:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low >= self.mapped or self._id_at(low) != record_id:
+                return None
+            slot = low
+        if self.flags & HAS_DELETED and self.map[self.slot(slot)] & 1:
+            return None
+        return slot
+
+    def position(self, record_id: int):
+        if self._rows is not None:
+            position = bisect.bisect_left(self._rows, record_id,
+                                          key=lambda record: record['ID'])
+            if position < len(self._rows) and self._rows[position]['ID'] == record_id:  # noqa: E501
+                return position
+            return None
+        if self._tail and record_id >= self._tail[0]['ID']:
+            for offset, record in enumerate(self._tail):
+                if record['ID'] == record_id:
+                    return self.live + offset
+            return None
+        slot = self.mapped_position(record_id)
+        if slot is None or self._live is None:
+            return slot
+        position = bisect.bisect_left(self._live, slot)
+        if position < self.live and self._live[position] == slot:
+            return position
+        return None
+
+    def _materialize(self) -> list:
+        if self._rows is None:
+            self._rows = list(self)
+            self._tail = []
+        return self._rows
+
+    def extend(self, rows) -> None:
+        if self._rows is not None:
+            self._rows.extend(rows)
+        else:
+            self._tail.extend(rows)
+
+    def _slot_of(self, position: int) -> int:
+        return position if self._live is None else self._live[position]
+
+    def update_rows(self, records: list) -> None:
+        for record in records:
+            position = self.position(record['ID'])
+            if position is None:
+                continue
+            if self._rows is not None:
+                self._rows[position] = {**self._rows[position], **record}
+            elif position >= self.live:
+                offset = position - self.live
+                self._tail[offset] = {**self._tail[offset], **record}
+            else:
+                slot = self._slot_of(position)
+                self._changed[slot] = {**self.row_at(slot), **record}
+
+    def delete_ids(self, ids) -> None:
+        removed = set(ids)
+        if self._rows is not None:
+            self._rows = [record for record in self._rows
+                          if record['ID'] not in removed]
+            return
+        slots = set()
+        for record_id in removed:
+            position = self.position(record_id)
+            if position is not None and position < self.live:
+                slots.add(self._slot_of(position))
+        if slots:
+            if self._live is None:
+                self._live = array('q', range(self.mapped))
+            if len(slots) <= DELETE_IN_PLACE:
+                # Немного мест удаляется сдвигом массива, без обхода в Python
+                for slot in sorted(slots, reverse=True):
+                    del self._live[bisect.bisect_left(self._live, slot)]
+            else:
+                self._live = array('q', (slot for slot in self._live
+                                         if slot not in slots))
+            self.live = len(self._live)
+            self._deleted |= slots
+            for slot in slots:
+                self._changed.pop(slot, None)
+        self._tail = [record for record in self._tail
+                      if record['ID'] not in removed]
+
+    def sort_by_id(self) -> None:
+        self._materialize().sort(key=lambda record: record['ID'])
+
+    def rebuild(self, rows: list) -> None:
+        self._rows = list(rows)
+        self._tail = []
+
+    def _column_mask(self, name: str, compare, value):
+        if self._rows is not None:
+            return _records_mask(self._rows, name, compare, value)
+        mask = self._mapped_mask(name, compare, value)
+        if not self._tail:
+            return mask
+        tail = _records_mask(self._tail, name, compare, value)
+        if np is not None:
+            return np.concatenate([mask, tail])
+        return mask + tail
+
+    def _mapped_mask(self, name: str, compare, value):
+        """Вычисляет условие по столбцу отображенных записей."""
+        column = self.names.index(name)
+        col_type = self.types[name]
+        if np is None:
+            mask = self._changed_mask(self._scan_mask(column, compare, value),
+                                      name, compare, value)
+            return self._live_mask(mask)
+
+        view = np.ndarray((self.mapped,), dtype=self.layout.dtype,
+                          buffer=self.map, offset=self.rows_offset)
+        if col_type != 'str':
+            # Значения сравниваются прямо в отображенном файле
+            mask = compare(view[f'f{column}'], value)
+        elif compare in (operator.eq, operator.ne):
+            # Сначала сравниваются длины, байты - только у подходящих по длине
+            target = value.encode('utf-8')
+            starts = view[f'f{column}']
+            candidates = np.flatnonzero(view[f'l{column}'] == len(target))
+            mask = np.zeros(self.mapped, dtype=bool)
+            heap = self._heap
+            for position in candidates.tolist():
+                start = int(starts[position])
+                mask[position] = heap[start:start + len(target)] == target
+            if compare is operator.ne:
+                mask = ~mask
+        else:
+            # Порядок строк проверяется по декодированным строкам
+            flags = self._scan_mask(column, compare, value)
+            mask = np.frombuffer(flags, dtype=np.uint8).astype(bool)
+
+        if self.flags & HAS_NULLS:
+            nulls = (view['m'][:, column // 8] >> (column % 8) & 1).astype(bool)
+            # Пустое значение не равно никакому и не сравнивается по порядку
+            mask = mask | nulls if compare is operator.ne else mask & ~nulls
+        return self._live_mask(self._changed_mask(mask, name, compare, value))
+
+    def _changed_mask(self, mask, name: str, compare, value):
+        """Пересчитывает условие на местах с новыми версиями записей."""
+        if not self._changed:
+            return mask
+        mask = mask.copy() if np is not None else bytearray(mask)
+        flags = _records_mask(list(self._changed.values()), name, compare, value)
+        for slot, flag in zip(self._changed, flags):
+            mask[slot] = flag
+        return mask if np is not None else bytes(mask)
+
+    def _live_mask(self, mask):
+        """Оставляет в маске по всем местам только живые места."""
+        if self._live is None:
+            return mask
+        if np is not None:
+            return mask[np.frombuffer(self._live, dtype=np.int64)]
+        return bytes(mask[slot] for slot in self._live)
+
+    def _scan_mask(self, column: int, compare, value):
+        """Вычисляет условие без NumPy, распаковывая места без словарей."""
+        name, col_type, index = self.layout.plan[column]
+        region = memoryview(self.map)[self.slot(0):self.slot(self.mapped)]
+        rows = self.layout.struct.iter_unpack(region)
+        nullable = self.flags & HAS_NULLS
+        byte, bit = column // 8, 1 << (column % 8)
+        heap = self._heap
+        result = bytearray()
+        for values in rows:
+            if nullable and values[0][byte] & bit:
+                result.append(compare is operator.ne)
+                continue
+            if col_type == 'str':
+                start = values[index]
+                item = str(heap[start:start + values[index + 1]], 'utf-8')
+            else:
+                item = values[index]
+            result.append(bool(compare(item, value)))
+        return bytes(result)
+
+
+def _records_mask(rows: list, name: str, compare, value):
+    if compare in (operator.eq, operator.ne):
+        return _mask(compare(record.get(name), value) for record in rows)
+    return _mask(record.get(name) is not None and compare(record.get(name), value)
+                 for record in rows)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import random
+import time
+from functools import wraps
+
+# Префикс имен метрик в формате Prometheus
+PREFIX = 'primitive_db_'
+
+# Верхние границы корзин гистограмм задержки, секунды
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Сколько значений гистограммы хранится для расчета квантилей
+MAX_SAMPLES = 4096
+
+# Метрики выключены по умолчанию и включаются флагом --metrics или во время
+# работы (команда stats on|off). Выключенные метрики стоят одной проверки
+# флага на вызов
+_state = {'enabled': False}
+
+# {(имя, метки): значение}; метки - кортеж пар (метка, значение)
+_counters = {}
+# {(имя, метки): Histogram}
+_histograms = {}
+# Функции, возвращающие текущие значения {имя: число} (например, кэша)
+_gauges = []
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как в Prometheus.
+
+    Корзины нужны для вывода в Prometheus, а квантили считаются по самим
+    значениям: до MAX_SAMPLES значений хранятся все, дальше - равномерная
+    выборка из них (reservoir sampling).
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'samples')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.samples = []
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < MAX_SAMPLES:
+                self.samples[index] = value
+
+    def quantile(self, fraction: float) -> float:
+        """Считает квантиль по значениям с линейной интерполяцией между ними."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        position = fraction * (len(ordered) - 1)
+        low = int(position)
+        high = min(low + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def set_enabled(enabled: bool) -> None:
+    """Включает или выключает сбор метрик."""
+    _state['enabled'] = enabled
+
+
+def is_enabled() -> bool:
+    """Проверяет, собираются ли метрики."""
+    return _state['enabled']
+
+
+def reset() -> None:
+    """Обнуляет собранные метрики."""
+    _counters.clear()
+    _histograms.clear()
+
+
+def increment(name: str, value: int = 1, **labels) -> None:
+    """Увеличивает счетчик.
+
+    Args:
+        name: Имя счетчика
+        value: Прибавляемое значение
+        labels: Метки, например operation='select'
+    """
+    if not _state['enabled']:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Добавляет значение в гистограмму."""
+    if not _state['enabled']:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(value)
+
+
+def register_gauges(source) -> None:
+    """Добавляет источник текущих значений, читаемых при выводе метрик.
+
+    Args:
+        source: Функция без аргументов, возвращающая {имя: число}
+    """
+    _gauges.append(source)
+
+
+def timed(operation: str):
+    """Декоратор: считает вызовы, ошибки и задержку операции.
+
+    Задержка пишется в гистограмму operation_seconds, ошибки - в счетчик
+    errors_total с меткой operation.
+
+    Args:
+        operation: Имя операции (insert, select, ...)
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                increment('errors_total', operation=operation)
+                raise
+            finally:
+                observe('operation_seconds', time.perf_counter() - start,
+                        operation=operation)
+        return wrapper
+    return decorator
+
+
+def _gauge_values() -> dict:
+    values = {}
+    for source in _gauges:
+        values.update(source())
+    return values
+
+
+def snapshot() -> dict:
+    """Возвращает метрики в виде словаря, пригодного для JSON.
+
+    Returns:
+        dict: {"enabled", "operations": {операция: {count, errors, p50_ms,
+            p99_ms, mean_ms}}, "counters": [{name, labels, value}],
+            "gauges": {имя: значение}}
+    """
+    errors = {dict(labels).get('operation'): value
+              for (name, labels), value in _counters.items()
+              if name == 'errors_total'}
+    operations = {}
+    for (name, labels), histogram in sorted(_histograms.items()):
+        if name != 'operation_seconds':
+            continue
+        operation = dict(labels)['operation']
+        operations[operation] = {
+            'count': histogram.count,
+            'errors': errors.get(operation, 0),
+            'p50_ms': round(histogram.quantile(0.50) * 1000, 3),
+            'p99_ms': round(histogram.quantile(0.99) * 1000, 3),
+            'mean_ms': round(histogram.total / histogram.count * 1000, 3),
+        }
+    counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(_counters.items())
+                if name != 'errors_total']
+    return {'enabled': _state['enabled'], 'operations': operations,
+            'counters': counters, 'gauges': _gauge_values()}
+
+
+def to_json() -> str:
+    """Возвращает метрики в JSON."""
+    return json.dumps(snapshot(), ensure_ascii=False, indent=2)
+
+
+def _labels_text(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    text = ','.join(f'{name}="{value}"' for name, value in pairs)
+    return '{' + text + '}'
+
+
+def to_prometheus() -> str:
+    """Возвращает метрики в текстовом формате Prometheus."""
+    lines = []
+    declared = set()
+
+    def declare(name: str, kind: str) -> None:
+        if name not in declared:
+            declared.add(name)
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+
+    for (name, labels), value in sorted(_counters.items()):
+        declare(name, 'counter')
+        lines.append(f'{PREFIX}{name}{_labels_text(labels)} {value}')
+    for (name, labels), histogram in sorted(_histograms.items()):
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+            cumulative += count
+            le = (('le', bound),)
+            lines.append(f'{PREFIX}{name}_bucket{_labels_text(labels, le)} {cumulative}')  # noqa: E501
+        lines.append(f'{PREFIX}{name}_sum{_labels_text(labels)} {histogram.total}')
+        lines.append(f'{PREFIX}{name}_count{_labels_text(labels)} {histogram.count}')  # noqa: E501
+    for name, value in sorted(_gauge_values().items()):
+        declare(name, 'gauge')
+        lines.append(f'{PREFIX}{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def report() -> list:
+    """Возвращает метрики строками для вывода в консоль."""
+    data = snapshot()
+    lines = [f'Сбор метрик: {"включен" if data["enabled"] else "выключен"}']
+    if data['operations']:
+        lines.append(f'{"операция":<14} {"вызовов":>8} {"ошибок":>7} '
+                     f'{"p50, мс":>9} {"p99, мс":>9} {"среднее, мс":>12}')
+        for operation, item in data['operations'].items():
+            lines.append(f'{operation:<14} {item["count"]:>8} {item["errors"]:>7} '
+                         f'{item["p50_ms"]:>9.3f} {item["p99_ms"]:>9.3f} '
+                         f'{item["mean_ms"]:>12.3f}')
+    for item in data['counters']:
+        labels = ', '.join(f'{name}={value}' for name, value in item['labels'].items())  # noqa: E501
+        lines.append(f'{item["name"]}[{labels}]: {item["value"]}')
+    for name, value in data['gauges'].items():
+        lines.append(f'{name}: {value}')
+    return lines
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .predicates import compile_node
+
+# Примерная стоимость просмотра (записи x узлы условия), начиная с которой
+# просмотр делится между процессами
+PARALLEL_COST = 1_000_000
+
+# Меньше записей на процесс не дается - иначе запуск процесса дороже работы
+MIN_PARTITION = 50_000
+
+
+def available_cpus() -> int:
+    """Возвращает число ядер, доступных процессу."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+_settings = {
+    'workers': available_cpus(),
+    'cost': PARALLEL_COST,
+}
+
+# Просматриваемые данные. Процессы пула создаются через fork и получают
+# данные родителя без сериализации, а обратно передают только позиции
+_shared = {'rows': None}
+
+
+def configure_parallel(workers: int = None, cost: int = None) -> None:
+    """Меняет настройки параллельного просмотра.
+
+    Args:
+        workers: Наибольшее число процессов; 1 отключает параллельный просмотр
+        cost: Порог стоимости просмотра (записи x узлы условия)
+
+    Raises:
+        ValueError: Если значения не положительные
+    """
+    if workers is not None:
+        if workers < 1:
+            raise ValueError('Число процессов должно быть положительным.')
+        _settings['workers'] = workers
+    if cost is not None:
+        if cost < 1:
+            raise ValueError('Порог стоимости должен быть положительным.')
+        _settings['cost'] = cost
+
+
+def parallel_settings() -> dict:
+    """Возвращает настройки параллельного просмотра."""
+    return dict(_settings)
+
+
+def predicate_size(node) -> int:
+    """Считает узлы дерева условия - грубую цену проверки одной записи."""
+    if node[0] in ('and', 'or'):
+        return 1 + predicate_size(node[1]) + predicate_size(node[2])
+    if node[0] == 'not':
+        return 1 + predicate_size(node[1])
+    return 1
+
+
+def scan_workers(rows, predicate) -> int:
+    """Возвращает число процессов, между которыми делится просмотр.
+
+    1 означает просмотр в текущем процессе.
+    """
+    # Делить можно только список записей, упорядоченный по ID;
+    # столбцовая таблица уже проверяет условие целыми столбцами
+    if predicate is None or type(rows) is not list:
+        return 1
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return 1
+    if len(rows) * predicate_size(predicate.node) < _settings['cost']:
+        return 1
+    return max(1, min(_settings['workers'], len(rows) // MIN_PARTITION))
+
+
+def _filter_partition(start: int, stop: int, node) -> list:
+    matches = compile_node(node)
+    rows = _shared['rows']
+    return [position for position in range(start, stop) if matches(rows[position])]
+
+
+def parallel_matches(rows: list, predicate):
+    """Находит подходящие записи несколькими процессами.
+
+    Данные упорядочены по ID, поэтому непрерывные части списка - это
+    диапазоны ID. Части проверяются в ProcessPoolExecutor, а их результаты
+    склеиваются в порядке частей, то есть по возрастанию ID.
+
+    Args:
+        rows: Данные таблицы, упорядоченные по ID
+        predicate: Скомпилированное условие из compile_where
+
+    Returns:
+        list: Позиции подходящих записей по возрастанию или None, если
+        параллельный просмотр не окупается и таблицу выгоднее просмотреть
+        в текущем процессе
+    """
+    workers = scan_workers(rows, predicate)
+    if workers < 2:
+        return None
+
+    size = -(-len(rows) // workers)
+    _shared['rows'] = rows
+    try:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = [pool.submit(_filter_partition, start,
+                                   min(start + size, len(rows)), predicate.node)
+                       for start in range(0, len(rows), size)]
+            positions = []
+            for future in futures:
+                positions.extend(future.result())
+    finally:
+        _shared['rows'] = None
+    return positions
+
+
+def _filter_part(number: int, node) -> list:
+    matches = compile_node(node)
+    rows = _shared['rows'][number]
+    return [position for position, record in enumerate(rows) if matches(record)]
+
+
+def partition_matches(parts: list, predicate):
+    """Проверяет условие по секциям таблицы несколькими процессами.
+
+    Каждая секция - отдельная задача пула, поэтому секции просматриваются
+    параллельно, а результаты остаются разложенными по секциям.
+
+    Args:
+        parts: Списки записей секций
+        predicate: Скомпилированное условие из compile_where
+
+    Returns:
+        list: Позиции подходящих записей в каждой секции или None, если
+        параллельный просмотр не окупается
+    """
+    if (predicate is None or len(parts) < 2 or _settings['workers'] < 2
+            or any(type(rows) is not list for rows in parts)
+            or 'fork' not in multiprocessing.get_all_start_methods()):
+        return None
+    total = sum(len(rows) for rows in parts)
+    if total * predicate_size(predicate.node) < _settings['cost']:
+        return None
+
+    workers = min(_settings['workers'], len(parts))
+    _shared['rows'] = parts
+    try:
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            futures = [pool.submit(_filter_part, number, predicate.node)
+                       for number in range(len(parts))]
+            return [future.result() for future in futures]
+    finally:
+        _shared['rows'] = None
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import heapq
+import re
+import zlib
+from itertools import chain
+
+from .indexes import SEQUENCES_KEY, column_type, index_key
+from .predicates import equality_values, id_bounds
+from .storage import PARTITION_MARK
+
+# Служебный ключ метаданных с секционированием таблиц:
+# {таблица: {'by': 'hash', 'column': столбец, 'count': N}} или
+# {таблица: {'by': 'range', 'column': 'ID', 'size': N}}
+PARTITIONS_KEY = 'sys:partitions'
+
+# partition by hash(столбец) N | partition by range(ID) N
+PARTITION_CLAUSE = re.compile(
+    r'by\s+(hash|range)\s*\(\s*([^\s()]+)\s*\)\s+(\d+)$', re.IGNORECASE)
+
+
+def parse_partition(args: list) -> tuple:
+    """Отделяет от аргументов create_table часть PARTITION BY.
+
+    create_table users name:str city:str partition by hash(city) 4
+
+    Args:
+        args: Аргументы create_table после имени таблицы
+
+    Returns:
+        tuple: (столбцы, описание секционирования или None)
+
+    Raises:
+        ValueError: Если часть PARTITION BY записана неверно
+    """
+    words = [arg.lower() for arg in args]
+    if 'partition' not in words:
+        return args, None
+    start = words.index('partition')
+    match = PARTITION_CLAUSE.match(' '.join(args[start + 1:]))
+    if match is None or int(match.group(3)) < 1:
+        raise ValueError('Неверный формат секционирования. Используйте: '
+                         'partition by hash(<столбец>) <N> или '
+                         'partition by range(ID) <N>')
+    kind, column, number = match.group(1).lower(), match.group(2), int(match.group(3))  # noqa: E501
+    if kind == 'hash':
+        return args[:start], {'by': 'hash', 'column': column, 'count': number}
+    return args[:start], {'by': 'range', 'column': column, 'size': number}
+
+
+def define_partitioning(metadata: dict, table_name: str, spec: dict) -> dict:
+    """Проверяет секционирование по схеме таблицы и сохраняет его.
+
+    Args:
+        metadata: Метаданные с уже созданной таблицей
+        table_name: Имя таблицы
+        spec: Описание секционирования из parse_partition
+
+    Returns:
+        dict: Обновленные метаданные
+
+    Raises:
+        ValueError: Если столбца нет в таблице или диапазон задан не по ID
+    """
+    column_type(metadata, table_name, spec['column'])
+    if spec['by'] == 'range' and spec['column'] != 'ID':
+        raise ValueError('Секционирование по диапазону возможно только по ID.')
+    metadata.setdefault(PARTITIONS_KEY, {})[table_name] = spec
+    return metadata
+
+
+def partition_spec(metadata: dict, table_name: str):
+    """Возвращает описание секционирования таблицы или None."""
+    return metadata.get(PARTITIONS_KEY, {}).get(table_name)
+
+
+def describe(spec: dict) -> str:
+    """Записывает секционирование так же, как в create_table."""
+    number = spec['count'] if spec['by'] == 'hash' else spec['size']
+    return f"{spec['by']}({spec['column']}) {number}"
+
+
+def partition_name(table_name: str, number: int) -> str:
+    """Возвращает имя, под которым секция хранится как отдельная таблица."""
+    return f'{table_name}{PARTITION_MARK}{number}'
+
+
+def partition_count(metadata: dict, table_name: str) -> int:
+    """Возвращает число секций таблицы.
+
+    Секций по хешу столько, сколько задано при создании таблицы; секции
+    по диапазону ID появляются по мере выдачи ID.
+    """
+    spec = partition_spec(metadata, table_name)
+    if spec['by'] == 'hash':
+        return spec['count']
+    last_id = metadata.get(SEQUENCES_KEY, {}).get(table_name, 0)
+    return (last_id - 1) // spec['size'] + 1 if last_id > 0 else 0
+
+
+def partition_tables(metadata: dict, table_name: str) -> list:
+    """Возвращает имена хранимых таблиц: секций или самой таблицы."""
+    if partition_spec(metadata, table_name) is None:
+        return [table_name]
+    return [partition_name(table_name, number)
+            for number in range(partition_count(metadata, table_name))]
+
+
+def _hash_partition(key, count: int) -> int:
+    # Хеш строки в Python меняется от запуска к запуску, поэтому секция
+    # вычисляется по CRC32 ключа индекса - он не зависит от формы значения
+    return zlib.crc32(('' if key is None else key).encode('utf-8')) % count
+
+
+def partition_of(metadata: dict, table_name: str, record: dict) -> int:
+    """Возвращает номер секции, в которой хранится запись."""
+    spec = partition_spec(metadata, table_name)
+    if spec['by'] == 'range':
+        return (record['ID'] - 1) // spec['size']
+    col_type = column_type(metadata, table_name, spec['column'])
+    return _hash_partition(index_key(record.get(spec['column']), col_type),
+                           spec['count'])
+
+
+def split_records(metadata: dict, table_name: str, records: list,
+                  record=None) -> dict:
+    """Раскладывает записи по хранимым таблицам.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        records: Записи или элементы, содержащие записи
+        record: Функция, возвращающая запись элемента, или None, если
+            элементы - сами записи
+
+    Returns:
+        dict: {имя секции или таблицы: элементы в исходном порядке}
+    """
+    if partition_spec(metadata, table_name) is None:
+        return {table_name: records} if records else {}
+    groups = {}
+    for item in records:
+        row = item if record is None else record(item)
+        name = partition_name(table_name, partition_of(metadata, table_name, row))  # noqa: E501
+        groups.setdefault(name, []).append(item)
+    return groups
+
+
+def prune(metadata: dict, table_name: str, predicate=None):
+    """Оставляет секции, в которых могут быть записи, подходящие под условие.
+
+    Секции по диапазону отсекаются по границам ID из условия, секции по
+    хешу - по значениям столбца секционирования из условий = и IN на
+    верхнем уровне AND.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        predicate: Скомпилированное условие из compile_where или None
+
+    Returns:
+        list: Номера секций по возрастанию или None, если таблица
+            не секционирована
+    """
+    spec = partition_spec(metadata, table_name)
+    if spec is None:
+        return None
+    numbers = range(partition_count(metadata, table_name))
+    if predicate is None:
+        return list(numbers)
+    values = equality_values(predicate.node).get(spec['column'])
+    if spec['by'] == 'hash':
+        if values is None:
+            return list(numbers)
+        col_type = column_type(metadata, table_name, spec['column'])
+        return sorted({_hash_partition(index_key(value, col_type), spec['count'])
+                       for value in values})
+
+    size = spec['size']
+    bounds = id_bounds(predicate.node)
+    if bounds is not None:
+        low, high = bounds
+        first = 0 if low is None else max(0, (low - 1) // size)
+        last = len(numbers) - 1 if high is None else (high - 1) // size
+        numbers = range(first, min(last, len(numbers) - 1) + 1)
+    if values is not None:
+        numbers = sorted({(value - 1) // size for value in values}
+                         & set(numbers))
+    return list(numbers)
+
+
+def _record_id(record: dict) -> int:
+    return record['ID']
+
+
+def merge_partitions(metadata: dict, table_name: str, parts: list) -> list:
+    """Собирает записи секций в один список, упорядоченный по ID.
+
+    Секции по диапазону следуют друг за другом по ID и склеиваются,
+    секции по хешу сливаются по ID. Одна секция возвращается как есть.
+
+    Args:
+        metadata: Метаданные базы данных
+        table_name: Имя таблицы
+        parts: Записи секций в порядке их номеров
+
+    Returns:
+        list: Записи, упорядоченные по ID
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if partition_spec(metadata, table_name)['by'] == 'range':
+        return list(chain.from_iterable(parts))
+    return list(heapq.merge(*parts, key=_record_id))
+
+
+def load_partitioned(storage, metadata: dict, table_name: str) -> list:
+    """Загружает таблицу движком хранения, собирая ее из секций."""
+    if partition_spec(metadata, table_name) is None:
+        return storage.load(table_name)
+    return merge_partitions(metadata, table_name,
+                            [storage.load(name)
+                             for name in partition_tables(metadata, table_name)])  # noqa: E501
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+
+import operator
+import re
+from sys import intern
+
+# Лексемы условия WHERE: строки в кавычках, операторы сравнения, скобки
+# и запятые, остальные слова (имена столбцов, числа, ключевые слова)
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+      | (?P<op><=|>=|!=|<>|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<word>[^\s'"(),=<>!]+)
+    )""", re.VERBOSE)
+
+OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+TRUE_VALUES = ('true', '1', 'yes')
+FALSE_VALUES = ('false', '0', 'no')
+
+
+def tokenize(text: str) -> list:
+    """Разбивает текст на лексемы.
+
+    Args:
+        text: Текст условия или команды
+
+    Returns:
+        list: Лексемы (вид, значение, начало, конец). Вид - 'str', 'op',
+            'punct' или 'word'; у строк значение без кавычек
+
+    Raises:
+        ValueError: Если в тексте есть незакрытая кавычка или лишний символ
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f'Не удалось разобрать условие: {text[position:]}')
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'str':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        elif kind == 'op' and value == '<>':
+            value = '!='
+        tokens.append((kind, value, match.start(kind), match.end()))
+        position = match.end()
+    return tokens
+
+
+def clause_text(command: str, keyword: str, stop_words: tuple = ()) -> str:
+    """Выделяет из исходной команды текст части, начинающейся словом keyword.
+
+    Кавычки при этом сохраняются, поэтому строки с пробелами и запятыми
+    попадают в часть без искажений, а ключевые слова внутри строк
+    частью команды не считаются.
+
+    Args:
+        command: Исходная строка команды
+        keyword: Слово, после которого начинается часть
+        stop_words: Слова, на которых часть заканчивается
+
+    Returns:
+        str: Текст после слова keyword или пустая строка
+    """
+    tokens = tokenize(command)
+    start = None
+    for kind, value, begin, end in tokens:
+        if kind != 'word':
+            continue
+        if start is None and value.lower() == keyword:
+            start = end
+        elif start is not None and value.lower() in stop_words:
+            return command[start:begin].strip()
+    return command[start:].strip() if start is not None else ''
+
+
+def where_text(command: str, stop_words: tuple = ('limit', 'offset')) -> str:
+    """Выделяет из исходной команды текст условия WHERE.
+
+    Args:
+        command: Исходная строка команды
+        stop_words: Слова, на которых условие заканчивается
+
+    Returns:
+        str: Текст после слова WHERE или пустая строка
+    """
+    return clause_text(command, 'where', stop_words)
+
+
+def _is_punct(token: tuple, value: str) -> bool:
+    return token[0] == 'punct' and token[1] == value
+
+
+def parse_values(text: str) -> list:
+    """Разбирает кортежи значений команды insert.
+
+    Строки в кавычках могут содержать запятые, скобки и пробелы.
+
+    Args:
+        text: Текст после VALUES, например '(1, "a, b"), (2, 'c')'
+
+    Returns:
+        list: Списки значений кортежей; значения - строки без кавычек
+
+    Raises:
+        ValueError: Если кортеж не в скобках или записан неверно
+    """
+    tokens = tokenize(text)
+    rows = []
+    position = 0
+    while True:
+        if position >= len(tokens) or not _is_punct(tokens[position], '('):
+            raise ValueError('Значения должны быть в скобках')
+        position += 1
+        values = []
+        while True:
+            if position >= len(tokens):
+                raise ValueError('Не закрыта скобка в списке значений.')
+            kind, value = tokens[position][:2]
+            if kind not in ('str', 'word'):
+                raise ValueError(f'Ожидалось значение, получено: {value}')
+            values.append(value)
+            position += 1
+            if position < len(tokens) and _is_punct(tokens[position], ','):
+                position += 1
+            elif position < len(tokens) and _is_punct(tokens[position], ')'):
+                position += 1
+                break
+            else:
+                raise ValueError('Не закрыта скобка в списке значений.')
+        rows.append(values)
+        if position == len(tokens):
+            return rows
+        if not _is_punct(tokens[position], ','):
+            raise ValueError('Кортежи значений разделяются запятыми.')
+        position += 1
+
+
+class _Parser:
+    """Разбор условия методом рекурсивного спуска.
+
+    Грамматика:
+        expr  := and ('or' and)*
+        and   := not ('and' not)*
+        not   := 'not' not | '(' expr ')' | cond
+        cond  := column op value | column ['not'] 'in' '(' value (',' value)* ')'
+    """
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError('Неожиданный конец условия WHERE.')
+        self.position += 1
+        return token
+
+    def keyword(self, word: str) -> bool:
+        token = self.peek()
+        if token is not None and token[0] == 'word' and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: str) -> None:
+        token = self.next()
+        if token[0] != kind or token[1] != value:
+            raise ValueError(f'Ожидалось "{value}", получено "{token[1]}".')
+
+    def parse(self):
+        node = self.expr()
+        if self.peek() is not None:
+            raise ValueError(f'Лишний текст в условии: "{self.peek()[1]}".')
+        return node
+
+    def expr(self):
+        node = self.conjunction()
+        while self.keyword('or'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.keyword('and'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.keyword('not'):
+            return ('not', self.negation())
+        token = self.peek()
+        if token is not None and token[:2] == ('punct', '('):
+            self.position += 1
+            node = self.expr()
+            self.expect('punct', ')')
+            return node
+        return self.condition()
+
+    def value(self):
+        kind, value, _, _ = self.next()
+        if kind not in ('str', 'word'):
+            raise ValueError(f'Ожидалось значение, получено "{value}".')
+        return value
+
+    def condition(self):
+        kind, column, _, _ = self.next()
+        if kind != 'word':
+            raise ValueError(f'Ожидалось имя столбца, получено "{column}".')
+
+        negated = self.keyword('not')
+        if self.keyword('in'):
+            self.expect('punct', '(')
+            values = [self.value()]
+            while self.peek() is not None and self.peek()[:2] == ('punct', ','):
+                self.position += 1
+                values.append(self.value())
+            self.expect('punct', ')')
+            node = ('in', column, tuple(values))
+            return ('not', node) if negated else node
+        if negated:
+            raise ValueError('После NOT ожидалось IN.')
+
+        kind, op, _, _ = self.next()
+        if kind != 'op':
+            raise ValueError(f'Ожидался оператор сравнения, получено "{op}".')
+        return ('cmp', column, op, self.value())
+
+
+def parse_where(where_str: str):
+    """Разбирает условие WHERE в дерево.
+
+    Поддерживаются операторы =, !=, <, <=, >, >=, IN и связки AND, OR, NOT
+    со скобками. Узлы дерева - кортежи:
+    ('cmp', столбец, оператор, значение), ('in', столбец, (значения, ...)),
+    ('and', левый, правый), ('or', левый, правый), ('not', узел).
+
+    Args:
+        where_str: Текст условия, например "age >= 18 and city = 'Moscow'"
+
+    Returns:
+        tuple: Корень дерева или None для пустого условия
+
+    Raises:
+        ValueError: Если условие записано некорректно
+    """
+    if not where_str or not where_str.strip():
+        return None
+    return _Parser(tokenize(where_str)).parse()
+
+
+def column_types(columns: list) -> dict:
+    """Строит словарь {столбец: тип} по схеме ['ID:int', 'name:str', ...]."""
+    return dict(column.split(':', 1) for column in columns)
+
+
+def coerce(value, col_type: str, column: str = ''):
+    """Приводит значение из условия к типу столбца.
+
+    Raises:
+        ValueError: Если значение не приводится к типу столбца
+    """
+    if col_type == 'int':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Некорректное значение "{value}" '
+                             f'для столбца {column}:int')
+    if col_type == 'bool':
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in TRUE_VALUES:
+            return True
+        if str(value).lower() in FALSE_VALUES:
+            return False
+        raise ValueError(f'Некорректное булево значение "{value}" '
+                         f'для столбца {column}')
+    # Строки столбцов в словарном кодировании интернированы: совпадающее
+    # значение из условия сравнивается с ними по указателю
+    return intern(str(value))
+
+
+def normalize(node, types: dict):
+    """Приводит значения в дереве условия к типам столбцов.
+
+    Args:
+        node: Дерево условия
+        types: Типы столбцов {столбец: тип}
+
+    Returns:
+        tuple: Дерево с типизированными значениями
+
+    Raises:
+        ValueError: Если столбец не найден или значение не приводится к типу
+    """
+    if node is None:
+        return None
+    kind = node[0]
+    if kind in ('and', 'or'):
+        return (kind, normalize(node[1], types), normalize(node[2], types))
+    if kind == 'not':
+        return ('not', normalize(node[1], types))
+
+    column = node[1]
+    if column not in types:
+        raise ValueError(f'Столбец "{column}" не найден.')
+    if kind == 'in':
+        return ('in', column,
+                tuple(coerce(value, types[column], column) for value in node[2]))
+    return ('cmp', column, node[2], coerce(node[3], types[column], column))
+
+
+def _compile(node):
+    kind = node[0]
+    if kind == 'and':
+        left, right = _compile(node[1]), _compile(node[2])
+        return lambda record: left(record) and right(record)
+    if kind == 'or':
+        left, right = _compile(node[1]), _compile(node[2])
+        return lambda record: left(record) or right(record)
+    if kind == 'not':
+        inner = _compile(node[1])
+        return lambda record: not inner(record)
+
+    column = node[1]
+    if kind == 'in':
+        values = frozenset(node[2])
+        return lambda record: record.get(column) in values
+
+    _, _, op, value = node
+    if op == '=':
+        return lambda record: record.get(column) == value
+    if op == '!=':
+        return lambda record: record.get(column) != value
+    compare = OPERATORS[op]
+
+    def ordered(record):
+        record_value = record.get(column)
+        return record_value is not None and compare(record_value, value)
+    return ordered
+
+
+def compile_node(node):
+    """Компилирует уже типизированное дерево условия (атрибут node предиката).
+
+    Нужна там, где передать можно только дерево, а не саму функцию,
+    например в другой процесс.
+    """
+    return _compile(node)
+
+
+def compile_where(node, columns: list):
+    """Компилирует дерево условия в функцию проверки записи.
+
+    Значения условия приводятся к типам столбцов один раз при компиляции,
+    поэтому проверка записи сводится к сравнению готовых значений.
+
+    Args:
+        node: Дерево условия из parse_where или None
+        columns: Схема таблицы ['ID:int', 'name:str', ...]
+
+    Returns:
+        Функция matches(record) -> bool с атрибутами node (типизированное
+        дерево) и key (нормализованный ключ для кэша) или None для пустого
+        условия
+
+    Raises:
+        ValueError: Если столбец не найден или значение не приводится к типу
+    """
+    if node is None:
+        return None
+    typed = normalize(node, column_types(columns))
+    matches = _compile(typed)
+    matches.node = typed
+    matches.key = repr(typed)
+    return matches
+
+
+def conjuncts(node) -> list:
+    """Возвращает условия, соединенные на верхнем уровне связкой AND."""
+    if node is None:
+        return []
+    if node[0] == 'and':
+        return conjuncts(node[1]) + conjuncts(node[2])
+    return [node]
+
+
+def id_bounds(node):
+    """Находит границы диапазона ID, которым ограничено условие.
+
+    Args:
+        node: Типизированное дерево условия
+
+    Returns:
+        tuple: (нижняя, верхняя) границы включительно (None - без границы)
+            или None, если условие не ограничивает ID
+    """
+    low = high = None
+    found = False
+    for condition in conjuncts(node):
+        if condition[0] != 'cmp' or condition[1] != 'ID' or condition[2] == '!=':
+            continue
+        found = True
+        op, value = condition[2], condition[3]
+        if op in ('=', '>=', '>'):
+            bound = value + 1 if op == '>' else value
+            low = bound if low is None else max(low, bound)
+        if op in ('=', '<=', '<'):
+            bound = value - 1 if op == '<' else value
+            high = bound if high is None else min(high, bound)
+    return (low, high) if found else None
+
+
+def equality_values(node) -> dict:
+    """Находит столбцы, значения которых условие задает явно.
+
+    Args:
+        node: Типизированное дерево условия
+
+    Returns:
+        dict: {столбец: (значение, ...)} для условий вида столбец = значение
+            и столбец IN (...) на верхнем уровне AND
+    """
+    found = {}
+    for condition in conjuncts(node):
+        if condition[0] == 'cmp' and condition[2] == '=':
+            found.setdefault(condition[1], (condition[3],))
+        elif condition[0] == 'in':
+            found.setdefault(condition[1], condition[2])
+    return found
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+
+import json
+import struct
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен - без него доступен стандартный json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack необязателен
+    msgpack = None
+
+DEFAULT_CODEC = 'json'
+
+
+def _group_puts(entries: list) -> list:
+    """Объединяет идущие подряд записи put в одну {"op": "put", "rows": [...]}.
+
+    Одна обертка на пачку вместо обертки на каждую запись - файл читается
+    почти так же быстро, как список записей одним документом.
+    """
+    grouped = []
+    rows = []
+    for entry in entries:
+        if entry['op'] == 'put':
+            rows.append(entry['row'])
+            continue
+        if rows:
+            grouped.append(_put(rows))
+            rows = []
+        grouped.append(entry)
+    if rows:
+        grouped.append(_put(rows))
+    return grouped
+
+
+def _put(rows: list) -> dict:
+    if len(rows) == 1:
+        return {'op': 'put', 'row': rows[0]}
+    return {'op': 'put', 'rows': rows}
+
+
+def _expand(entries):
+    """Выдает записи журнала по одной, раскрывая пачки put."""
+    for entry in entries:
+        op = entry['op']
+        if op == 'put':
+            if 'rows' in entry:
+                for row in entry['rows']:
+                    yield 'put', row
+            else:
+                yield 'put', entry['row']
+        elif op == 'dict':
+            yield 'dict', entry['columns']
+        else:
+            yield 'del', entry['ID']
+
+
+class JsonCodec:
+    """JSON Lines через стандартный модуль json, без отступов и пробелов.
+
+    Файл журнала - строки {"op": "put", "row": {...}}, {"op": "put",
+    "rows": [...]} (пачка записей) и {"op": "del", "ID": N}.
+    """
+
+    name = 'json'
+    extension = '.jsonl'
+    # Кодек пишет JSON и годится для движка json (таблица одним документом)
+    textual = True
+
+    def dumps(self, value) -> bytes:
+        """Кодирует значение целиком."""
+        return json.dumps(value, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data: bytes):
+        """Декодирует значение, закодированное dumps."""
+        return json.loads(data)
+
+    def header(self, columns: list) -> bytes:
+        """Возвращает заголовок нового файла журнала."""
+        return b''
+
+    def encode(self, entries: list, columns: list) -> bytes:
+        """Кодирует записи журнала для дозаписи в файл.
+
+        Args:
+            entries: Записи {"op": "put", "row": ...} и {"op": "del", "ID": ...}
+            columns: Схема таблицы ['ID:int', 'name:str', ...]
+        """
+        dumps = self.dumps
+        return b''.join([dumps(entry) + b'\n' for entry in _group_puts(entries)])
+
+    def decode(self, data: bytes):
+        """Декодирует записи журнала по порядку.
+
+        Недописанная последняя запись (ее еще пишет другой процесс или
+        запись оборвал сбой) пропускается.
+
+        Yields:
+            tuple: ("put", запись), ("del", ID) или ("dict", словарь
+                столбцов в словарном кодировании)
+        """
+        loads = self.loads
+        end = data.rfind(b'\n') + 1
+        body = data[:end].rstrip()
+        if not body:
+            return
+        try:
+            # Переводы строк внутри значений экранированы, поэтому журнал
+            # читается как один массив JSON - одним вызовом loads вместо
+            # вызова на каждую строку
+            entries = loads(b'[' + body.replace(b'\n', b',') + b']')
+        except ValueError:
+            # Пустые строки или \r\n в журнале, записанном вручную
+            entries = [loads(line) for line in body.splitlines() if line.strip()]
+        yield from _expand(entries)
+
+
+class OrjsonCodec(JsonCodec):
+    """Тот же формат JSON Lines, но через orjson - в несколько раз быстрее."""
+
+    name = 'orjson'
+
+    def dumps(self, value) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, data: bytes):
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """Поток объектов MessagePack: те же записи журнала, но в двоичном виде."""
+
+    name = 'msgpack'
+    extension = '.msgpack'
+    textual = False
+
+    def dumps(self, value) -> bytes:
+        return msgpack.packb(value)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False)
+
+    def header(self, columns: list) -> bytes:
+        return b''
+
+    def encode(self, entries: list, columns: list) -> bytes:
+        packb = msgpack.packb
+        return b''.join([packb(entry) for entry in _group_puts(entries)])
+
+    def decode(self, data: bytes):
+        unpacker = msgpack.Unpacker(raw=False, max_buffer_size=max(len(data), 1))
+        unpacker.feed(data)
+        # Недописанный последний объект Unpacker просто не выдает
+        yield from _expand(unpacker)
+
+
+# Двоичный формат: заголовок со схемой, затем кадры "операция, длина, тело"
+MAGIC = b'PDB1'
+_LENGTH = struct.Struct('<I')
+_FRAME = struct.Struct('<cI')
+_ID = struct.Struct('<q')
+_PUT = b'P'
+_DEL = b'D'
+# Словарь пачки записей: JSON {столбец: [строки]}
+_DICT = b'T'
+# Форматы struct столбцов фиксированной ширины, остальные - 8-байтовые int;
+# code - номер строки в словаре пачки
+_FIXED = {'bool': '?', 'code': 'I'}
+
+
+class _RowLayout:
+    """Раскладка записи по схеме таблицы для двоичного формата.
+
+    Запись - один struct (битовая маска пустых значений, int и bool
+    столбцы, длины строк), за которым идут байты строк в UTF-8. Так запись
+    читается одним вызовом unpack_from. Столбцы типа code (строки в
+    словарном кодировании) хранятся как 4-байтовые номера.
+    """
+
+    def __init__(self, columns: tuple):
+        pairs = [column.split(':', 1) for column in columns]
+        self.names = [name for name, _ in pairs]
+        self.fixed = [name for name, col_type in pairs if col_type != 'str']
+        self.strings = [name for name, col_type in pairs if col_type == 'str']
+        mask_size = (len(self.names) + 7) // 8
+        self.struct = struct.Struct(f'<{mask_size}s' + ''.join(
+            _FIXED.get(col_type, 'q')
+            for _, col_type in pairs if col_type != 'str') + 'I' * len(self.strings))
+        self.mask_size = mask_size
+        self.empty_mask = bytes(mask_size)
+        # Значения распаковываются как "int и bool, затем строки" -
+        # перестановка возвращает их к порядку столбцов схемы
+        unpacked = self.fixed + self.strings
+        self.order = [unpacked.index(name) for name in self.names]
+
+    def pack(self, record: dict) -> bytes:
+        mask = 0
+        for bit, name in enumerate(self.names):
+            if record.get(name) is None:
+                mask |= 1 << bit
+        encoded = [(record.get(name) or '').encode('utf-8') for name in self.strings]
+        try:
+            head = self.struct.pack(mask.to_bytes(self.mask_size, 'little'),
+                                    *[record.get(name) or 0 for name in self.fixed],
+                                    *[len(value) for value in encoded])
+        except struct.error:
+            raise ValueError('Целое значение не помещается в 64 бита.')
+        return head + b''.join(encoded)
+
+    def unpack(self, data: bytes, offset: int) -> dict:
+        values = self.struct.unpack_from(data, offset)
+        offset += self.struct.size
+        count = len(self.fixed)
+        unpacked = list(values[1:count + 1])
+        for size in values[count + 1:]:
+            unpacked.append(data[offset:offset + size].decode('utf-8'))
+            offset += size
+        record = dict(zip(self.names, [unpacked[i] for i in self.order]))
+        mask = values[0]
+        if mask != self.empty_mask:
+            bits = int.from_bytes(mask, 'little')
+            for bit, name in enumerate(self.names):
+                if bits >> bit & 1:
+                    record[name] = None
+        return record
+
+
+@lru_cache(maxsize=64)
+def _layout(columns: tuple) -> _RowLayout:
+    return _RowLayout(columns)
+
+
+class BinaryCodec:
+    """Двоичный формат записей по схеме таблицы (имя:тип из метаданных).
+
+    Файл начинается с сигнатуры и схемы, поэтому читается без метаданных.
+    Имена столбцов в записях не повторяются, а числа хранятся как 8 байт,
+    поэтому файл меньше и читается быстрее JSON.
+    """
+
+    name = 'binary'
+    extension = '.bin'
+    textual = False
+
+    def header(self, columns: list) -> bytes:
+        schema = json.dumps(list(columns)).encode('utf-8')
+        return MAGIC + _LENGTH.pack(len(schema)) + schema
+
+    def encode(self, entries: list, columns: list) -> bytes:
+        layout = _layout(tuple(columns))
+        parts = []
+        for entry in entries:
+            if entry['op'] == 'put':
+                body = layout.pack(entry['row'])
+                parts.append(_FRAME.pack(_PUT, len(body)))
+            elif entry['op'] == 'dict':
+                body = json.dumps(entry['columns'], ensure_ascii=False).encode('utf-8')  # noqa: E501
+                parts.append(_FRAME.pack(_DICT, len(body)))
+            else:
+                body = _ID.pack(entry['ID'])
+                parts.append(_FRAME.pack(_DEL, len(body)))
+            parts.append(body)
+        return b''.join(parts)
+
+    def decode(self, data: bytes):
+        if not data.startswith(MAGIC):
+            return
+        offset = len(MAGIC)
+        if len(data) < offset + _LENGTH.size:
+            return
+        (size,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if len(data) < offset + size:
+            # Заголовок оборван сбоем - записей в файле еще нет
+            return
+        layout = _layout(tuple(json.loads(data[offset:offset + size])))
+        offset += size
+
+        end = len(data)
+        while offset + _FRAME.size <= end:
+            op, size = _FRAME.unpack_from(data, offset)
+            offset += _FRAME.size
+            if offset + size > end:
+                # Недописанный кадр
+                return
+            if op == _PUT:
+                yield 'put', layout.unpack(data, offset)
+            elif op == _DICT:
+                yield 'dict', json.loads(data[offset:offset + size])
+            else:
+                yield 'del', _ID.unpack_from(data, offset)[0]
+            offset += size
+
+
+CODECS = {JsonCodec.name: JsonCodec(), BinaryCodec.name: BinaryCodec()}
+if orjson is not None:
+    CODECS[OrjsonCodec.name] = OrjsonCodec()
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+# Кодеки, которым нужны необязательные модули
+_OPTIONAL = {OrjsonCodec.name: 'orjson', MsgpackCodec.name: 'msgpack'}
+
+
+def get_codec(name: str):
+    """Возвращает кодек по имени.
+
+    Raises:
+        ValueError: Если кодек неизвестен или его модуль не установлен
+    """
+    if name in CODECS:
+        return CODECS[name]
+    if name in _OPTIONAL:
+        raise ValueError(f'Кодек {name} недоступен: модуль {_OPTIONAL[name]} '
+                         'не установлен.')
+    raise ValueError(f'Неизвестный кодек: {name}. '
+                     f'Доступные: {", ".join(CODECS)}')
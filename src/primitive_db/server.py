@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import asyncio
+import contextlib
+import io
+import json
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+
+from .decorators import parse_where_condition, set_auto_confirm
+from .engine import (
+    define_table,
+    delete_records,
+    execute,
+    insert_record,
+    insert_records,
+    report_recovery,
+    select_records,
+    update_records,
+)
+from .manager import TableManager
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5544
+
+# Сколько запросов одного соединения читается вперед, пока выполняются
+# предыдущие (конвейер)
+PIPELINE_DEPTH = 128
+
+# Команды, управляющие транзакцией менеджера. Менеджер общий для всех
+# соединений, поэтому транзакции одного клиента через сервер недоступны
+TRANSACTION_COMMANDS = ('begin', 'commit', 'rollback')
+
+
+def _where(request: dict):
+    where = request.get('where')
+    return parse_where_condition(where) if where else None
+
+
+def handle_request(manager: TableManager, request: dict):
+    """Выполняет один запрос протокола и возвращает его результат.
+
+    Операции:
+    - command: text - любая команда консоли, результат - ее вывод;
+    - create_table: table, columns - результат - столбцы таблицы;
+    - insert: table, values - результат - ID новой записи;
+    - insert: table, rows - результат - список ID новых записей;
+    - select: table, [where, limit, offset] - результат - список записей;
+    - update: table, set, [where] - результат - число обновленных записей;
+    - delete: table, [where] - результат - число удаленных записей.
+
+    Raises:
+        ValueError: Если операция неизвестна или аргументы неверны
+    """
+    op = request.get('op')
+    if op == 'command':
+        text = request['text']
+        if not text.strip():
+            raise ValueError('Пустая команда.')
+        if shlex.split(text)[0].lower() in TRANSACTION_COMMANDS:
+            raise ValueError('Транзакции через сервер не поддерживаются.')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            execute(manager, text)
+        return output.getvalue()
+
+    table_name = request.get('table')
+    # Сообщения ядра в ответ не попадают
+    with contextlib.redirect_stdout(io.StringIO()):
+        if op == 'create_table':
+            with manager.autocommit():
+                return define_table(manager, table_name, request['columns'])
+        if op == 'insert' and 'rows' in request:
+            with manager.autocommit():
+                rows = [[str(value) for value in values]
+                        for values in request['rows']]
+                return list(insert_records(manager, table_name, rows))
+        if op == 'insert':
+            with manager.autocommit():
+                return insert_record(manager, table_name,
+                                     [str(value) for value in request['values']])
+        if op == 'select':
+            rows = select_records(manager, table_name, _where(request),
+                                  request.get('limit'), request.get('offset', 0))
+            return list(rows)
+        if op == 'update':
+            with manager.autocommit():
+                set_clause = {column: str(value)
+                              for column, value in request['set'].items()}
+                return update_records(manager, table_name, set_clause,
+                                      _where(request))
+        if op == 'delete':
+            with manager.autocommit():
+                return delete_records(manager, table_name, _where(request))
+    raise ValueError(f'Неизвестная операция: {op}')
+
+
+class DatabaseServer:
+    """Сетевой сервер базы данных на asyncio.
+
+    Протокол построчный: каждая строка запроса - объект JSON
+    {"id": ..., "op": ..., ...} (см. handle_request) или просто текст
+    команды консоли. На каждую строку приходит строка ответа
+    {"id": ..., "ok": true, "result": ...} или
+    {"id": ..., "ok": false, "error": "..."}.
+
+    Все соединения работают с одним менеджером таблиц, поэтому таблицы
+    загружаются в память один раз. Запросы соединения читаются вперед
+    (конвейер) и выполняются по порядку, ответы приходят в том же порядке.
+
+    Запросы выполняются по одному в отдельном потоке: менеджер не
+    рассчитан на параллельные вызовы, поэтому записи в таблицу идут строго
+    по очереди, а от других процессов таблицу защищает ее блокировка
+    записи (lock_table). Пока запрос ждет блокировку, цикл событий
+    принимает соединения и читает запросы. Ожидание fsync журнала вынесено
+    в другой поток: пока запись ждет диска, сервер выполняет запросы
+    других соединений, и накопившиеся записи сбрасываются на диск одним
+    fsync (group commit).
+    """
+
+    def __init__(self, manager: TableManager, host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self._server = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # Журнал сбрасывается на диск сервером после каждой записи
+        manager.wal.configure('off')
+
+    async def start(self) -> None:
+        """Начинает принимать соединения."""
+        self._server = await asyncio.start_server(self._handle, self.host,
+                                                  self.port)
+        # Порт 0 означает любой свободный - запоминаем выданный
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Обслуживает соединения, пока сервер не остановят."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self) -> None:
+        """Перестает принимать новые соединения.
+
+        Ждет окончания выполняемого запроса; запросы в очереди отменяются.
+        """
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(cancel_futures=True)
+
+    async def _handle(self, reader, writer) -> None:
+        requests = asyncio.Queue(PIPELINE_DEPTH)
+        worker = asyncio.create_task(self._respond(requests, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    await requests.put(line.decode('utf-8'))
+        except ConnectionError:
+            pass
+        finally:
+            await requests.put(None)
+            await worker
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _respond(self, requests: asyncio.Queue, writer) -> None:
+        while True:
+            line = await requests.get()
+            if line is None:
+                return
+            response = await self.process(line)
+            writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8')
+                         + b'\n')
+            # Ответы копятся в буфере, пока есть следующие запросы
+            if requests.empty():
+                with contextlib.suppress(ConnectionError):
+                    await writer.drain()
+
+    async def process(self, line: str) -> dict:
+        """Выполняет строку запроса и возвращает ответ."""
+        request_id = None
+        try:
+            if line.lstrip().startswith('{'):
+                request = json.loads(line)
+                request_id = request.get('id')
+            else:
+                request = {'op': 'command', 'text': line.strip()}
+            result = await self._run(request)
+        except Exception as e:
+            # Изменения неудавшегося запроса отменены в TableManager.autocommit
+            return {'id': request_id, 'ok': False, 'error': str(e)}
+        return {'id': request_id, 'ok': True, 'result': result}
+
+    async def _run(self, request: dict):
+        loop = asyncio.get_running_loop()
+        result, committed = await loop.run_in_executor(self._executor,
+                                                       self._execute, request)
+        if committed:
+            # Ответ на запись отправляется, когда журнал уже на диске
+            await loop.run_in_executor(None, self.manager.wal.sync)
+        return result
+
+    def _execute(self, request: dict) -> tuple:
+        # Выполняется в потоке запросов: ожидание lock_table не держит цикл
+        commits = self.manager.wal.commits
+        result = handle_request(self.manager, request)
+        return result, self.manager.wal.commits != commits
+
+
+def serve(port: int = DEFAULT_PORT, host: str = DEFAULT_HOST) -> None:
+    """Запускает сервер и обслуживает клиентов до Ctrl+C."""
+    # Запрос клиента сам по себе подтверждает операцию - спрашивать некого
+    set_auto_confirm(True)
+    manager = TableManager("db_meta.json")
+    report_recovery(manager)
+    server = DatabaseServer(manager, host, port)
+    try:
+        asyncio.run(_serve(server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        manager.close()
+        print("Сервер остановлен.")
+
+
+async def _serve(server: DatabaseServer) -> None:
+    await server.start()
+    print(f"Сервер слушает {server.host}:{server.port}", flush=True)
+    await server.serve_forever()
@@ -0,0 +1,671 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+
+from . import metrics
+from .dictionary import (
+    coded_schema,
+    decode_row,
+    encode_entries,
+    encoded_columns,
+    intern_values,
+    read_dictionary,
+)
+from .locks import file_lock
+from .mapped import MappedTable, append_rows, patch_rows, patch_table, write_table
+from .serialization import DEFAULT_CODEC, get_codec
+
+DATA_DIR = "data"
+
+# Порог компактизации журнала: не меньше COMPACT_MIN_RECORDS строк в файле,
+# из которых доля устаревших версий и надгробий не меньше COMPACT_RATIO
+COMPACT_MIN_RECORDS = 1000
+COMPACT_RATIO = 0.5
+
+# Сколько записей снимка кодируется за один раз
+SNAPSHOT_BATCH = 10000
+
+# Куча строк файла mmap переписывается, когда устаревшие строки занимают
+# не меньше COMPACT_RATIO ее объема и не меньше MAPPED_GARBAGE_BYTES
+MAPPED_GARBAGE_BYTES = 1 << 16
+
+# Поколения таблиц: {таблица: номер}. Номер растет при каждом изменении
+# данных таблицы и входит в ключи кэша запросов
+_generations = {}
+
+
+# Секции секционированной таблицы хранятся как отдельные таблицы
+# с именами <таблица>#<номер>
+PARTITION_MARK = '#'
+
+
+def base_table(table_name: str) -> str:
+    """Возвращает имя таблицы, которой принадлежит хранимая таблица-секция."""
+    return table_name.split(PARTITION_MARK, 1)[0]
+
+
+def generation(table_name: str) -> int:
+    """Возвращает текущее поколение данных таблицы."""
+    return _generations.get(table_name, 0)
+
+
+def bump_generation(table_name: str) -> None:
+    """Отмечает, что данные таблицы изменились.
+
+    Изменение секции меняет и поколение всей таблицы.
+    """
+    _generations[table_name] = generation(table_name) + 1
+    base = base_table(table_name)
+    if base != table_name:
+        _generations[base] = generation(base) + 1
+
+
+def table_lock(table_name: str):
+    """Возвращает блокировку записи таблицы (файл data/<таблица>.lock).
+
+    Блокировку держит процесс, изменяющий таблицу; читатели ее не берут,
+    потому что файлы таблиц только дописываются или подменяются атомарно.
+    """
+    return file_lock(os.path.join(DATA_DIR, f"{table_name}.lock"))
+
+
+def table_version(table_name: str) -> int:
+    """Возвращает номер последней фиксации, записанной в файл таблицы.
+
+    Номер хранится в data/<таблица>.lsn и растет с каждой фиксацией
+    таблицы любым процессом. Его меняют только под блокировкой записи
+    таблицы, а после удаления таблицы файл остается, чтобы номера
+    таблицы с тем же именем продолжали расти.
+    """
+    return read_version(version_path(table_name))
+
+
+def set_table_version(table_name: str, version: int) -> None:
+    """Записывает номер фиксации, изменения которой уже в файле таблицы."""
+    try:
+        write_version(version_path(table_name), version)
+    except FileNotFoundError:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        write_version(version_path(table_name), version)
+
+
+def read_version(path: str) -> int:
+    """Читает номер из файла версии; 0, если файла нет."""
+    # Номер читается при каждом обращении к статистике, поэтому без
+    # текстовой обертки open()
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return 0
+    try:
+        return int(os.read(descriptor, 32) or 0)
+    except ValueError:
+        return 0
+    finally:
+        os.close(descriptor)
+
+
+def write_version(path: str, version: int) -> None:
+    """Записывает номер в файл версии."""
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        # Номер фиксированной ширины перезаписывается на месте одним
+        # write - без временного файла и переименования на каждой фиксации
+        os.write(descriptor, b'%20d' % version)
+    finally:
+        os.close(descriptor)
+
+
+def version_path(table_name: str) -> str:
+    """Возвращает путь к файлу с номером последней фиксации таблицы."""
+    return os.path.join(DATA_DIR, f"{table_name}.lsn")
+
+
+def sync_file(path: str) -> None:
+    """Сбрасывает содержимое файла на диск (fsync), если файл существует."""
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with file:
+        os.fsync(file.fileno())
+
+
+def sync_directory(path: str) -> None:
+    """Сбрасывает на диск запись каталога, чтобы переименования пережили сбой."""
+    try:
+        descriptor = os.open(path or '.', os.O_RDONLY)
+    except OSError:
+        # Не на всех платформах каталог можно открыть для fsync
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+def atomic_write(path: str, write, sync: bool = False,
+                 binary: bool = False) -> None:
+    """Атомарно заменяет файл новым содержимым.
+
+    Содержимое пишется во временный файл рядом с целевым, который затем
+    подменяет целевой через os.replace. При сбое на диске остается либо
+    старая, либо новая версия файла, но не обрезанная.
+
+    Args:
+        path: Путь к файлу
+        write: Функция write(file), записывающая содержимое
+        sync: Сбросить файл и каталог на диск перед возвратом
+        binary: Открыть временный файл в двоичном режиме
+    """
+    tmp_path = path + '.tmp'
+    if binary:
+        file = open(tmp_path, 'wb')
+    else:
+        file = open(tmp_path, 'w', encoding='utf-8')
+    with file:
+        write(file)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+    if sync:
+        sync_directory(os.path.dirname(path))
+
+
+def updated_rows(pairs: list) -> list:
+    """Возвращает новые версии записей из пар (прежний ID, новая версия).
+
+    ID - ключ записи в памяти, в файлах таблиц и в индексах, поэтому
+    обновление не может его изменить.
+
+    Raises:
+        ValueError: Если новая версия записи меняет ID
+    """
+    rows = []
+    for record_id, record in pairs:
+        if record['ID'] != record_id:
+            raise ValueError(f'Обновление не может изменить ID записи '
+                             f'{record_id} на {record["ID"]}.')
+        rows.append(record)
+    return rows
+
+
+def changes_data(method):
+    """Декоратор для методов записи: после вызова увеличивает поколение таблицы."""  # noqa: E501
+    def wrapper(self, table_name, *args, **kwargs):
+        try:
+            return method(self, table_name, *args, **kwargs)
+        finally:
+            bump_generation(table_name)
+    return wrapper
+
+
+class JsonStorage:
+    """Устаревший формат: вся таблица хранится в одном файле data/<таблица>.json.
+
+    Любая запись переписывает файл целиком. Документ кодируется кодеком
+    базы, поэтому годятся только кодеки, пишущие JSON.
+    """
+
+    name = 'json'
+
+    def __init__(self, codec=None):
+        self.codec = codec or get_codec(DEFAULT_CODEC)
+        self.schemas = {}
+
+    def path(self, table_name: str) -> str:
+        """Возвращает путь к файлу таблицы."""
+        return os.path.join(DATA_DIR, f"{table_name}.json")
+
+    def load(self, table_name: str) -> list:
+        """Загружает все записи таблицы.
+
+        Args:
+            table_name: Имя таблицы
+
+        Returns:
+            list: Данные таблицы или пустой список, если файл не найден
+        """
+        os.makedirs(DATA_DIR, exist_ok=True)
+        try:
+            with open(self.path(table_name), 'rb') as file:
+                raw = file.read()
+        except FileNotFoundError:
+            return []
+        metrics.increment('bytes_read_total', len(raw), kind='table')
+        data = self.codec.loads(raw)
+        # Индекс первичного ключа опирается на порядок записей по ID
+        data.sort(key=lambda record: record['ID'])
+        intern_values(data, encoded_columns(self.schemas, base_table(table_name)))
+        return data
+
+    @changes_data
+    def save(self, table_name: str, data: list) -> None:
+        """Перезаписывает файл таблицы целиком.
+
+        Args:
+            table_name: Имя таблицы
+            data: Данные для сохранения
+        """
+        os.makedirs(DATA_DIR, exist_ok=True)
+        encoded = self.codec.dumps(data)
+        atomic_write(self.path(table_name),
+                     lambda file: file.write(encoded), binary=True)
+        metrics.increment('bytes_written_total', len(encoded), kind='table')
+
+    @changes_data
+    def append(self, table_name: str, records: list) -> None:
+        """Добавляет записи в конец таблицы."""
+        data = self.load(table_name)
+        data.extend(records)
+        self.save(table_name, data)
+
+    @changes_data
+    def update(self, table_name: str, pairs: list) -> None:
+        """Заменяет записи новыми версиями по парам (прежний ID, запись)."""
+        changed = {record['ID']: record for record in updated_rows(pairs)}
+        data = [changed.get(record['ID'], record)
+                for record in self.load(table_name)]
+        self.save(table_name, data)
+
+    @changes_data
+    def delete(self, table_name: str, ids: list) -> None:
+        """Удаляет записи с указанными ID."""
+        removed = set(ids)
+        data = [record for record in self.load(table_name)
+                if record['ID'] not in removed]
+        self.save(table_name, data)
+
+    @changes_data
+    def drop(self, table_name: str) -> None:
+        """Удаляет файл таблицы."""
+        if os.path.exists(self.path(table_name)):
+            os.remove(self.path(table_name))
+
+    def sync(self, table_name: str) -> None:
+        """Сбрасывает файл таблицы на диск."""
+        sync_file(self.path(table_name))
+
+    def wait(self, table_name: str = None) -> None:
+        """Фоновых задач у этого формата нет."""
+
+
+class LogStorage:
+    """Журнал записей data/<таблица>.<расширение кодека>, в который только дописывают.
+
+    Каждая запись журнала - операция:
+    {"op": "put", "row": {...}} - новая запись или новая версия записи,
+    {"op": "put", "rows": [...]} - пачка таких записей,
+    {"op": "del", "ID": N} - надгробие удаленной записи.
+    Записи кодируются кодеком базы (по умолчанию JSON Lines, см.
+    serialization). При загрузке журнал проигрывается по порядку, поэтому
+    вставка, обновление и удаление стоят O(1) операций ввода-вывода.
+    Накопившиеся устаревшие версии убираются компактизацией в фоновом потоке.
+
+    Если у таблицы есть столбцы в словарном кодировании, перед каждой
+    пачкой записей пишется словарь {"op": "dict", "columns": {...}},
+    а в записях вместо строк этих столбцов - номера в словаре (см.
+    dictionary.encode_entries).
+    """
+
+    name = 'log'
+
+    def __init__(self, codec=None):
+        self.codec = codec or get_codec(DEFAULT_CODEC)
+        # Метаданные базы: кодеку нужна схема таблицы для заголовка
+        # и записей, ее подставляет get_storage
+        self.schemas = {}
+        self._locks = {}
+        # {таблица: [строк в файле, живых записей]}
+        self._counters = {}
+        self._compactions = {}
+        # Таблицы, ожидающие компактизации которых нужно прервать
+        self._cancelled = set()
+
+    def path(self, table_name: str) -> str:
+        """Возвращает путь к журналу таблицы."""
+        return os.path.join(DATA_DIR, f"{table_name}{self.codec.extension}")
+
+    def _lock(self, table_name: str) -> threading.Lock:
+        return self._locks.setdefault(table_name, threading.Lock())
+
+    def _columns(self, table_name: str) -> tuple:
+        """Возвращает схему таблицы для кодека и столбцы в словарном кодировании."""  # noqa: E501
+        base = base_table(table_name)
+        encoded = encoded_columns(self.schemas, base)
+        return coded_schema(self.schemas.get(base), encoded), encoded
+
+    def _replay(self, table_name: str) -> list:
+        """Проигрывает журнал и возвращает актуальные записи в порядке ID."""
+        rows = {}
+        lines = 0
+        try:
+            with open(self.path(table_name), 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            data = b''
+        metrics.increment('bytes_read_total', len(data), kind='table')
+        dictionary = {}
+        # Недописанную другим процессом последнюю запись кодек пропускает
+        for op, value in self.codec.decode(data):
+            if op == 'dict':
+                dictionary = read_dictionary(value)
+                continue
+            lines += 1
+            if op == 'put':
+                rows[value['ID']] = decode_row(value, dictionary) if dictionary else value  # noqa: E501
+            else:
+                rows.pop(value, None)
+        self._counters[table_name] = [lines, len(rows)]
+        return [rows[record_id] for record_id in sorted(rows)]
+
+    def _write_entries(self, table_name: str, entries: list) -> None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        columns, encoded = self._columns(table_name)
+        entries = encode_entries(entries, encoded)
+        with self._lock(table_name):
+            with open(self.path(table_name), 'ab') as file:
+                payload = self.codec.encode(entries, columns)
+                if file.tell() == 0:
+                    payload = self.codec.header(columns) + payload
+                file.write(payload)
+        metrics.increment('bytes_written_total', len(payload), kind='table')
+
+    def _count(self, table_name: str, lines: int, live: int) -> None:
+        """Учитывает записанные строки и при необходимости запускает компактизацию."""  # noqa: E501
+        counters = self._counters.get(table_name)
+        if counters is None:
+            # Журнал еще не читался в этом процессе - оценку сделаем при загрузке
+            return
+        counters[0] += lines
+        counters[1] += live
+        total, alive = counters
+        if total >= COMPACT_MIN_RECORDS and (total - alive) / total >= COMPACT_RATIO:  # noqa: E501
+            self.compact(table_name, background=True)
+
+    def load(self, table_name: str) -> list:
+        """Загружает актуальные записи таблицы.
+
+        Args:
+            table_name: Имя таблицы
+
+        Returns:
+            list: Данные таблицы или пустой список, если журнал не найден
+        """
+        with self._lock(table_name):
+            return self._replay(table_name)
+
+    @changes_data
+    def save(self, table_name: str, data: list) -> None:
+        """Перезаписывает журнал снимком данных (по одной записи put на строку).
+
+        Args:
+            table_name: Имя таблицы
+            data: Данные для сохранения
+        """
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with self._lock(table_name):
+            self._write_snapshot(table_name, data)
+
+    def _write_snapshot(self, table_name: str, data: list) -> None:
+        columns, encoded = self._columns(table_name)
+
+        def write(file):
+            file.write(self.codec.header(columns))
+            for start in range(0, len(data), SNAPSHOT_BATCH):
+                batch = data[start:start + SNAPSHOT_BATCH]
+                entries = [{'op': 'put', 'row': record} for record in batch]
+                file.write(self.codec.encode(encode_entries(entries, encoded),
+                                             columns))
+            metrics.increment('bytes_written_total', file.tell(), kind='table')
+
+        # Снимок заменяет журнал, поэтому сразу сбрасывается на диск
+        atomic_write(self.path(table_name), write, sync=True, binary=True)
+        self._counters[table_name] = [len(data), len(data)]
+
+    @changes_data
+    def append(self, table_name: str, records: list) -> None:
+        """Дописывает новые записи в конец журнала."""
+        self._write_entries(table_name,
+                            [{'op': 'put', 'row': record} for record in records])
+        self._count(table_name, len(records), len(records))
+
+    @changes_data
+    def update(self, table_name: str, pairs: list) -> None:
+        """Дописывает новые версии записей по парам (прежний ID, запись)."""
+        records = updated_rows(pairs)
+        self._write_entries(table_name,
+                            [{'op': 'put', 'row': record} for record in records])
+        self._count(table_name, len(records), 0)
+
+    @changes_data
+    def delete(self, table_name: str, ids: list) -> None:
+        """Дописывает надгробия для удаленных записей."""
+        self._write_entries(table_name,
+                            [{'op': 'del', 'ID': record_id} for record_id in ids])
+        self._count(table_name, len(ids), -len(ids))
+
+    @changes_data
+    def drop(self, table_name: str) -> None:
+        """Удаляет журнал таблицы."""
+        self._cancelled.add(table_name)
+        self.wait(table_name)
+        self._cancelled.discard(table_name)
+        with self._lock(table_name):
+            if os.path.exists(self.path(table_name)):
+                os.remove(self.path(table_name))
+            self._counters.pop(table_name, None)
+
+    def sync(self, table_name: str) -> None:
+        """Сбрасывает журнал таблицы на диск."""
+        with self._lock(table_name):
+            sync_file(self.path(table_name))
+
+    def compact(self, table_name: str, background: bool = False) -> None:
+        """Переписывает журнал, оставляя только актуальные версии записей.
+
+        Args:
+            table_name: Имя таблицы
+            background: Выполнить компактизацию в отдельном потоке
+        """
+        def run():
+            # Журнал переписывается под блокировкой записи таблицы, иначе
+            # строки, дописанные другим процессом, потерялись бы
+            lock = table_lock(table_name)
+            if not lock.acquire(timeout=None,
+                                cancelled=lambda: table_name in self._cancelled):
+                return
+            try:
+                with self._lock(table_name):
+                    self._write_snapshot(table_name, self._replay(table_name))
+            finally:
+                lock.release()
+
+        if not background:
+            run()
+            return
+        running = self._compactions.get(table_name)
+        if running is not None and running.is_alive():
+            return
+        thread = threading.Thread(target=run, name=f"compact-{table_name}")
+        self._compactions[table_name] = thread
+        thread.start()
+
+    def wait(self, table_name: str = None) -> None:
+        """Дожидается завершения фоновых компактизаций.
+
+        Args:
+            table_name: Имя таблицы или None для всех таблиц
+        """
+        names = [table_name] if table_name else list(self._compactions)
+        for name in names:
+            thread = self._compactions.pop(name, None)
+            if thread is not None:
+                thread.join()
+
+
+class MappedStorage:
+    """Двоичный файл data/<таблица>.tbl с записями фиксированной ширины.
+
+    Значения int и bool лежат в записях как есть (8 и 1 байт), строки - в
+    общей куче в конце файла (формат описан в модуле mapped). Файл
+    открывается через mmap, поэтому загрузка таблицы читает только
+    заголовок, а записи распаковываются по мере обращения к ним.
+
+    Вставка пишет записи в свободные места файла без его перезаписи.
+    Обновление пишет новые версии на места прежних, удаление помечает
+    места надгробиями; файл при этом не переписывается и не сбрасывается
+    на диск (это делает контрольная точка). Когда устаревших строк в куче
+    или надгробий становится много, файл переписывается заново. Кодек базы
+    этим форматом не используется.
+    """
+
+    name = 'mmap'
+
+    def __init__(self, codec=None):
+        self.codec = codec or get_codec(DEFAULT_CODEC)
+        self.schemas = {}
+        self._locks = {}
+
+    def path(self, table_name: str) -> str:
+        """Возвращает путь к файлу таблицы."""
+        return os.path.join(DATA_DIR, f"{table_name}.tbl")
+
+    def _lock(self, table_name: str) -> threading.Lock:
+        return self._locks.setdefault(table_name, threading.Lock())
+
+    def load(self, table_name: str):
+        """Открывает таблицу без чтения записей.
+
+        Args:
+            table_name: Имя таблицы
+
+        Returns:
+            MappedTable или пустой список, если файл не найден
+        """
+        try:
+            return MappedTable(self.path(table_name))
+        except FileNotFoundError:
+            return []
+
+    @changes_data
+    def save(self, table_name: str, data: list) -> None:
+        """Перезаписывает файл таблицы целиком.
+
+        Args:
+            table_name: Имя таблицы
+            data: Данные для сохранения
+        """
+        os.makedirs(DATA_DIR, exist_ok=True)
+        columns = self.schemas.get(base_table(table_name))
+        if columns is None and isinstance(data, MappedTable):
+            columns = data.layout.columns
+        with self._lock(table_name):
+            atomic_write(self.path(table_name),
+                         lambda file: write_table(file, columns, data),
+                         sync=True, binary=True)
+        self._count_written(table_name)
+
+    def _count_written(self, table_name: str) -> None:
+        # Новая версия файла записана целиком
+        if metrics.is_enabled():
+            metrics.increment('bytes_written_total',
+                              os.path.getsize(self.path(table_name)), kind='table')
+
+    def _rewrite(self, table_name: str, appended: list = ()) -> None:
+        table = self.load(table_name)
+        if not isinstance(table, MappedTable):
+            atomic_write(self.path(table_name),
+                         lambda file: write_table(file, self.schemas[base_table(table_name)], appended),  # noqa: E501
+                         sync=True, binary=True)
+        else:
+            atomic_write(self.path(table_name),
+                         lambda file: patch_table(table, file, appended),
+                         sync=True, binary=True)
+        self._count_written(table_name)
+
+    def _patch(self, table_name: str, updated: list = (), removed=()) -> None:
+        try:
+            garbage, heap_size, deleted, slots = patch_rows(
+                self.path(table_name), updated, removed)
+        except FileNotFoundError:
+            return
+        if ((garbage >= MAPPED_GARBAGE_BYTES and garbage >= heap_size * COMPACT_RATIO)
+                or (slots >= COMPACT_MIN_RECORDS
+                    and deleted >= slots * COMPACT_RATIO)):
+            # Файл переписывается без устаревших строк и надгробий
+            table = self.load(table_name)
+            atomic_write(self.path(table_name),
+                         lambda file: write_table(file, table.layout.columns, table),  # noqa: E501
+                         sync=True, binary=True)
+            self._count_written(table_name)
+
+    @changes_data
+    def append(self, table_name: str, records: list) -> None:
+        """Дописывает записи в свободные места файла.
+
+        Если места не хватает, файл переписывается с запасом мест.
+        """
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with self._lock(table_name):
+            try:
+                if append_rows(self.path(table_name), records):
+                    return
+            except FileNotFoundError:
+                pass
+            self._rewrite(table_name, records)
+
+    @changes_data
+    def update(self, table_name: str, pairs: list) -> None:
+        """Пишет записи из пар (прежний ID, запись) на места прежних версий."""
+        records = updated_rows(pairs)
+        with self._lock(table_name):
+            self._patch(table_name, updated=records)
+
+    @changes_data
+    def delete(self, table_name: str, ids: list) -> None:
+        """Помечает места удаленных записей надгробиями."""
+        with self._lock(table_name):
+            self._patch(table_name, removed=ids)
+
+    @changes_data
+    def drop(self, table_name: str) -> None:
+        """Удаляет файл таблицы."""
+        with self._lock(table_name):
+            if os.path.exists(self.path(table_name)):
+                os.remove(self.path(table_name))
+
+    def sync(self, table_name: str) -> None:
+        """Сбрасывает файл таблицы на диск."""
+        sync_file(self.path(table_name))
+
+    def wait(self, table_name: str = None) -> None:
+        """Фоновых задач у этого формата нет."""
+
+
+BACKENDS = {
+    JsonStorage.name: JsonStorage,
+    LogStorage.name: LogStorage,
+    MappedStorage.name: MappedStorage,
+}
+
+# Созданные движки: {(движок, кодек): объект}
+_instances = {}
+
+
+def storage_backend(name: str, codec):
+    """Возвращает общий для процесса движок хранения с заданным кодеком."""
+    key = (name, codec.name)
+    backend = _instances.get(key)
+    if backend is None:
+        backend = _instances[key] = BACKENDS[name](codec)
+    return backend
+
+
+def backends() -> list:
+    """Возвращает все созданные в процессе движки хранения."""
+    return list(_instances.values())
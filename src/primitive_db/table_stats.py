@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+
+import base64
+import hashlib
+import json
+import math
+import os
+from collections import Counter
+
+from .indexes import index_key
+from .parallel import predicate_size
+
+# Файл статистики лежит рядом с файлом метаданных
+STATS_FILE = 'db_stats.json'
+
+# Число регистров HyperLogLog - 2**HLL_BITS байт на столбец,
+# стандартная ошибка оценки около 1.04 / sqrt(2**HLL_BITS), то есть 3%
+HLL_BITS = 10
+_HASH_BITS = 64
+
+# Сколько значений столбца отслеживается счетчиками частых значений
+# и сколько из них выводит info
+MCV_TRACKED = 32
+MCV_SHOWN = 5
+
+# Доля записей, подходящих под одно сравнение, когда о столбце ничего
+# не известно. Оценка грубая: она нужна, чтобы сравнить способы доступа
+SELECTIVITY = {'=': 0.1, '!=': 0.9, '<': 0.33, '<=': 0.33, '>': 0.33,
+               '>=': 0.33}
+
+# Цена проверки записи столбцовой таблицей относительно проверки словаря:
+# условие вычисляется целыми столбцами
+COLUMNAR_COST = 0.1
+
+
+class HyperLogLog:
+    """Оценка числа различных значений по 2**HLL_BITS регистрам.
+
+    Значения хешируются blake2b: хеш одинаков во всех процессах, поэтому
+    регистры можно сохранять в файл и дополнять после перезапуска.
+    Удаление значений не поддерживается - оценка может только расти.
+    """
+
+    def __init__(self, registers: bytes = None):
+        self.registers = bytearray(registers or bytes(1 << HLL_BITS))
+        self._estimate = None
+
+    def copy(self) -> 'HyperLogLog':
+        """Возвращает независимую копию регистров."""
+        copied = HyperLogLog(self.registers)
+        copied._estimate = self._estimate
+        return copied
+
+    def update(self, keys) -> None:
+        """Учитывает значения (ключи индекса)."""
+        registers = self.registers
+        shift = _HASH_BITS - HLL_BITS
+        mask = (1 << shift) - 1
+        blake2b, from_bytes = hashlib.blake2b, int.from_bytes
+        for key in keys:
+            value = from_bytes(blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')  # noqa: E501
+            register = value >> shift
+            rank = shift - (value & mask).bit_length() + 1
+            if rank > registers[register]:
+                registers[register] = rank
+                self._estimate = None
+
+    def estimate(self) -> int:
+        """Возвращает оценку числа различных значений."""
+        if self._estimate is None:
+            size = len(self.registers)
+            alpha = 0.7213 / (1 + 1.079 / size)
+            raw = alpha * size * size / sum(2.0 ** -rank for rank in self.registers)  # noqa: E501
+            zeros = self.registers.count(0)
+            if raw <= 2.5 * size and zeros:
+                # На малых числах точнее линейный подсчет пустых регистров
+                raw = size * math.log(size / zeros)
+            self._estimate = round(raw)
+        return self._estimate
+
+
+class ColumnStats:
+    """Статистика столбца: различные значения, границы, частые значения.
+
+    Частые значения отслеживаются алгоритмом Space-Saving: счетчиков
+    не больше MCV_TRACKED, новое значение вытесняет самое редкое и
+    наследует его счетчик, поэтому частые значения не теряются, а их
+    частоты могут быть завышены. Из пачки записей в счетчики попадают
+    только MCV_TRACKED ее самых частых значений. Границы после удаления
+    записей не сужаются.
+    """
+
+    def __init__(self, col_type: str, data: dict = None):
+        data = data or {}
+        self.col_type = col_type
+        registers = base64.b64decode(data['hll']) if 'hll' in data else None
+        self.distinct = HyperLogLog(registers)
+        self.min = data.get('min')
+        self.max = data.get('max')
+        # {ключ индекса: число записей}
+        self.counts = dict(data.get('mcv', {}))
+
+    def copy(self) -> 'ColumnStats':
+        """Возвращает независимую копию статистики столбца."""
+        copied = ColumnStats(self.col_type)
+        copied.distinct = self.distinct.copy()
+        copied.min, copied.max = self.min, self.max
+        copied.counts = dict(self.counts)
+        return copied
+
+    def add(self, values: list) -> None:
+        """Учитывает значения новых записей."""
+        values = [value for value in values if value is not None]
+        if not values:
+            return
+        low, high = min(values), max(values)
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+        # Значения записей уже приведены к типу столбца, поэтому считаются
+        # как есть, а к ключам индекса приводятся только различные
+        batch = Counter(values)
+        col_type = self.col_type
+        self.distinct.update(index_key(value, col_type) for value in batch)
+        for value, count in batch.most_common(MCV_TRACKED):
+            key = index_key(value, col_type)
+            if key in self.counts:
+                self.counts[key] += count
+            elif len(self.counts) < MCV_TRACKED:
+                self.counts[key] = count
+            else:
+                rarest = min(self.counts, key=self.counts.get)
+                self.counts[key] = self.counts.pop(rarest) + count
+
+    def remove(self, values: list) -> None:
+        """Убирает значения удаленных записей из счетчиков частых значений."""
+        col_type = self.col_type
+        for value, count in Counter(values).items():
+            if value is None:
+                continue
+            key = index_key(value, col_type)
+            if key in self.counts:
+                self.counts[key] -= count
+                if self.counts[key] <= 0:
+                    del self.counts[key]
+
+    def common(self, limit: int = MCV_SHOWN) -> list:
+        """Возвращает частые значения [(ключ, число записей)] по убыванию."""
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:limit]
+
+    def equal_fraction(self, value, rows: int) -> float:
+        """Оценивает долю записей со значением value."""
+        if rows <= 0:
+            return 0.0
+        key = index_key(value, self.col_type)
+        if key in self.counts:
+            return min(1.0, self.counts[key] / rows)
+        # Остальные записи делятся поровну между неотслеживаемыми значениями
+        others = self.distinct.estimate() - len(self.counts)
+        if others <= 0:
+            return 0.0
+        rest = max(0, rows - sum(self.counts.values()))
+        return rest / others / rows
+
+    def range_fraction(self, op: str, value):
+        """Оценивает долю записей для <, <=, >, >= по границам столбца.
+
+        Returns:
+            float: Доля записей или None, если границы неизвестны или
+                столбец не числовой
+        """
+        if self.col_type != 'int' or self.min is None:
+            return None
+        span = self.max - self.min + 1
+        below = min(max(value - self.min, 0), span)
+        if op in ('<=', '>'):
+            below = min(max(value - self.min + 1, 0), span)
+        fraction = below / span
+        return fraction if op in ('<', '<=') else 1.0 - fraction
+
+    def to_dict(self) -> dict:
+        return {
+            'type': self.col_type,
+            'hll': base64.b64encode(bytes(self.distinct.registers)).decode('ascii'),  # noqa: E501
+            'min': self.min,
+            'max': self.max,
+            'mcv': self.counts,
+        }
+
+
+class TableStats:
+    """Статистика таблицы: число записей и статистика столбцов кроме ID.
+
+    Меняется вместе с записями таблицы (apply) и используется
+    планировщиком для оценки числа подходящих записей.
+    """
+
+    def __init__(self, columns: dict, rows: int = 0):
+        # {столбец: ColumnStats}
+        self.columns = columns
+        self.rows = rows
+
+    @classmethod
+    def empty(cls, schema: list) -> 'TableStats':
+        """Создает пустую статистику по схеме таблицы ['ID:int', ...]."""
+        columns = {}
+        for column in schema:
+            col_name, col_type = column.split(':', 1)
+            if col_name != 'ID':
+                columns[col_name] = ColumnStats(col_type)
+        return cls(columns)
+
+    @classmethod
+    def build(cls, schema: list, table_data) -> 'TableStats':
+        """Собирает статистику по данным таблицы за один проход."""
+        stats = cls.empty(schema)
+        stats.apply(new_records=table_data)
+        return stats
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TableStats':
+        columns = {name: ColumnStats(item['type'], item)
+                   for name, item in data['columns'].items()}
+        return cls(columns, data['rows'])
+
+    def copy(self) -> 'TableStats':
+        """Возвращает независимую копию статистики таблицы."""
+        copied = TableStats({name: column.copy()
+                             for name, column in self.columns.items()},
+                            self.rows)
+        return copied
+
+    def to_dict(self) -> dict:
+        return {'rows': self.rows,
+                'columns': {name: column.to_dict()
+                            for name, column in self.columns.items()}}
+
+    def apply(self, old_records=(), new_records=()) -> None:
+        """Переносит изменение записей в статистику.
+
+        Args:
+            old_records: Прежние версии измененных или удаленных записей
+            new_records: Новые версии измененных или добавленных записей
+        """
+        old_records = list(old_records)
+        new_records = list(new_records)
+        for name, column in self.columns.items():
+            if old_records:
+                column.remove([record.get(name) for record in old_records])
+            if new_records:
+                column.add([record.get(name) for record in new_records])
+        self.rows += len(new_records) - len(old_records)
+
+    def fraction(self, column: str, values) -> float:
+        """Оценивает долю записей, у которых столбец равен одному из значений."""
+        column_stats = self.columns.get(column)
+        if column_stats is None:
+            return min(1.0, len(values) * SELECTIVITY['='])
+        return min(1.0, sum(column_stats.equal_fraction(value, self.rows)
+                            for value in values))
+
+
+def selectivity(node, stats: TableStats = None) -> float:
+    """Оценивает долю записей, подходящих под условие.
+
+    По столбцам со статистикой доля оценивается по частым значениям,
+    числу различных значений и границам, по остальным - постоянными
+    из SELECTIVITY.
+
+    Args:
+        node: Типизированное дерево условия или None
+        stats: Статистика таблицы или None
+
+    Returns:
+        float: Доля от 0 до 1
+    """
+    if node is None:
+        return 1.0
+    kind = node[0]
+    if kind == 'and':
+        return selectivity(node[1], stats) * selectivity(node[2], stats)
+    if kind == 'or':
+        left, right = selectivity(node[1], stats), selectivity(node[2], stats)
+        return left + right - left * right
+    if kind == 'not':
+        return 1.0 - selectivity(node[1], stats)
+    column_stats = stats.columns.get(node[1]) if stats is not None else None
+    if kind == 'in':
+        if column_stats is None:
+            return min(1.0, len(node[2]) * SELECTIVITY['='])
+        return stats.fraction(node[1], node[2])
+    op, value = node[2], node[3]
+    if column_stats is None:
+        return SELECTIVITY[op]
+    if op in ('=', '!='):
+        fraction = column_stats.equal_fraction(value, stats.rows)
+        return fraction if op == '=' else 1.0 - fraction
+    fraction = column_stats.range_fraction(op, value)
+    return SELECTIVITY[op] if fraction is None else fraction
+
+
+def _id_span(table_data) -> tuple:
+    if not len(table_data):
+        return None
+    return table_data[0]['ID'], table_data[-1]['ID']
+
+
+def path_cost(kind: str, argument, table_data, node,
+              stats: TableStats) -> float:
+    """Оценивает стоимость способа доступа в проверках записей.
+
+    Поиск по ID и индексу стоит двоичного поиска на каждую найденную
+    запись и проверки условия, просмотр - проверки каждой записи.
+
+    Args:
+        kind: Способ доступа из access_path
+        argument: Параметр способа доступа
+        table_data: Данные таблицы
+        node: Типизированное дерево условия
+        stats: Статистика таблицы
+
+    Returns:
+        float: Условная стоимость
+    """
+    rows = len(table_data)
+    check = predicate_size(node)
+    search = math.log2(rows + 1) + 1
+    if kind == 'id_range':
+        span = _id_span(table_data)
+        if span is None:
+            return search
+        low, high = argument
+        first = span[0] if low is None else max(low, span[0])
+        last = span[1] if high is None else min(high, span[1])
+        found = rows * max(0, last - first + 1) / (span[1] - span[0] + 1)
+        return search + found * check
+    if kind == 'index':
+        column, values = argument
+        return rows * stats.fraction(column, values) * (search + check)
+    if kind == 'columnar':
+        return rows * check * COLUMNAR_COST
+    return rows * check
+
+
+def format_stats(stats: TableStats) -> list:
+    """Возвращает статистику таблицы строками для вывода в консоль."""
+    lines = [f'Статистика: записей {stats.rows}']
+    for name, column in stats.columns.items():
+        if column.min is None:
+            lines.append(f'  {name}: нет значений')
+            continue
+        common = ', '.join(f'{_display_key(key, column.col_type)} ({count})'
+                           for key, count in column.common())
+        lines.append(f'  {name}: различных ~{column.distinct.estimate()}, '
+                     f'min {column.min}, max {column.max}, частые: {common}')
+    return lines
+
+
+def _display_key(key: str, col_type: str) -> str:
+    # Ключи bool хранятся как 'true'/'false', а select выводит True/False
+    if col_type == 'bool':
+        return str(key == 'true')
+    return key
+
+
+def stats_path(metadata_file: str) -> str:
+    """Возвращает путь к файлу статистики рядом с файлом метаданных."""
+    return os.path.join(os.path.dirname(metadata_file), STATS_FILE)
+
+
+def read_stats(path: str) -> dict:
+    """Читает файл статистики, не собирая из него TableStats.
+
+    Returns:
+        dict: {таблица: статистика в виде словаря} или пустой словарь,
+            если файла нет
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        # Файл оборван сбоем системы во время записи. Статистика - только
+        # оценка, она собирается заново командой analyze
+        return {}
+
+
+def encode_stats(item: dict) -> str:
+    """Кодирует статистику одной таблицы (TableStats.to_dict) в JSON."""
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':'))
+
+
+def save_stats(path: str, encoded: dict) -> None:
+    """Сохраняет статистику таблиц.
+
+    Статистика каждой таблицы передается уже закодированной
+    (encode_stats), поэтому при фиксации кодируется заново только
+    измененная. Файл пишется при каждой фиксации и перезаписывается на
+    месте одной записью, без временного файла и переименования.
+    Содержимое короче прежнего дополняется пробелами, которые JSON
+    допускает. Читать и писать файл нужно под его блокировкой.
+
+    Args:
+        path: Путь к файлу статистики
+        encoded: {таблица: статистика в JSON}
+    """
+    text = ','.join(f'{json.dumps(table_name, ensure_ascii=False)}:{item}'
+                    for table_name, item in encoded.items())
+    data = ('{' + text + '}').encode('utf-8')
+    descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.write(descriptor, data.ljust(os.fstat(descriptor).st_size))
+    finally:
+        os.close(descriptor)
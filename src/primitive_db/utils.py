@@ -3,6 +3,17 @@
 import json
 import os
 
+from . import metrics
+from .partitions import partition_tables
+from .serialization import DEFAULT_CODEC, get_codec
+from .storage import BACKENDS, JsonStorage, atomic_write, storage_backend
+
+# Служебные ключи метаданных начинаются с префикса, содержащего двоеточие,
+# поэтому не пересекаются с именами таблиц
+SYSTEM_PREFIX = 'sys:'
+STORAGE_KEY = 'sys:storage'
+CODEC_KEY = 'sys:codec'
+
 
 def load_metadata(filepath: str) -> dict:
     """Загружает данные из JSON-файла.
@@ -14,56 +25,217 @@ def load_metadata(filepath: str) -> dict:
         dict: Загруженные данные или пустой словарь, если файл не найден
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        with open(filepath, 'rb') as file:
+            data = file.read()
     except FileNotFoundError:
         return {}
+    metrics.increment('bytes_read_total', len(data), kind='metadata')
+    return json.loads(data)
 
 
-def save_metadata(filepath: str, data: dict) -> None:
+def save_metadata(filepath: str, data: dict, sync: bool = True) -> None:
     """Сохраняет данные в JSON-файл.
     
+    Файл заменяется атомарно, поэтому сбой во время записи не оставляет
+    обрезанных метаданных.
+    
     Args:
         filepath: Путь к JSON-файлу
         data: Данные для сохранения
+        sync: Сбросить файл на диск перед возвратом
     """
-    with open(filepath, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=2)
+    # Метаданные переписываются при каждой вставке (счетчик ID),
+    # поэтому пишутся без отступов
+    atomic_write(filepath,
+                 lambda file: json.dump(data, file, ensure_ascii=False,
+                                        separators=(',', ':')),
+                 sync=sync)
+    if metrics.is_enabled():
+        metrics.increment('bytes_written_total', os.path.getsize(filepath),
+                          kind='metadata')
 
-def load_table_data(table_name: str) -> list:
-    """Загружает данные таблицы из JSON-файла.
+
+def metadata_changes(base: dict, metadata: dict) -> list:
+    """Находит изменения метаданных относительно исходной версии.
+    
+    Служебные словари (счетчики ID, индексы) сравниваются по вложенным
+    ключам, поэтому изменения разных таблиц не пересекаются.
     
     Args:
-        table_name: Имя таблицы
+        base: Исходная версия метаданных
+        metadata: Измененная версия
         
     Returns:
-        list: Данные таблицы или пустой список, если файл не найден
+        list: Изменения [путь, значение] или [путь] для удаленных ключей;
+            путь - список из одного или двух ключей
     """
-    data_dir = "data"
-    filepath = os.path.join(data_dir, f"{table_name}.json")
+    changes = []
+    for key in base.keys() | metadata.keys():
+        old, new = base.get(key), metadata.get(key)
+        if old == new:
+            continue
+        if (key.startswith(SYSTEM_PREFIX) and isinstance(old, dict)
+                and isinstance(new, dict)):
+            for sub_key in old.keys() | new.keys():
+                if old.get(sub_key) != new.get(sub_key):
+                    path = [key, sub_key]
+                    changes.append([path, new[sub_key]] if sub_key in new else [path])  # noqa: E501
+        elif key in metadata:
+            changes.append([[key], new])
+        else:
+            changes.append([[key]])
+    return changes
+
+
+def apply_metadata_changes(metadata: dict, changes: list) -> dict:
+    """Применяет изменения из metadata_changes к метаданным.
     
-    # Создаем директорию data если не существует
-    os.makedirs(data_dir, exist_ok=True)
+    Args:
+        metadata: Метаданные, к которым применяются изменения
+        changes: Изменения [путь, значение] или [путь]
+        
+    Returns:
+        dict: Обновленные метаданные
+    """
+    for change in changes:
+        path = change[0]
+        target = metadata
+        if len(path) == 2:
+            target = metadata.setdefault(path[0], {})
+        if len(change) == 2:
+            target[path[-1]] = change[1]
+        else:
+            target.pop(path[-1], None)
+    return metadata
+
+
+def table_names(metadata: dict) -> list:
+    """Возвращает имена пользовательских таблиц без служебных ключей.
     
-    try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return []
+    Args:
+        metadata: Метаданные базы данных
+        
+    Returns:
+        list: Имена таблиц
+    """
+    return [name for name in metadata if not name.startswith(SYSTEM_PREFIX)]
 
 
-def save_table_data(table_name: str, data: list) -> None:
-    """Сохраняет данные таблицы в JSON-файл.
+def stored_tables(metadata: dict) -> list:
+    """Возвращает имена хранимых таблиц: секционированные таблицы - секциями.
     
     Args:
-        table_name: Имя таблицы
-        data: Данные для сохранения
+        metadata: Метаданные базы данных
+        
+    Returns:
+        list: Имена таблиц и секций, у которых есть файлы данных
     """
-    data_dir = "data"
-    filepath = os.path.join(data_dir, f"{table_name}.json")
+    return [name for table_name in table_names(metadata)
+            for name in partition_tables(metadata, table_name)]
+
+
+def get_storage(metadata: dict = None):
+    """Возвращает движок хранения, выбранный для базы данных.
+    
+    Args:
+        metadata: Метаданные базы данных. Если движок не указан,
+            используется устаревший формат data/<таблица>.json, если
+            не указан кодек - JSON
+        
+    Returns:
+        Объект движка хранения с кодеком базы
     
-    # Создаем директорию data если не существует
-    os.makedirs(data_dir, exist_ok=True)
+    Raises:
+        ValueError: Если движок или кодек неизвестны или несовместимы
+    """
+    metadata = metadata or {}
+    name = metadata.get(STORAGE_KEY, JsonStorage.name)
+    if name not in BACKENDS:
+        raise ValueError(f'Неизвестный движок хранения: {name}. '
+                         f'Доступные: {", ".join(BACKENDS)}')
+    codec = get_codec(metadata.get(CODEC_KEY, DEFAULT_CODEC))
+    if name == JsonStorage.name and not codec.textual:
+        raise ValueError(f'Кодек {codec.name} доступен только для движка log.')
+    storage = storage_backend(name, codec)
+    # Кодекам со схемой нужны столбцы таблиц
+    storage.schemas = metadata
+    return storage
+
+
+def migrate_storage(metadata: dict, name: str) -> dict:
+    """Переносит данные всех таблиц в другой движок хранения.
     
-    with open(filepath, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=2)
\ No newline at end of file
+    Args:
+        metadata: Метаданные базы данных
+        name: Имя нового движка хранения
+        
+    Returns:
+        dict: Обновленные метаданные
+        
+    Raises:
+        ValueError: Если движок хранения неизвестен
+    """
+    return _migrate(metadata, STORAGE_KEY, name)
+
+
+def migrate_codec(metadata: dict, name: str) -> dict:
+    """Перекодирует данные всех таблиц другим кодеком.
+    
+    Args:
+        metadata: Метаданные базы данных
+        name: Имя кодека (см. serialization.CODECS)
+        
+    Returns:
+        dict: Обновленные метаданные
+        
+    Raises:
+        ValueError: Если кодек неизвестен или не подходит движку хранения
+    """
+    return _migrate(metadata, CODEC_KEY, name)
+
+
+def _migrate(metadata: dict, key: str, name: str) -> dict:
+    source = get_storage(metadata)
+    # Новый движок или кодек проверяется до переноса первой таблицы
+    target = get_storage({**metadata, key: name})
+    if source is target:
+        # Движок или кодек по умолчанию записывается в метаданные явно
+        metadata[key] = name
+        return metadata
+    
+    for table_name in stored_tables(metadata):
+        source.wait(table_name)
+        # Движок mmap загружает таблицу лениво - переносим записи списком
+        rows = list(source.load(table_name))
+        target.save(table_name, rows)
+        # У кодеков JSON общий формат файла - его не удаляем
+        if source.path(table_name) != target.path(table_name):
+            source.drop(table_name)
+    
+    metadata[key] = name
+    target.schemas = metadata
+    return metadata
+
+
+def load_table_data(table_name: str, metadata: dict = None) -> list:
+    """Загружает данные таблицы.
+    
+    Args:
+        table_name: Имя таблицы
+        metadata: Метаданные базы данных для выбора движка хранения
+        
+    Returns:
+        list: Данные таблицы или пустой список, если файл не найден
+    """
+    return get_storage(metadata).load(table_name)
+
+
+def save_table_data(table_name: str, data: list, metadata: dict = None) -> None:
+    """Сохраняет данные таблицы целиком.
+    
+    Args:
+        table_name: Имя таблицы
+        data: Данные для сохранения
+        metadata: Метаданные базы данных для выбора движка хранения
+    """
+    get_storage(metadata).save(table_name, data)
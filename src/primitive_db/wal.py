@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+import glob
+import json
+import os
+import threading
+
+from . import metrics
+from .locks import open_owned
+
+# Базовое имя журнала. Каждый процесс пишет свой журнал db_wal.<pid>.jsonl
+# и держит на нем блокировку, пока работает
+WAL_FILE = "db_wal.jsonl"
+
+# Когда фиксация становится долговечной (fsync журнала):
+# always - при каждой фиксации; batch - раз в sync_every фиксаций или через
+# sync_interval секунд после первой несброшенной; off - только в контрольной
+# точке и при закрытии
+SYNC_MODES = ('always', 'batch', 'off')
+
+
+def process_wal_path(wal_file: str = WAL_FILE, pid: int = None) -> str:
+    """Возвращает путь к журналу процесса: db_wal.jsonl -> db_wal.<pid>.jsonl."""
+    stem, extension = os.path.splitext(wal_file)
+    return f"{stem}.{pid or os.getpid()}{extension}"
+
+
+def wal_files(wal_file: str = WAL_FILE) -> list:
+    """Возвращает журналы всех процессов в порядке времени изменения."""
+    stem, extension = os.path.splitext(wal_file)
+    paths = set(glob.glob(f"{glob.escape(stem)}.*{extension}"))
+    if os.path.exists(wal_file):
+        paths.add(wal_file)
+    return sorted(paths, key=_mtime)
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+def read_transactions(file) -> list:
+    """Читает зафиксированные транзакции из открытого журнала.
+
+    Транзакции без записи commit (оборванные сбоем) пропускаются.
+
+    Args:
+        file: Открытый на чтение файл журнала
+
+    Returns:
+        list: Списки изменений транзакций в порядке фиксации
+    """
+    started = {}
+    committed = []
+    for line in file:
+        if not line.endswith('\n'):
+            # Недописанная при сбое строка - дальше журнала нет
+            break
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        txn = entry.pop('txn')
+        if entry['op'] == 'commit':
+            committed.append(started.pop(txn, []))
+        else:
+            started.setdefault(txn, []).append(entry)
+    return committed
+
+
+class WriteAheadLog:
+    """Журнал упреждающей записи процесса db_wal.<pid>.jsonl.
+
+    Каждая фиксация дописывает в журнал свои изменения и завершающую
+    запись commit одним вызовом write. Строки - JSON Lines:
+    {"txn": ..., "op": "meta", "changes": [...]} - изменения метаданных,
+    {"txn": ..., "op": "put", "table": ..., "rows": [...]} - новые версии записей,
+    {"txn": ..., "op": "del", "table": ..., "ids": [...]} - удаленные записи,
+    {"txn": ..., "op": "drop", "table": ..., "columns": [...]} - удаленная таблица,
+    {"txn": ..., "op": "commit"} - транзакция зафиксирована.
+    Записи таблиц несут номер фиксации таблицы "lsn" (storage.table_version):
+    по нему восстановление пропускает изменения, которые уже заменили
+    более поздние фиксации других процессов.
+
+    Фиксации копятся в буфере ОС и сбрасываются на диск группами (group
+    commit), поэтому много мелких изменений оплачиваются одним fsync.
+    Журнал очищается в контрольной точке, после того как файлы таблиц
+    сброшены на диск. Пока файл журнала открыт, процесс держит на нем
+    блокировку - так другие процессы отличают журнал работающего процесса
+    от журнала, брошенного при сбое.
+    """
+
+    def __init__(self, path: str = WAL_FILE, sync_mode: str = 'always',
+                 sync_every: int = 100, sync_interval: float = 0.05):
+        self.path = path
+        self._file = None
+        self._lock = threading.RLock()
+        # fsync идет под отдельной блокировкой, чтобы не задерживать запись
+        self._sync_lock = threading.Lock()
+        self._timer = None
+        self._counter = 0
+        # Число фиксаций, уже сброшенных на диск
+        self._synced = 0
+        self.commits = 0
+        self.syncs = 0
+        self.configure(sync_mode, sync_every, sync_interval)
+
+    def configure(self, sync_mode: str, sync_every: int = None,
+                  sync_interval: float = None) -> None:
+        """Меняет режим сброса журнала на диск.
+
+        Raises:
+            ValueError: Если режим неизвестен
+        """
+        if sync_mode not in SYNC_MODES:
+            raise ValueError(f'Неизвестный режим сброса журнала: {sync_mode}. '
+                             f'Доступные: {", ".join(SYNC_MODES)}')
+        self.sync_mode = sync_mode
+        if sync_every is not None:
+            self.sync_every = sync_every
+        if sync_interval is not None:
+            self.sync_interval = sync_interval
+
+    def _open(self):
+        if self._file is None:
+            self._file = open_owned(self.path)
+        return self._file
+
+    def commit(self, entries: list, durable: bool = False) -> None:
+        """Дописывает в журнал зафиксированную транзакцию.
+
+        Args:
+            entries: Изменения транзакции (словари с ключом op)
+            durable: Сбросить журнал на диск сразу, независимо от режима
+        """
+        with self._lock:
+            self._counter += 1
+            txn = f"{os.getpid()}-{self._counter}"
+            lines = [json.dumps({'txn': txn, **entry}, ensure_ascii=False,
+                                separators=(',', ':'))
+                     for entry in entries]
+            lines.append(json.dumps({'txn': txn, 'op': 'commit'},
+                                    separators=(',', ':')))
+            text = '\n'.join(lines) + '\n'
+            file = self._open()
+            file.write(text)
+            file.flush()
+            if metrics.is_enabled():
+                metrics.increment('bytes_written_total',
+                                  len(text.encode('utf-8')), kind='wal')
+            self.commits += 1
+            unsynced = self.commits - self._synced
+            if self.sync_mode == 'batch' and not durable:
+                if unsynced < self.sync_every and self._timer is None:
+                    self._timer = threading.Timer(self.sync_interval, self.sync)
+                    self._timer.daemon = True
+                    self._timer.start()
+                if unsynced < self.sync_every:
+                    return
+            elif self.sync_mode == 'off' and not durable:
+                return
+        self.sync()
+
+    def sync(self) -> None:
+        """Сбрасывает на диск все записанные фиксации одним fsync.
+
+        Пока идет fsync, другие потоки продолжают дописывать журнал. Поток,
+        дождавшийся чужого fsync, не повторяет его, если тот уже покрыл
+        его фиксации (group commit).
+        """
+        with self._sync_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if self._file is None or self._synced >= self.commits:
+                    return
+                target = self.commits
+                fileno = self._file.fileno()
+            os.fsync(fileno)
+            with self._lock:
+                self._synced = target
+                self.syncs += 1
+
+    def size(self) -> int:
+        """Возвращает размер журнала в байтах."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def truncate(self) -> None:
+        """Очищает журнал (контрольная точка)."""
+        self.sync()
+        with self._sync_lock, self._lock:
+            if self._file is None and not os.path.exists(self.path):
+                return
+            file = self._open()
+            file.seek(0)
+            file.truncate()
+            file.flush()
+            os.fsync(file.fileno())
+
+    def remove(self) -> None:
+        """Удаляет пустой журнал при завершении работы."""
+        self.sync()
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                # Файл удаляется, пока блокировка еще держится
+                os.remove(self.path)
+                self._file.close()
+                self._file = None
+
+    def close(self) -> None:
+        """Сбрасывает журнал на диск и закрывает файл."""
+        self.sync()
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        """Возвращает статистику журнала."""
+        return {
+            'sync_mode': self.sync_mode,
+            'sync_every': self.sync_every,
+            'sync_interval': self.sync_interval,
+            'commits': self.commits,
+            'syncs': self.syncs,
+            'size_bytes': self.size(),
+        }
+
+
+def wal_entries(table_name: str, operation: str, argument,
+                lsn: int = None) -> list:
+    """Переводит операцию менеджера таблиц в записи журнала.
+
+    Args:
+        table_name: Имя таблицы
+        operation: append, update, delete или drop
+        argument: Записи, пары (ID, запись) обновления, ID или столбцы
+            индексов удаляемой таблицы
+        lsn: Номер фиксации таблицы или None
+
+    Returns:
+        list: Записи журнала
+    """
+    if operation == 'append':
+        entry = {'op': 'put', 'table': table_name, 'rows': argument}
+    elif operation == 'update':
+        entry = {'op': 'put', 'table': table_name,
+                 'rows': [record for _, record in argument]}
+    elif operation == 'delete':
+        entry = {'op': 'del', 'table': table_name, 'ids': list(argument)}
+    else:
+        entry = {'op': 'drop', 'table': table_name, 'columns': list(argument)}
+    if lsn is not None:
+        entry['lsn'] = lsn
+    return [entry]
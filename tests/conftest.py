@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import primitive_db
+from primitive_db.core import select_cacher
+from primitive_db.decorators import set_auto_confirm
+from primitive_db.manager import TableManager
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Пустой каталог базы данных; запросы подтверждения принимаются."""
+    monkeypatch.chdir(tmp_path)
+    select_cacher.clear()
+    set_auto_confirm(True)
+    yield tmp_path
+    set_auto_confirm(None)
+    select_cacher.clear()
+
+
+@pytest.fixture
+def manager(workdir):
+    """Менеджер таблиц в каталоге workdir, закрываемый после теста."""
+    manager = TableManager()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def other_process(workdir):
+    """Выполняет команды в другом процессе, работающем с тем же каталогом.
+
+    С exit=False процесс завершается без close(), как при сбое.
+    """
+    src = os.path.dirname(os.path.dirname(primitive_db.__file__))
+
+    def run(*commands, exit=True):
+        code = textwrap.dedent('''
+            import os
+            from primitive_db.decorators import set_auto_confirm
+            from primitive_db.engine import execute
+            from primitive_db.manager import TableManager
+            set_auto_confirm(True)
+            manager = TableManager()
+        ''')
+        code += ''.join(f'execute(manager, {command!r})\n' for command in commands)
+        code += 'manager.close()\n' if exit else 'os._exit(0)\n'
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       env={**os.environ, 'PYTHONPATH': src},
+                       stdout=subprocess.DEVNULL)
+    return run
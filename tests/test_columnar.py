@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from primitive_db import columnar
+from primitive_db.columnar import ColumnarTable
+from primitive_db.engine import execute
+from primitive_db.predicates import compile_where, parse_where
+
+TOO_BIG = 1 << 63
+
+COLUMNS = ['ID:int', 'count:int', 'name:str', 'code:str', 'active:bool']
+ROWS = [
+    {'ID': 1, 'count': None, 'name': None, 'code': None, 'active': None},
+    {'ID': 2, 'count': 0, 'name': '', 'code': '', 'active': False},
+    {'ID': 3, 'count': 5, 'name': 'x', 'code': 'a', 'active': True},
+]
+CONDITIONS = [
+    'count = 0', 'count != 0', 'count < 1', 'not count > 1', 'count in (0, 5)',
+    "name = ''", "name != ''", "name < 'z'", "code = ''", "code != 'a'",
+    "code >= ''", 'active = false', 'active != true', 'not active = true',
+]
+
+
+@pytest.mark.parametrize('command', [
+    f'insert into items values ({TOO_BIG})',
+    f'insert into items values ({-TOO_BIG - 1})',
+    f'update items set value = {TOO_BIG} where ID = 1',
+])
+def test_int_outside_int64_is_rejected(manager, command):
+    execute(manager, 'create_table items value:int')
+    execute(manager, f'insert into items values ({TOO_BIG - 1})')
+
+    with pytest.raises(ValueError, match='64 бита'):
+        execute(manager, command)
+    assert manager.table('items') == [{'ID': 1, 'value': TOO_BIG - 1}]
+
+
+def test_import_rejects_int_outside_int64(manager, tmp_path):
+    execute(manager, 'create_table items value:int')
+    path = tmp_path / 'items.jsonl'
+    path.write_text(json.dumps({'value': TOO_BIG}) + '\n')
+
+    with pytest.raises(ValueError, match='64 бита'):
+        execute(manager, f'import items {path}')
+    assert manager.table('items') == []
+
+
+def test_failed_columnar_switch_keeps_row_tables(manager):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    # Значение, записанное до проверки диапазона
+    manager.append('items', [{'ID': 2, 'value': TOO_BIG}])
+
+    with pytest.raises(ValueError, match='64 бита'):
+        execute(manager, 'columnar on')
+    assert manager.columnar is False
+    assert isinstance(manager.table('items'), list)
+    assert len(manager.table('items')) == 2
+
+
+def test_columnar_switch_converts_loaded_tables(manager):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2)')
+    execute(manager, 'columnar on')
+
+    assert manager.columnar is True
+    assert not isinstance(manager.table('items'), list)
+    assert list(manager.table('items')) == [{'ID': 1, 'value': 1},
+                                            {'ID': 2, 'value': 2}]
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_columnar_table_keeps_nulls(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(columnar, 'np', None)
+    table = ColumnarTable(ROWS, COLUMNS, encoded=('code',))
+    assert list(table) == ROWS
+
+    # Условия по столбцам дают те же записи, что и проверка словарей
+    for where in CONDITIONS:
+        predicate = compile_where(parse_where(where), COLUMNS)
+        expected = [record['ID'] for record in ROWS if predicate(record)]
+        assert [record['ID'] for record in table.select(predicate.node)] == \
+            expected, where
+
+    table.update_rows([{'ID': 2, 'count': None, 'name': None},
+                       {'ID': 1, 'count': 7, 'code': 'b'}])
+    table.delete_ids([3])
+    assert list(table) == [
+        {'ID': 1, 'count': 7, 'name': None, 'code': 'b', 'active': None},
+        {'ID': 2, 'count': None, 'name': None, 'code': '', 'active': False},
+    ]
@@ -0,0 +1,67 @@
+import os
+
+from primitive_db import indexes
+from primitive_db.engine import execute
+from primitive_db.indexes import INDEXES_KEY, index_path, lookup
+from primitive_db.manager import TableManager
+
+
+def test_rolled_back_create_index_removes_file(manager):
+    execute(manager, 'create_table users name:str age:int')
+    execute(manager, 'insert into users values ("alice", 30)')
+
+    execute(manager, 'begin')
+    execute(manager, 'create_index users name')
+    assert os.path.exists(index_path('users', 'name'))
+    execute(manager, 'rollback')
+
+    assert not os.path.exists(index_path('users', 'name'))
+    assert 'users' not in manager.metadata().get(INDEXES_KEY, {})
+
+
+def test_index_created_again_after_rollback_is_fresh(manager):
+    execute(manager, 'create_table users name:str age:int')
+    execute(manager, 'insert into users values ("alice", 30)')
+    execute(manager, 'begin')
+    execute(manager, 'create_index users name')
+    execute(manager, 'rollback')
+
+    execute(manager, 'insert into users values ("bob", 25)')
+    execute(manager, 'create_index users name')
+
+    metadata = manager.metadata()
+    assert lookup(metadata, 'users', 'name', ('alice',)) == {1}
+    assert lookup(metadata, 'users', 'name', ('bob',)) == {2}
+
+
+def test_failed_command_in_deferred_mode_removes_its_index(workdir):
+    manager = TableManager(write_policy='deferred')
+    execute(manager, 'create_table users name:str age:int')
+    savepoint = manager.savepoint()
+    execute(manager, 'create_index users age')
+    manager.rollback_to(savepoint)
+
+    assert not os.path.exists(index_path('users', 'age'))
+    assert 'users' not in manager.metadata().get(INDEXES_KEY, {})
+    manager.close()
+
+
+def test_index_journal_is_compacted_when_mostly_dead(manager, monkeypatch):
+    monkeypatch.setattr(indexes, 'COMPACT_MIN_RECORDS', 20)
+    execute(manager, 'create_table users name:str age:int')
+    execute(manager, 'insert into users values ("a", 1), ("b", 2), ("c", 3)')
+    execute(manager, 'create_index users age')
+
+    sizes = []
+    for age in range(10, 40):
+        execute(manager, f'update users set age = {age} where ID = 1')
+        with open(index_path('users', 'age'), encoding='utf-8') as file:
+            sizes.append(len(file.readlines()))
+
+    # Журнал не растет без конца: устаревшие строки убираются снимком
+    assert max(sizes) < 20 + 2
+    assert sizes[-1] < max(sizes)
+    metadata = manager.metadata()
+    assert lookup(metadata, 'users', 'age', (39,)) == {1}
+    assert lookup(metadata, 'users', 'age', (10,)) == set()
+    assert lookup(metadata, 'users', 'age', (2, 3)) == {2, 3}
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from primitive_db.decorators import parse_set_clause
+from primitive_db.engine import execute, insert_records
+from primitive_db.predicates import parse_values
+
+
+def test_quoted_values_keep_commas_parentheses_and_spaces():
+    text = '''(1, 'Lee, Ann'), (2, "f(x) = y"), (3, '  padded  ')'''
+    assert parse_values(text) == [
+        ['1', 'Lee, Ann'],
+        ['2', 'f(x) = y'],
+        ['3', '  padded  '],
+    ]
+
+
+def test_quotes_inside_values_are_kept():
+    text = r'''('say "hi"', "it's"), ('a\'b', "(x, \"y\")")'''
+    assert parse_values(text) == [
+        ['say "hi"', "it's"],
+        ["a'b", '(x, "y")'],
+    ]
+
+
+def test_set_clause_unquotes_once():
+    assert parse_set_clause("""name = 'say "hi"'""") == {'name': 'say "hi"'}
+    assert parse_set_clause('name = "(a, b)"') == {'name': '(a, b)'}
+    assert parse_set_clause('name = John Smith') == {'name': 'John Smith'}
+    assert parse_set_clause('age=29') == {'age': '29'}
+    with pytest.raises(ValueError):
+        parse_set_clause('name "x"')
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    '1, 2',
+    '(1, 2',
+    '(1,)',
+    '(1) (2)',
+    '(1), ',
+    '(a = 1)',
+])
+def test_malformed_values_raise(text):
+    with pytest.raises(ValueError):
+        parse_values(text)
+
+
+def test_multi_row_insert_adds_all_rows(manager):
+    execute(manager, 'create_table users name:str age:int')
+    execute(manager, '''insert into users values ("Lee, Ann", 30), ('Bob (jr)', 5)''')
+
+    assert manager.table('users') == [
+        {'ID': 1, 'name': 'Lee, Ann', 'age': 30},
+        {'ID': 2, 'name': 'Bob (jr)', 'age': 5},
+    ]
+
+
+def test_invalid_row_rejects_whole_insert(manager):
+    execute(manager, 'create_table users name:str age:int')
+
+    with pytest.raises(ValueError, match='Запись 2'):
+        insert_records(manager, 'users', [['alice', '30'], ['bob', 'old']])
+    assert manager.table('users') == []
+
+    assert insert_records(manager, 'users', [['carol', '41']]) == range(1, 2)
+
+
+def test_quoted_strings_are_stored_as_written(manager, tmp_path):
+    execute(manager, 'create_table users name:str age:int active:bool')
+    execute(manager, """insert into users values ('say "hi"', 4, no)""")
+    assert manager.table('users')[0]['name'] == 'say "hi"'
+    execute(manager, """update users set name = "'quoted'" where age = 4""")
+    execute(manager, """insert into users values ("it's (1, 2)", 5, yes)""")
+
+    path = tmp_path / 'users.jsonl'
+    path.write_text(json.dumps({'name': '"csv"', 'age': 6, 'active': True}) + '\n')
+    execute(manager, f'import users {path}')
+
+    assert [record['name'] for record in manager.table('users')] == [
+        "'quoted'", "it's (1, 2)", '"csv"']
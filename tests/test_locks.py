@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import primitive_db
+from primitive_db.engine import execute
+from primitive_db.manager import TableManager
+
+SRC = os.path.dirname(os.path.dirname(primitive_db.__file__))
+
+
+def test_deferred_commands_release_locks_for_other_writers(workdir):
+    manager = TableManager(write_policy='deferred')
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (0)')
+
+    # Другой процесс ждет блокировку таблицы меньше, чем длится сценарий
+    code = textwrap.dedent('''
+        import sys
+        from primitive_db.storage import table_lock
+        sys.exit(0 if table_lock('items').acquire(timeout=2.0) else 1)
+    ''')
+    env = {**os.environ, 'PYTHONPATH': SRC}
+    writer = subprocess.Popen([sys.executable, '-c', code], env=env)
+    deadline = time.monotonic() + 3.0
+    value = 1
+    while time.monotonic() < deadline:
+        execute(manager, f'insert into items values ({value})')
+        value += 1
+    manager.close()
+
+    assert writer.wait() == 0
+
@@ -0,0 +1,130 @@
+import os
+import random
+
+import pytest
+
+from primitive_db import columnar, mapped
+from primitive_db.mapped import DELETE_IN_PLACE, HAS_DELETED, MappedTable
+from primitive_db.predicates import compile_where, parse_where
+from primitive_db.storage import COMPACT_MIN_RECORDS, MappedStorage
+
+COLUMNS = ['ID:int', 'name:str', 'value:int', 'active:bool']
+CONDITIONS = [
+    'value < 50', 'value != 7', "name = 'n3'", "name != 'n3'", "name >= 'n5'",
+    'active = true', 'ID in (2, 3, 40)', 'ID > 10 and value <= 80',
+]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'no-numpy'])
+def storage(request, workdir, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(columnar, 'np', None)
+        monkeypatch.setattr(mapped, 'np', None)
+    storage = MappedStorage()
+    storage.schemas = {'items': COLUMNS}
+    return storage
+
+
+def make_rows(ids) -> list:
+    return [{'ID': i, 'name': f'n{i % 10}', 'value': i % 100, 'active': i % 3 == 0}
+            for i in ids]
+
+
+def assert_matches(table, model: dict) -> None:
+    expected = [model[record_id] for record_id in sorted(model)]
+    assert len(table) == len(expected)
+    assert list(table) == expected
+    assert table[:] == expected
+    for position, record in enumerate(expected):
+        assert table.position(record['ID']) == position
+        assert table.row(position) == record
+    for where in CONDITIONS:
+        predicate = compile_where(parse_where(where), COLUMNS)
+        assert table.select(predicate.node) == \
+            [record for record in expected if predicate(record)], where
+
+
+def test_updates_and_deletes_patch_file_in_place(storage):
+    model = {record['ID']: record for record in make_rows(range(1, 101))}
+    storage.save('items', list(model.values()))
+    path = storage.path('items')
+    inode = os.stat(path).st_ino
+
+    generator = random.Random(7)
+    for _ in range(20):
+        removed = generator.sample(sorted(model), 2)
+        for record_id in removed:
+            del model[record_id]
+        storage.delete('items', removed)
+        changed = []
+        for record_id in generator.sample(sorted(model), 3):
+            record = {**model[record_id], 'name': f'updated {record_id}',
+                      'value': generator.randrange(100)}
+            model[record_id] = record
+            changed.append((record_id, record))
+        storage.update('items', changed)
+
+    # Файл не переписывался: изменения легли на места записей
+    assert os.stat(path).st_ino == inode
+    table = storage.load('items')
+    assert table.flags & HAS_DELETED
+    assert table.position(removed[0]) is None
+    assert_matches(table, model)
+
+    # Новые записи дописываются после надгробий
+    appended = make_rows(range(101, 111))
+    storage.append('items', appended)
+    model.update((record['ID'], record) for record in appended)
+    assert_matches(storage.load('items'), model)
+
+
+def test_many_deletes_compact_file(storage):
+    rows = make_rows(range(1, COMPACT_MIN_RECORDS + 1))
+    storage.save('items', rows)
+    path = storage.path('items')
+    inode = os.stat(path).st_ino
+
+    storage.delete('items', list(range(1, COMPACT_MIN_RECORDS // 2)))
+    assert os.stat(path).st_ino == inode
+    storage.delete('items', [COMPACT_MIN_RECORDS // 2])
+
+    table = MappedTable(path)
+    assert os.stat(path).st_ino != inode
+    assert not table.flags & HAS_DELETED
+    assert table.mapped == len(table) == COMPACT_MIN_RECORDS // 2
+    assert list(table) == rows[COMPACT_MIN_RECORDS // 2:]
+
+
+def test_table_keeps_changes_in_memory_without_loading_rows(storage):
+    model = {record['ID']: record for record in make_rows(range(1, 201))}
+    storage.save('items', list(model.values()))
+    storage.delete('items', [5])
+    del model[5]
+    table = storage.load('items')
+    table.extend(make_rows(range(201, 206)))
+    model.update((record['ID'], record) for record in make_rows(range(201, 206)))
+
+    generator = random.Random(3)
+    for _ in range(10):
+        removed = generator.sample(sorted(model), 2)
+        for record_id in removed:
+            del model[record_id]
+        table.delete_ids(removed)
+        changed = []
+        for record_id in generator.sample(sorted(model), 3):
+            model[record_id] = {**model[record_id], 'name': f'updated {record_id}',
+                                'value': generator.randrange(100)}
+            changed.append({'ID': record_id, 'name': model[record_id]['name'],
+                            'value': model[record_id]['value']})
+        table.update_rows(changed)
+        assert_matches(table, model)
+    removed = sorted(model)[::2][:DELETE_IN_PLACE + 1]
+    table.delete_ids(removed)
+    for record_id in removed:
+        del model[record_id]
+    assert_matches(table, model)
+
+    # Изменения остаются в памяти до записи хранилищем
+    assert_matches(storage.load('items'),
+                   {record['ID']: record for record in make_rows(range(1, 201))
+                    if record['ID'] != 5})
@@ -0,0 +1,34 @@
+from primitive_db import metrics
+from primitive_db.metrics import MAX_SAMPLES, Histogram
+
+
+def test_metrics_are_disabled_by_default():
+    assert not metrics.is_enabled()
+
+
+def test_single_value_quantiles_match_mean():
+    histogram = Histogram()
+    histogram.observe(0.003)
+
+    assert histogram.quantile(0.50) == 0.003
+    assert histogram.quantile(0.99) == 0.003
+    assert histogram.total / histogram.count == 0.003
+
+
+def test_quantiles_interpolate_between_values():
+    histogram = Histogram()
+    for value in (0.001, 0.002, 0.003, 0.004):
+        histogram.observe(value)
+
+    assert abs(histogram.quantile(0.50) - 0.0025) < 1e-12
+    assert histogram.quantile(0.99) <= 0.004
+    assert histogram.quantile(0.50) <= histogram.total / histogram.count
+
+
+def test_samples_are_bounded():
+    histogram = Histogram()
+    for value in range(MAX_SAMPLES * 2):
+        histogram.observe(value / 1e6)
+
+    assert len(histogram.samples) == MAX_SAMPLES
+    assert histogram.count == MAX_SAMPLES * 2
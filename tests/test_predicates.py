@@ -0,0 +1,103 @@
+import pytest
+
+from primitive_db.core import iter_select
+from primitive_db.decorators import parse_limit_offset
+from primitive_db.engine import execute
+from primitive_db.predicates import (
+    compile_where,
+    equality_values,
+    id_bounds,
+    parse_where,
+    tokenize,
+    where_text,
+)
+
+COLUMNS = ['ID:int', 'name:str', 'age:int', 'active:bool']
+ROWS = [
+    {'ID': 1, 'name': 'Ann Lee', 'age': 17, 'active': True},
+    {'ID': 2, 'name': 'Bob', 'age': 30, 'active': False},
+    {'ID': 3, 'name': 'Eve', 'age': 45, 'active': True},
+    {'ID': 4, 'name': 'Kim', 'age': 18, 'active': False},
+]
+
+
+def matching_ids(where: str, rows: list = ROWS) -> list:
+    predicate = compile_where(parse_where(where), COLUMNS)
+    return [row['ID'] for row in iter_select(rows, predicate)]
+
+
+def test_range_and_boolean_operators():
+    assert matching_ids('age >= 18') == [2, 3, 4]
+    assert matching_ids('age > 18 and age < 45') == [2]
+    assert matching_ids('age < 18 or age >= 45') == [1, 3]
+    assert matching_ids('not active = true') == [2, 4]
+    assert matching_ids("(name = 'Ann Lee' or age = 30) and active = yes") == [1]
+    assert matching_ids('age != 18 and name <> "Eve"') == [1, 2]
+
+
+def test_in_and_not_in():
+    assert matching_ids("name in ('Bob', 'Kim')") == [2, 4]
+    assert matching_ids('age not in (17, 18)') == [2, 3]
+
+
+def test_literals_are_coerced_to_column_types():
+    # Число в кавычках сравнивается с int, а не со строкой
+    assert matching_ids("age = '30'") == [2]
+    assert matching_ids('active = no') == [2, 4]
+    # Сравнение на порядок пропускает записи без значения
+    assert matching_ids('age > 20', ROWS + [{'ID': 5, 'name': 'Max'}]) == [2, 3]
+
+
+@pytest.mark.parametrize('where', [
+    'salary > 10',
+    'age > old',
+    'active = maybe',
+    "name = 'Bob' and",
+    'age >',
+    '(age > 1',
+    "name = 'Bob",
+])
+def test_invalid_conditions_raise(where):
+    with pytest.raises(ValueError):
+        compile_where(parse_where(where), COLUMNS)
+
+
+def test_where_text_keeps_quoted_spaces_and_commas():
+    command = "select from users where name = 'Lee, Ann  Jr' limit 5 offset 1"
+    assert where_text(command) == "name = 'Lee, Ann  Jr'"
+    assert matching_ids(where_text(command)) == []
+    assert where_text('select from users') == ''
+
+
+def test_id_bounds_and_equality_values():
+    predicate = compile_where(parse_where("ID > 1 and ID <= 3 and age = 30"), COLUMNS)
+    assert id_bounds(predicate.node) == (2, 3)
+    assert equality_values(predicate.node) == {'age': (30,)}
+
+    predicate = compile_where(parse_where("name in ('Bob', 'Eve') or ID = 1"),
+                              COLUMNS)
+    assert id_bounds(predicate.node) is None
+    assert equality_values(predicate.node) == {}
+
+
+def test_limit_and_offset_start_after_where_condition():
+    def options(command):
+        return parse_limit_offset(tokenize(command)[3:])[1:]
+
+    assert options('select from users where name = "limit"') == (None, 0)
+    assert options("select from users where note = 'offset 3' limit 2") == (2, 0)
+    assert options('select from users limit 5 offset 1') == (5, 1)
+    for command in ['select from users limit "5"', 'select from users limit 5 x',
+                    'select from users offset']:
+        with pytest.raises(ValueError):
+            options(command)
+
+
+def test_select_with_keyword_in_quoted_value(manager, capsys):
+    execute(manager, 'create_table users name:str age:int')
+    execute(manager, 'insert into users values ("limit", 1), ("offset", 2)')
+    capsys.readouterr()
+
+    execute(manager, 'select from users where name = "limit" or age = 2')
+    output = capsys.readouterr().out
+    assert '| limit  |' in output and '| offset |' in output
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import primitive_db
+from primitive_db.engine import execute
+from primitive_db.manager import TableManager
+
+SRC = os.path.dirname(os.path.dirname(primitive_db.__file__))
+
+
+def crash_process(script: str) -> None:
+    """Выполняет команды в отдельном процессе, который завершается без close().
+
+    Журнал упреждающей записи этого процесса остается брошенным.
+    """
+    code = textwrap.dedent('''
+        import os
+        from primitive_db.decorators import set_auto_confirm
+        from primitive_db.engine import execute
+        from primitive_db.manager import TableManager
+        set_auto_confirm(True)
+        manager = TableManager()
+    ''') + textwrap.dedent(script) + '\nos._exit(0)\n'
+    env = {**os.environ, 'PYTHONPATH': SRC}
+    subprocess.run([sys.executable, '-c', code], check=True, env=env,
+                   stdout=subprocess.DEVNULL)
+
+
+def recover() -> dict:
+    """Восстанавливает базу новым менеджером и возвращает {ID: value}."""
+    manager = TableManager()
+    try:
+        return {record['ID']: record['value'] for record in manager.table('items')}
+    finally:
+        manager.close()
+
+
+def test_recovery_keeps_newer_commit_of_live_process(workdir):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2)')
+
+    crash_process("execute(manager, 'update items set value = 100 where ID = 1')")
+    # Работающий процесс меняет ту же запись уже после сбоя другого
+    execute(manager, 'update items set value = 200 where ID = 1')
+    manager.close()
+
+    assert recover() == {1: 200, 2: 2}
+
+
+def test_recovery_keeps_newer_commits_to_other_rows(workdir):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2)')
+
+    crash_process('''
+        execute(manager, 'update items set value = 100 where ID = 1')
+        execute(manager, 'delete from items where ID = 2')
+    ''')
+    execute(manager, 'insert into items values (3)')
+    execute(manager, 'update items set value = 300 where ID = 1')
+    manager.close()
+
+    assert recover() == {1: 300, 3: 3}
+
+
+def test_recovery_applies_commit_missing_from_table_file(workdir):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    manager.close()
+
+    # Сбой сразу после записи фиксации в журнал - файл таблицы не изменен
+    crash_process('''
+        commit = manager.wal.commit
+
+        def crash(entries, durable=False):
+            commit(entries, durable)
+            os._exit(0)
+
+        manager.wal.commit = crash
+        execute(manager, 'update items set value = 100 where ID = 1')
+    ''')
+
+    assert recover() == {1: 100}
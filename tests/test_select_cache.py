@@ -0,0 +1,44 @@
+import pytest
+
+from primitive_db.decorators import parse_where_condition
+from primitive_db.engine import execute, select_records
+from primitive_db.explain import explain
+
+
+def values(manager, where: str) -> list:
+    rows = select_records(manager, 'items', parse_where_condition(where))
+    return [record['value'] for record in rows]
+
+
+@pytest.mark.parametrize('storage', ['log', 'json', 'mmap'])
+def test_cached_select_sees_writes_of_other_process(manager, other_process,
+                                                    storage):
+    execute(manager, f'storage {storage}')
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2)')
+    assert values(manager, 'value > 0') == [1, 2]
+
+    other_process('update items set value = 5 where ID = 1')
+
+    assert values(manager, 'value > 0') == [5, 2]
+
+
+def test_partitioned_select_sees_writes_of_other_process(manager, other_process):
+    execute(manager, 'create_table items value:int partition by hash(value) 4')
+    execute(manager, 'insert into items values (1), (2)')
+    assert values(manager, 'value >= 2') == [2]
+
+    other_process('insert into items values (3)')
+
+    assert values(manager, 'value >= 2') == [2, 3]
+
+
+def test_explain_does_not_report_stale_cache(manager, other_process):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    values(manager, 'value > 0')
+    assert explain(manager, 'select from items where value > 0')['access'] == 'cache'  # noqa: E501
+
+    other_process('insert into items values (2)')
+
+    assert explain(manager, 'select from items where value > 0')['access'] != 'cache'  # noqa: E501
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import primitive_db
+from primitive_db.engine import execute
+from primitive_db.server import DatabaseServer
+
+SRC = os.path.dirname(os.path.dirname(primitive_db.__file__))
+
+
+async def request(port: int, payload: dict) -> dict:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(json.dumps(payload).encode('utf-8') + b'\n')
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+def test_waiting_for_table_lock_does_not_block_event_loop(manager):
+    execute(manager, 'create_table items value:int')
+
+    # Другой процесс держит блокировку таблицы около секунды
+    code = textwrap.dedent('''
+        import time
+        from primitive_db.storage import table_lock
+        lock = table_lock('items')
+        lock.acquire()
+        print('locked', flush=True)
+        time.sleep(1.0)
+        lock.release()
+    ''')
+    holder = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                              env={**os.environ, 'PYTHONPATH': SRC})
+    assert holder.stdout.readline() == b'locked\n'
+
+    server = DatabaseServer(manager, port=0)
+
+    async def scenario():
+        await server.start()
+        started = time.monotonic()
+        insert = asyncio.create_task(request(server.port, {
+            'id': 1, 'op': 'insert', 'table': 'items', 'values': [5]}))
+        # Пока вставка ждет блокировку, сервер отвечает на соединения
+        ticks = 0
+        while not insert.done():
+            await asyncio.sleep(0.05)
+            ticks += 1
+        response = await insert
+        return response, ticks, time.monotonic() - started
+
+    try:
+        response, ticks, elapsed = asyncio.run(scenario())
+    finally:
+        server.close()
+        holder.wait()
+
+    assert response == {'id': 1, 'ok': True, 'result': 1}
+    assert elapsed >= 0.5
+    assert ticks >= 5
+    assert manager.table('items') == [{'ID': 1, 'value': 5}]
@@ -0,0 +1,87 @@
+import pytest
+
+from primitive_db.engine import execute
+from primitive_db.explain import explain
+from primitive_db.manager import TableManager
+from primitive_db.table_stats import format_stats
+
+
+def rows(manager) -> int:
+    return manager.statistics('items').rows
+
+
+def test_failed_command_restores_statistics(workdir):
+    manager = TableManager(write_policy='deferred')
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2)')
+
+    with pytest.raises(RuntimeError):
+        with manager.autocommit():
+            execute(manager, 'insert into items values (3)')
+            raise RuntimeError
+
+    assert rows(manager) == 2
+    assert manager.statistics('items').columns['value'].counts == {'1': 1, '2': 1}
+    manager.close()
+
+
+def test_rollback_restores_statistics_of_transaction(manager):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    execute(manager, 'begin')
+    execute(manager, 'insert into items values (2)')
+    execute(manager, 'delete from items where ID = 1')
+    execute(manager, 'rollback')
+
+    assert rows(manager) == 1
+
+
+def test_failed_command_keeps_statistics_of_earlier_commands(workdir):
+    manager = TableManager(write_policy='deferred')
+    execute(manager, 'create_table items value:int')
+    for value in range(10):
+        execute(manager, f'insert into items values ({value})')
+
+    with pytest.raises(RuntimeError):
+        with manager.autocommit():
+            execute(manager, 'insert into items values (3), (3), (3)')
+            raise RuntimeError
+
+    assert rows(manager) == 10
+    plan = explain(manager, 'select from items where value = 3')
+    assert (plan['rows'], plan['estimated']) == (10, 1)
+    assert explain(manager, 'select from items where value != 3')['estimated'] == 9
+    manager.close()
+
+
+def test_statistics_are_saved_with_each_commit(workdir, other_process):
+    other_process('create_table items value:int',
+                  'insert into items values (1), (2)', exit=False)
+
+    reopened = TableManager()
+    assert rows(reopened) == 2
+    reopened.close()
+
+
+def test_statistics_of_other_processes_are_kept(workdir, other_process):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    other_process('create_table others value:int',
+                  'insert into others values (1)',
+                  'insert into items values (2), (3)')
+    execute(manager, 'insert into items values (4)')
+    manager.close()
+
+    reopened = TableManager()
+    assert rows(reopened) == 4
+    assert reopened.statistics('others').rows == 1
+    reopened.close()
+
+
+def test_common_bool_values_are_shown_like_select(manager):
+    execute(manager, 'create_table flags active:bool')
+    execute(manager, 'insert into flags values (true), (true), (false)')
+
+    lines = format_stats(manager.statistics('flags'))
+    assert 'частые: True (2), False (1)' in lines[1]
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import primitive_db
+from primitive_db.engine import execute
+from primitive_db.manager import TableManager
+
+SRC = os.path.dirname(os.path.dirname(primitive_db.__file__))
+
+
+def values(manager: TableManager) -> dict:
+    return {record['ID']: record['value'] for record in manager.table('items')}
+
+
+def reopened_values() -> dict:
+    """Читает таблицу items новым менеджером, как после перезапуска."""
+    manager = TableManager()
+    try:
+        return values(manager)
+    finally:
+        manager.close()
+
+
+def crash_process(script: str) -> None:
+    """Выполняет команды в отдельном процессе, который завершается без close()."""
+    code = textwrap.dedent('''
+        import os
+        from primitive_db.decorators import set_auto_confirm
+        from primitive_db.engine import execute
+        from primitive_db.manager import TableManager
+        set_auto_confirm(True)
+        manager = TableManager()
+    ''') + textwrap.dedent(script) + '\nos._exit(0)\n'
+    env = {**os.environ, 'PYTHONPATH': SRC}
+    subprocess.run([sys.executable, '-c', code], check=True, env=env,
+                   stdout=subprocess.DEVNULL)
+
+
+def test_commit_writes_all_changes_of_transaction(manager):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    execute(manager, 'begin')
+    execute(manager, 'insert into items values (2)')
+    execute(manager, 'update items set value = 10 where ID = 1')
+    execute(manager, 'commit')
+    manager.close()
+
+    assert reopened_values() == {1: 10, 2: 2}
+
+
+def test_rollback_discards_changes_in_memory_and_on_disk(manager):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    execute(manager, 'begin')
+    execute(manager, 'insert into items values (2)')
+    execute(manager, 'delete from items where ID = 1')
+    assert values(manager) == {2: 2}
+    execute(manager, 'rollback')
+
+    assert values(manager) == {1: 1}
+    manager.close()
+    assert reopened_values() == {1: 1}
+
+
+def test_committed_transaction_is_replayed_after_crash(workdir):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    manager.close()
+
+    # Сбой сразу после записи фиксации в журнал - файл таблицы не изменен
+    crash_process('''
+        commit = manager.wal.commit
+
+        def crash(entries, durable=False):
+            commit(entries, durable)
+            os._exit(0)
+
+        manager.wal.commit = crash
+        execute(manager, 'begin')
+        execute(manager, 'insert into items values (2)')
+        execute(manager, 'delete from items where ID = 1')
+        execute(manager, 'commit')
+    ''')
+
+    assert reopened_values() == {2: 2}
+
+
+def test_uncommitted_transaction_is_lost_after_crash(workdir):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1)')
+    manager.close()
+
+    crash_process('''
+        execute(manager, 'begin')
+        execute(manager, 'insert into items values (2)')
+        execute(manager, 'update items set value = 10 where ID = 1')
+    ''')
+
+    assert reopened_values() == {1: 1}
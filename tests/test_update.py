@@ -0,0 +1,65 @@
+import pytest
+
+from primitive_db.engine import execute
+from primitive_db.manager import TableManager
+from primitive_db.storage import BACKENDS
+
+
+def reopened_table(table_name: str) -> list:
+    """Читает таблицу с диска новым менеджером."""
+    manager = TableManager()
+    try:
+        return list(manager.table(table_name))
+    finally:
+        manager.close()
+
+
+@pytest.mark.parametrize('storage', ['log', 'json', 'mmap'])
+def test_update_keeps_memory_and_disk_equal(workdir, storage):
+    manager = TableManager()
+    execute(manager, f'storage {storage}')
+    execute(manager, 'create_table items name:str value:int')
+    execute(manager, 'insert into items values ("a", 1), ("b", 2), ("c", 3)')
+    execute(manager, 'update items set value = 20 where ID = 2')
+    execute(manager, 'update items set name = "z" where value >= 3')
+    in_memory = list(manager.table('items'))
+    manager.close()
+
+    assert in_memory == [
+        {'ID': 1, 'name': 'a', 'value': 1},
+        {'ID': 2, 'name': 'z', 'value': 20},
+        {'ID': 3, 'name': 'z', 'value': 3},
+    ]
+    assert reopened_table('items') == in_memory
+
+
+@pytest.mark.parametrize('set_clause', ['ID = 100', 'ID = 3'])
+def test_update_rejects_new_id(workdir, set_clause):
+    manager = TableManager()
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2), (3)')
+
+    with pytest.raises(ValueError, match='ID'):
+        execute(manager, f'update items set {set_clause} where ID = 2')
+
+    assert [record['ID'] for record in manager.table('items')] == [1, 2, 3]
+    manager.close()
+    assert reopened_table('items') == [
+        {'ID': 1, 'value': 1}, {'ID': 2, 'value': 2}, {'ID': 3, 'value': 3}]
+
+
+def test_manager_rejects_new_version_with_other_id(manager):
+    execute(manager, 'create_table items value:int')
+    execute(manager, 'insert into items values (1), (2)')
+
+    with pytest.raises(ValueError, match='ID'):
+        manager.update('items', [(1, {'ID': 2, 'value': 10})])
+    assert manager.table('items') == [{'ID': 1, 'value': 1}, {'ID': 2, 'value': 2}]
+
+
+@pytest.mark.parametrize('storage', sorted(BACKENDS))
+def test_storage_rejects_new_version_with_other_id(workdir, storage):
+    backend = BACKENDS[storage]()
+    with pytest.raises(ValueError, match='ID'):
+        backend.update('items', [(1, {'ID': 2, 'value': 10})])
+    assert backend.load('items') == []